@@ -0,0 +1,169 @@
+"""
+Compare the sync routes with the AsyncSession routes under many concurrent device
+connections. Both modes serve the same app in process through httpx's ASGI transport, each
+against a fresh SQLite database, so the numbers reflect the route and session overhead and
+how the threadpool limit of the sync routes queues requests.
+
+    python -m benchmarks.async_routes [--clients 50] [--requests 20]
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from config import TestingConfig
+from seedweb import async_routes, main
+from seedweb.database import make_async_engine, make_engine
+from seedweb.models import Base
+
+
+async def device(client: httpx.AsyncClient, project_id: int, count: int) -> list[float]:
+    """
+    Post readings and read them back the way a Pico does, recording each request's latency.
+    :param client: the client to send requests with
+    :param project_id: the Project ID
+    :param count: the number of requests to send
+    :return: the latency of each request in seconds
+    """
+    latencies = []
+    for i in range(count):
+        started = time.perf_counter()
+        if i % 2:
+            response = await client.get(f"/projects/{project_id}/data/?limit=10")
+        else:
+            response = await client.post(
+                f"/projects/{project_id}/data/",
+                json={"project_id": project_id, "sensor_data": '{"temperature": 21}'},
+            )
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run_mode(clients: int, requests: int) -> dict:
+    """
+    Drive the app with concurrent clients and collect throughput and latency.
+    :param clients: the number of concurrent clients
+    :param requests: the number of requests per client
+    :return: dict of requests per second and latency percentiles in milliseconds
+    """
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        profile = await client.post(
+            "/profiles/", json={"name": "Benchmark", "colors": [[0, 255, 0]]}
+        )
+        project = await client.post(
+            "/projects/",
+            json={
+                "name": "Benchmark",
+                "bed_id": "bench",
+                "description": "Benchmark bed",
+                "profile_id": profile.json()["id"],
+                "start": "07:00:00",
+                "end": "17:00:00",
+            },
+        )
+        project_id = project.json()["id"]
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(device(client, project_id, requests) for _ in range(clients))
+        )
+        elapsed = time.perf_counter() - started
+    latencies = sorted(latency for result in results for latency in result)
+    return {
+        "requests/s": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark sync and async routes.")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=40,
+        help="connections per engine, defaults to the size of the sync threadpool",
+    )
+    args = parser.parse_args()
+    options = {"pool_size": args.pool_size, "max_overflow": 0, "pool_timeout": 120}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_config = type(
+            "Config",
+            (TestingConfig,),
+            {
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{Path(tmp) / 'sync.db'}",
+                "SQLALCHEMY_ENGINE_OPTIONS": options,
+            },
+        )
+        engine = make_engine(sync_config)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        def get_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        main.app.dependency_overrides[main.get_db] = get_db
+        result = asyncio.run(run_mode(args.clients, args.requests))
+        print_result("sync", result)
+
+        async_config = type(
+            "Config",
+            (TestingConfig,),
+            {
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{Path(tmp) / 'async.db'}",
+                "SQLALCHEMY_ENGINE_OPTIONS": options,
+            },
+        )
+        Base.metadata.create_all(bind=make_engine(async_config))
+        async_engine = make_async_engine(async_config)
+        async_session_factory = async_sessionmaker(
+            async_engine, autoflush=False, expire_on_commit=False
+        )
+
+        async def get_async_db():
+            async with async_session_factory() as db:
+                yield db
+
+        async_routes.use_async_routes(main.app)
+        main.app.dependency_overrides[async_routes.get_async_db] = get_async_db
+
+        async def run_async_mode() -> dict:
+            try:
+                return await run_mode(args.clients, args.requests)
+            finally:
+                await async_engine.dispose()
+
+        print_result("async", asyncio.run(run_async_mode()))
+
+
+def print_result(mode: str, result: dict) -> None:
+    """
+    Print one line of benchmark results.
+    :param mode: the mode benchmarked
+    :param result: the dict returned by run_mode
+    """
+    print(
+        f"{mode:<6} {result['requests/s']:>9.1f} requests/s "
+        f"p50 {result['p50']:>8.1f} ms p95 {result['p95']:>8.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,128 @@
+"""
+Compare write and read throughput of the storage engine profiles in config.py. Each profile
+gets a fresh SQLite database in a temporary directory, or the database given by --database,
+and is driven by several threads posting readings one commit at a time, the way the Picos
+do, while others poll project status.
+
+    python -m benchmarks.engine_profiles [--threads 4] [--readings 500]
+"""
+
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time as dt_time
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from config import config_by_name
+from seedweb import crud, schemas
+from seedweb.cache import status_cache
+from seedweb.database import make_engine
+from seedweb.models import Base, Project
+
+PROFILES = ("development", "testing", "production")
+
+
+def post_readings(session_factory: sessionmaker, project_id: int, count: int) -> float:
+    """
+    Write readings one request, and so one commit, at a time.
+    :param session_factory: sessionmaker bound to the engine under test
+    :param project_id: the Project ID
+    :param count: the number of readings to write
+    :return: the seconds taken
+    """
+    started = time.perf_counter()
+    with session_factory() as db:
+        for i in range(count):
+            reading = schemas.ProjectDataCreate(
+                project_id=project_id,
+                sensor_data=f'{{"temperature": {20 + i % 5}, "humidity": 60}}',
+            )
+            crud.create_project_data(db, reading)
+    return time.perf_counter() - started
+
+
+def poll_status(session_factory: sessionmaker, project_id: int, count: int) -> float:
+    """
+    Read a Project's status, bypassing the status cache so every poll hits the database.
+    :param session_factory: sessionmaker bound to the engine under test
+    :param project_id: the Project ID
+    :param count: the number of polls
+    :return: the seconds taken
+    """
+    started = time.perf_counter()
+    with session_factory() as db:
+        for _ in range(count):
+            status_cache.invalidate(project_id)
+            crud.get_status_entry(db, project_id)
+    return time.perf_counter() - started
+
+
+def run_profile(name: str, database: str, threads: int, readings: int) -> dict:
+    """
+    Benchmark one configuration profile.
+    :param name: the config_by_name key
+    :param database: the database URI to use
+    :param threads: the number of writer threads, matched by as many reader threads
+    :param readings: the number of readings per writer thread
+    :return: dict of the profile name and its writes and reads per second
+    """
+    config = type(
+        "Config", (config_by_name[name],), {"SQLALCHEMY_DATABASE_URI": database}
+    )
+    engine = make_engine(config)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with session_factory() as db:
+        project = Project(
+            name="Benchmark", bed_id="bench", start=dt_time(7), end=dt_time(17)
+        )
+        db.add(project)
+        db.commit()
+        project_id = project.id
+
+    with ThreadPoolExecutor(max_workers=threads * 2) as pool:
+        writes = [
+            pool.submit(post_readings, session_factory, project_id, readings)
+            for _ in range(threads)
+        ]
+        reads = [
+            pool.submit(poll_status, session_factory, project_id, readings)
+            for _ in range(threads)
+        ]
+        write_time = max(future.result() for future in writes)
+        read_time = max(future.result() for future in reads)
+    engine.dispose()
+    total = threads * readings
+    return {
+        "profile": name,
+        "writes/s": total / write_time,
+        "reads/s": total / read_time,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the storage engine profiles."
+    )
+    parser.add_argument("--profile", choices=PROFILES, action="append")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--readings", type=int, default=500)
+    parser.add_argument("--database", help="benchmark this database URI instead")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.profile or PROFILES:
+            database = args.database or f"sqlite:///{Path(tmp) / f'{name}.db'}"
+            result = run_profile(name, database, args.threads, args.readings)
+            print(
+                f"{result['profile']:<12} {result['writes/s']:>10.1f} writes/s "
+                f"{result['reads/s']:>10.1f} reads/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+"""
+Load test the app end to end with a simulated fleet. A uvicorn server is started against a
+fresh SQLite file in a temporary directory (or --url points at a running one), a Profile
+and one Project per bed are created, and then, for --duration seconds:
+
+- every virtual bed posts a sensor reading every --post-interval seconds and polls
+  /projects/{project_id}/status every --poll-interval seconds, sending the ETag of its
+  last status in If-None-Match as a Pico does;
+- every dashboard user lists the latest data of a random bed, and now and then every
+  Project, every --dashboard-interval seconds.
+
+Clients start at random offsets and jitter their intervals, so the fleet does not act in
+lockstep. --speed divides every interval, to squeeze an hour of a small fleet, or a minute
+of a large one, into a short run. Throughput, p50/p95/p99 latency and error rate are
+reported per endpoint; --json writes them to a file and --compare prints the change from a
+previous run's file.
+
+    python -m benchmarks.fleet_load [--beds 50] [--dashboards 5] [--duration 60]
+        [--speed 10] [--binary] [--json results.json] [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from seedweb.wire import READING_MEDIA_TYPE, encode_reading
+
+POST_DATA = "POST /projects/{project_id}/data/"
+GET_STATUS = "GET /projects/{project_id}/status"
+LIST_DATA = "GET /projects/{project_id}/data/"
+LIST_PROJECTS = "GET /projects/"
+SUCCESS = {200, 201, 202, 304}
+
+
+class Recorder:
+    """Collects the latency and outcome of every request, per endpoint"""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def request(
+        self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs
+    ) -> httpx.Response | None:
+        """
+        Send a request and record it under an endpoint.
+        :param client: the client to send the request with
+        :param endpoint: the name the request is recorded under
+        :param method: the HTTP method
+        :param url: the URL to request
+        :param kwargs: any other arguments of httpx.AsyncClient.request
+        :return: the response, or None if no response was received
+        """
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as error:
+            status = type(error).__name__
+            response = None
+        else:
+            status = str(response.status_code)
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        self.statuses[endpoint][status] += 1
+        if response is None or response.status_code not in SUCCESS:
+            self.errors[endpoint] += 1
+        return response
+
+    def summary(self, seconds: float) -> dict:
+        """
+        Summarise the recorded requests.
+        :param seconds: the length of the run
+        :return: dict of endpoints and their throughput, latency percentiles and errors
+        """
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            latencies = sorted(self.latencies[endpoint])
+            count = len(latencies)
+            endpoints[endpoint] = {
+                "requests": count,
+                "throughput_rps": count / seconds,
+                "errors": self.errors[endpoint],
+                "error_rate": self.errors[endpoint] / count,
+                "statuses": dict(self.statuses[endpoint]),
+                "p50_ms": percentile(latencies, 50) * 1e3,
+                "p95_ms": percentile(latencies, 95) * 1e3,
+                "p99_ms": percentile(latencies, 99) * 1e3,
+                "max_ms": latencies[-1] * 1e3,
+            }
+        count = sum(len(latencies) for latencies in self.latencies.values())
+        errors = sum(self.errors.values())
+        everything = sorted(
+            latency for latencies in self.latencies.values() for latency in latencies
+        )
+        total = {
+            "requests": count,
+            "throughput_rps": count / seconds,
+            "errors": errors,
+            "error_rate": errors / count if count else 0.0,
+            "p50_ms": percentile(everything, 50) * 1e3,
+            "p95_ms": percentile(everything, 95) * 1e3,
+            "p99_ms": percentile(everything, 99) * 1e3,
+        }
+        return {"endpoints": endpoints, "total": total}
+
+
+def percentile(ordered: list[float], rank: float) -> float:
+    """
+    Return a percentile of sorted values by the nearest rank method.
+    :param ordered: the values, sorted
+    :param rank: the percentile, 0 to 100
+    :return: the value at that percentile, or 0.0 if there are no values
+    """
+    if not ordered:
+        return 0.0
+    return ordered[max(math.ceil(rank / 100 * len(ordered)) - 1, 0)]
+
+
+def jittered(interval: float) -> float:
+    """
+    Vary an interval by up to 10% either way.
+    :param interval: the interval in seconds
+    :return: the jittered interval
+    """
+    return interval * random.uniform(0.9, 1.1)
+
+
+def reading(project_id: int, binary: bool) -> dict:
+    """
+    Make the request arguments for posting a plausible sensor reading.
+    :param project_id: the bed's Project ID
+    :param binary: True to encode the reading in the seedweb.wire format
+    :return: dict of httpx request arguments
+    """
+    metrics = {
+        "temperature": round(random.gauss(21, 2), 1),
+        "humidity": round(random.uniform(35, 70), 1),
+        "soil_moisture": round(random.uniform(20, 60), 1),
+    }
+    if binary:
+        return {
+            "content": encode_reading(metrics),
+            "headers": {"content-type": READING_MEDIA_TYPE},
+        }
+    return {"json": {"project_id": project_id, "sensor_data": metrics}}
+
+
+async def bed(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    project_id: int,
+    args: argparse.Namespace,
+    deadline: float,
+) -> None:
+    """
+    Act as one Pico: post readings and poll the status until the deadline.
+    :param client: the client to send requests with
+    :param recorder: the Recorder to record requests in
+    :param project_id: the bed's Project ID
+    :param args: the parsed command line
+    :param deadline: the loop time to stop at
+    """
+    loop = asyncio.get_running_loop()
+    post_interval = args.post_interval / args.speed
+    poll_interval = args.poll_interval / args.speed
+    next_post = loop.time() + random.uniform(0, post_interval)
+    next_poll = loop.time() + random.uniform(0, poll_interval)
+    etag = None
+    while True:
+        wake = min(next_post, next_poll)
+        if wake >= deadline:
+            return
+        await asyncio.sleep(max(wake - loop.time(), 0))
+        if next_post <= next_poll:
+            await recorder.request(
+                client,
+                POST_DATA,
+                "POST",
+                f"/projects/{project_id}/data/",
+                **reading(project_id, args.binary),
+            )
+            next_post += jittered(post_interval)
+        else:
+            headers = {"If-None-Match": etag} if etag else {}
+            response = await recorder.request(
+                client,
+                GET_STATUS,
+                "GET",
+                f"/projects/{project_id}/status",
+                headers=headers,
+            )
+            if response is not None and response.status_code == 200:
+                etag = response.headers.get("ETag")
+            next_poll += jittered(poll_interval)
+
+
+async def dashboard(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    project_ids: list[int],
+    args: argparse.Namespace,
+    deadline: float,
+) -> None:
+    """
+    Act as one dashboard user: list the data of random beds, and now and then every
+    Project, until the deadline.
+    :param client: the client to send requests with
+    :param recorder: the Recorder to record requests in
+    :param project_ids: the IDs of the beds' Projects
+    :param args: the parsed command line
+    :param deadline: the loop time to stop at
+    """
+    loop = asyncio.get_running_loop()
+    interval = args.dashboard_interval / args.speed
+    wake = loop.time() + random.uniform(0, interval)
+    while wake < deadline:
+        await asyncio.sleep(max(wake - loop.time(), 0))
+        if random.random() < 0.2:
+            await recorder.request(client, LIST_PROJECTS, "GET", "/projects/")
+        else:
+            await recorder.request(
+                client,
+                LIST_DATA,
+                "GET",
+                f"/projects/{random.choice(project_ids)}/data/",
+                params={"limit": args.page_size},
+            )
+        wake += jittered(interval)
+
+
+async def seed(client: httpx.AsyncClient, beds: int) -> list[int]:
+    """
+    Create a Profile and a Project per bed.
+    :param client: the client to send requests with
+    :param beds: the number of beds
+    :return: the Project IDs
+    """
+    suffix = f"{time.time_ns():x}"
+    profile = await client.post(
+        "/profiles/", json={"name": f"Fleet {suffix}", "colors": [[255, 0, 255]]}
+    )
+    profile.raise_for_status()
+    project_ids = []
+    for number in range(beds):
+        response = await client.post(
+            "/projects/",
+            json={
+                "name": f"Fleet {suffix} bed {number}",
+                "bed_id": f"pico-{number}",
+                "description": "Load test bed",
+                "profile_id": profile.json()["id"],
+                "start": "07:00:00",
+                "end": "19:00:00",
+            },
+        )
+        response.raise_for_status()
+        project_ids.append(response.json()["id"])
+    return project_ids
+
+
+async def run(url: str, args: argparse.Namespace) -> dict:
+    """
+    Seed the fleet and run it against a server.
+    :param url: the server's base URL
+    :param args: the parsed command line
+    :return: dict of the run's summary
+    """
+    clients = args.beds + args.dashboards
+    async with httpx.AsyncClient(
+        base_url=url,
+        timeout=args.timeout,
+        limits=httpx.Limits(max_connections=clients, max_keepalive_connections=clients),
+    ) as client:
+        project_ids = await seed(client, args.beds)
+        recorder = Recorder()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + args.duration
+        await asyncio.gather(
+            *(bed(client, recorder, pid, args, deadline) for pid in project_ids),
+            *(
+                dashboard(client, recorder, project_ids, args, deadline)
+                for _ in range(args.dashboards)
+            ),
+        )
+        return recorder.summary(loop.time() - started)
+
+
+def free_port() -> int:
+    """
+    Find a free TCP port on localhost.
+    :return: the port number
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(tmp: Path, args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    """
+    Start uvicorn serving the app against a new SQLite file, and wait for it to be ready.
+    :param tmp: the directory for the database and archive
+    :param args: the parsed command line
+    :return: the server process and its base URL
+    """
+    port = free_port()
+    env = {
+        **os.environ,
+        "SEEDWEB_ENV": args.env,
+        "DATABASE_URI": f"sqlite:///{tmp / 'fleet.db'}",
+        "ARCHIVE_PATH": str(tmp / "archive"),
+        **dict(setting.split("=", 1) for setting in args.server_env),
+    }
+    command = [sys.executable, "-m", "uvicorn", "seedweb.main:app"]
+    command += ["--port", str(port), "--workers", str(args.workers)]
+    command += ["--log-level", "warning", "--no-access-log"]
+    server = subprocess.Popen(command, env=env)
+    url = f"http://127.0.0.1:{port}"
+    give_up = time.monotonic() + 30
+    while time.monotonic() < give_up:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with {server.returncode}")
+        try:
+            if httpx.get(f"{url}/readiness").status_code == 200:
+                return server, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Server was not ready within 30 seconds")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    """
+    Stop the server, killing it if it has not shut down within 30 seconds.
+    :param server: the server process
+    """
+    server.terminate()
+    try:
+        server.wait(30)
+    except subprocess.TimeoutExpired:
+        print("Server did not shut down within 30 seconds, killing it", file=sys.stderr)
+        server.kill()
+        server.wait()
+
+
+def print_summary(summary: dict, baseline: dict | None) -> None:
+    """
+    Print a run's summary, with the change from a baseline run if there is one.
+    :param summary: the run's summary
+    :param baseline: a previous run's summary, or None
+    """
+    columns = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate")
+    print(
+        f"{'endpoint':<36} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'errors':>7}"
+    )
+    rows = [*summary["endpoints"].items(), ("total", summary["total"])]
+    for endpoint, stats in rows:
+        print(
+            f"{endpoint:<36} {stats['requests']:>8} {stats['throughput_rps']:>8.1f} "
+            f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} "
+            f"{stats['error_rate']:>6.1%}"
+        )
+    if baseline is None:
+        return
+    print(f"\nchange from baseline\n{'endpoint':<36}", *(f"{c:>15}" for c in columns))
+    previous = {**baseline["endpoints"], "total": baseline["total"]}
+    for endpoint, stats in rows:
+        before = previous.get(endpoint)
+        if before is None:
+            continue
+        changes = []
+        for column in columns:
+            if column == "error_rate":
+                changes.append(f"{stats[column] - before[column]:>+14.1%} ")
+            elif before[column]:
+                changes.append(f"{stats[column] / before[column] - 1:>+14.1%} ")
+            else:
+                changes.append(f"{'n/a':>15}")
+        print(f"{endpoint:<36}", *changes)
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description="Load test the app with a Pico fleet.")
+    parser.add_argument("--beds", type=int, default=50)
+    parser.add_argument("--dashboards", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run")
+    parser.add_argument("--post-interval", type=float, default=60)
+    parser.add_argument("--poll-interval", type=float, default=30)
+    parser.add_argument("--dashboard-interval", type=float, default=10)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--speed", type=float, default=10, help="divides the intervals")
+    parser.add_argument("--binary", action="store_true", help="post binary readings")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--url", help="load test a running server instead")
+    parser.add_argument("--env", default="development", help="SEEDWEB_ENV to serve")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--server-env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="environment variable for the server, such as ASYNC_DATABASE=1",
+    )
+    parser.add_argument("--json", type=Path, help="write the results to this file")
+    parser.add_argument("--compare", type=Path, help="results file of a previous run")
+    parser.add_argument("--seed", type=int, help="seed the random choices")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    if args.url:
+        summary = asyncio.run(run(args.url, args))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            server, url = start_server(Path(tmp), args)
+            try:
+                summary = asyncio.run(run(url, args))
+            finally:
+                stop_server(server)
+
+    results = {
+        "started_at": started_at,
+        "settings": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("json", "compare")
+        },
+        **summary,
+    }
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_summary(summary, baseline)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2, default=str))
+        print(f"\nresults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main_()
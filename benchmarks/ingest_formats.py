@@ -0,0 +1,145 @@
+"""
+Compare the JSON and binary formats for posting a reading to /projects/{project_id}/data/.
+Reports the bytes each format puts on the wire, the CPU time to decode a reading into its
+ProjectData columns, and the CPU time of a whole request served in process against a fresh
+SQLite database.
+
+    python -m benchmarks.ingest_formats [--readings 20000] [--requests 2000]
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from config import TestingConfig
+from seedweb import crud, main, schemas, wire
+from seedweb.database import make_engine
+from seedweb.models import Base
+
+METRICS = {"temperature": 21.3, "humidity": 40.2, "soil_moisture": 512.0}
+
+
+def json_body(project_id: int) -> bytes:
+    """
+    Encode a reading the way the Picos post it today.
+    :param project_id: the Project ID
+    :return: the JSON request body
+    """
+    return json.dumps(
+        {"project_id": project_id, "sensor_data": json.dumps(METRICS)}
+    ).encode()
+
+
+def request_bytes(path: str, content_type: str, body: bytes) -> int:
+    """
+    Count the bytes of a minimal HTTP/1.1 request, as a microcontroller client sends it.
+    :param path: the request path
+    :param content_type: the Content-Type header value
+    :param body: the request body
+    :return: the size of the request line, headers and body
+    """
+    head = (
+        f"POST {path} HTTP/1.1\r\nHost: seedweb\r\n"
+        f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n"
+    )
+    return len(head.encode()) + len(body)
+
+
+def cpu_per_call(function: Callable[[], object], count: int) -> float:
+    """
+    Measure the CPU time of a function call.
+    :param function: the function to call
+    :param count: the number of calls
+    :return: the CPU time per call in microseconds
+    """
+    started = time.process_time()
+    for _ in range(count):
+        function()
+    return (time.process_time() - started) / count * 1e6
+
+
+def decode_json(body: bytes) -> dict:
+    """
+    Decode a JSON reading into ProjectData columns the way the JSON route does.
+    :param body: the JSON request body
+    :return: dict of ProjectData column values
+    """
+    reading = schemas.ProjectDataCreate.model_validate_json(body)
+    return crud.reading_row(reading)
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the reading formats.")
+    parser.add_argument("--readings", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = type(
+            "Config",
+            (TestingConfig,),
+            {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{Path(tmp) / 'ingest.db'}"},
+        )
+        engine = make_engine(config)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        def get_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        main.app.dependency_overrides[main.get_db] = get_db
+        client = TestClient(main.app)
+        profile_id = client.post(
+            "/profiles/", json={"name": "Benchmark", "colors": [[0, 255, 0]]}
+        ).json()["id"]
+        project_id = client.post(
+            "/projects/",
+            json={
+                "name": "Benchmark",
+                "bed_id": "bench",
+                "description": "Benchmark bed",
+                "profile_id": profile_id,
+                "start": "07:00:00",
+                "end": "17:00:00",
+            },
+        ).json()["id"]
+        path = f"/projects/{project_id}/data/"
+        formats = {
+            "json": ("application/json", json_body(project_id), decode_json),
+            "binary": (
+                wire.READING_MEDIA_TYPE,
+                wire.encode_reading(METRICS),
+                lambda b: wire.decode_reading(project_id, b),
+            ),
+        }
+
+        print(
+            f"{'format':<7} {'body B':>7} {'request B':>10} "
+            f"{'decode us':>10} {'request us':>11}"
+        )
+        for name, (content_type, body, decode) in formats.items():
+            headers = {"Content-Type": content_type}
+            decode_us = cpu_per_call(lambda: decode(body), args.readings)
+
+            def post():
+                client.post(path, content=body, headers=headers).raise_for_status()
+
+            request_us = cpu_per_call(post, args.requests)
+            print(
+                f"{name:<7} {len(body):>7} {request_bytes(path, content_type, body):>10} "
+                f"{decode_us:>10.1f} {request_us:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,159 @@
+"""
+Measure what the request metrics cost. The app is served in process through httpx's ASGI
+transport against a fresh SQLite database, and each route is timed in alternating rounds
+with the metrics middleware enabled and disabled, so drift affects both modes alike. The
+cost of recording one request and of rendering /metrics is timed on its own as well.
+
+    python -m benchmarks.metrics_overhead [--rounds 20] [--requests 200]
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from sqlalchemy.orm import sessionmaker
+
+from config import TestingConfig
+from seedweb import main, metrics
+from seedweb.database import make_engine
+from seedweb.models import Base
+
+
+async def time_requests(client: httpx.AsyncClient, path: str, count: int) -> float:
+    """
+    Send GET requests one after another.
+    :param client: the client to send requests with
+    :param path: the path to request
+    :param count: the number of requests to send
+    :return: the mean time per request in microseconds
+    """
+    started = time.perf_counter()
+    for _ in range(count):
+        response = await client.get(path)
+        response.raise_for_status()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+async def compare(paths: list[str], rounds: int, requests: int) -> dict:
+    """
+    Time each path with the metrics enabled and disabled, alternating every round.
+    :param paths: the paths to request
+    :param rounds: the number of rounds per mode
+    :param requests: the number of requests per round
+    :return: dict of paths and the median microseconds per request in each mode
+    """
+    results = {path: {"off": [], "on": []} for path in paths}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for path in paths:
+            await time_requests(client, path, requests)
+        for _ in range(rounds):
+            for path in paths:
+                for mode, enabled in (("off", False), ("on", True)):
+                    metrics.registry.enabled = enabled
+                    results[path][mode].append(
+                        await time_requests(client, path, requests)
+                    )
+    metrics.registry.enabled = True
+    return {
+        path: {mode: statistics.median(times) for mode, times in modes.items()}
+        for path, modes in results.items()
+    }
+
+
+def time_registry(routes: int, records: int) -> tuple[float, float]:
+    """
+    Time recording requests and rendering the registry with one series per route.
+    :param routes: the number of routes recorded
+    :param records: the number of requests recorded
+    :return: microseconds per record and milliseconds per render
+    """
+    registry = metrics.MetricsRegistry()
+    started = time.perf_counter()
+    for i in range(records):
+        registry.record("GET", f"/route/{i % routes}", 200, 0.004, 0, 512)
+    per_record = (time.perf_counter() - started) / records * 1e6
+    started = time.perf_counter()
+    for _ in range(10):
+        registry.render()
+    return per_record, (time.perf_counter() - started) / 10 * 1e3
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the metrics middleware.")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = type(
+            "Config",
+            (TestingConfig,),
+            {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{Path(tmp) / 'metrics.db'}"},
+        )
+        engine = make_engine(config)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        def get_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        main.app.dependency_overrides[main.get_db] = get_db
+
+        async def seed() -> int:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench"
+            ) as client:
+                profile = await client.post(
+                    "/profiles/", json={"name": "Bench", "colors": [[0, 255, 0]]}
+                )
+                project = await client.post(
+                    "/projects/",
+                    json={
+                        "name": "Bench",
+                        "bed_id": "bench",
+                        "description": "Benchmark bed",
+                        "profile_id": profile.json()["id"],
+                        "start": "07:00:00",
+                        "end": "17:00:00",
+                    },
+                )
+                return project.json()["id"]
+
+        project_id = asyncio.run(seed())
+        paths = [
+            "/healthcheck",
+            f"/projects/{project_id}/status",
+            f"/projects/{project_id}",
+        ]
+        try:
+            results = asyncio.run(compare(paths, args.rounds, args.requests))
+        finally:
+            main.app.dependency_overrides.clear()
+        engine.dispose()
+
+    print(f"{'route':<28} {'off us':>8} {'on us':>8} {'cost us':>8} {'cost %':>7}")
+    for path, modes in results.items():
+        cost = modes["on"] - modes["off"]
+        print(
+            f"{path:<28} {modes['off']:>8.1f} {modes['on']:>8.1f} {cost:>8.1f} "
+            f"{cost / modes['off'] * 100:>6.1f}%"
+        )
+    per_record, per_render = time_registry(routes=50, records=100000)
+    print(f"record one request: {per_record:.2f} us")
+    print(f"render 50 routes:   {per_render:.2f} ms")
+
+
+if __name__ == "__main__":
+    main_()
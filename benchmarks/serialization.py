@@ -0,0 +1,120 @@
+"""
+Compare the response_model path of the list endpoints, where FastAPI validates every row and
+walks the result with jsonable_encoder, with the RowEncoder fast path. Both encode the same
+in-memory ORM objects, so the numbers are serialization time only, and the bodies are
+checked to be identical.
+
+    python -m benchmarks.serialization [--rows 500] [--repeat 50]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from seedweb import schemas
+from seedweb.models import Profile, ProjectData, ProjectNotes
+from seedweb.serialization import list_response
+
+
+def make_records(rows: int) -> dict:
+    """
+    Build ORM objects shaped like the rows each list endpoint returns.
+    :param rows: the number of objects per endpoint
+    :return: dict of schema and objects
+    """
+    now = datetime(2024, 5, 1, 12)
+    dates = [now + timedelta(minutes=i) for i in range(rows)]
+    return {
+        schemas.Profile: [
+            Profile(
+                id=i,
+                name=f"Profile {i}",
+                colors=[[255, 120, 0], [0, 0, 0]],
+                created_date=date,
+                updated_date=date,
+            )
+            for i, date in enumerate(dates)
+        ],
+        schemas.ProjectData: [
+            ProjectData(
+                id=i,
+                project_id=1,
+                temperature=21.5,
+                humidity=40.0,
+                soil_moisture=None,
+                extra={"lux": 300},
+                created_date=date,
+                updated_date=date,
+            )
+            for i, date in enumerate(dates)
+        ],
+        schemas.ProjectNotes: [
+            ProjectNotes(
+                id=i,
+                project_id=1,
+                note="Watered the lettuce bed",
+                created_date=date,
+                updated_date=date,
+            )
+            for i, date in enumerate(dates)
+        ],
+    }
+
+
+def response_model_body(adapter: TypeAdapter, records: list) -> bytes:
+    """
+    Encode records the way FastAPI does for a list response_model.
+    :param adapter: the TypeAdapter of the response_model
+    :param records: ORM objects
+    :return: the response body
+    """
+    validated = adapter.validate_python(records, from_attributes=True)
+    return JSONResponse(
+        jsonable_encoder(adapter.dump_python(validated, mode="json"))
+    ).body
+
+
+def time_per_call(function: Callable[[], bytes], repeat: int) -> float:
+    """
+    Measure the wall time of a function call.
+    :param function: the function to call
+    :param repeat: the number of calls
+    :return: the time per call in milliseconds
+    """
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark list serialization.")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'schema':<13} {'response_model ms':>18} {'fast ms':>8} {'speedup':>8}")
+    for schema, records in make_records(args.rows).items():
+        adapter = TypeAdapter(list[schema])
+        slow = response_model_body(adapter, records)
+        fast = list_response(records, schema).body
+        assert slow == fast, f"{schema.__name__} bodies differ"
+        slow_ms = time_per_call(
+            lambda: response_model_body(adapter, records), args.repeat
+        )
+        fast_ms = time_per_call(
+            lambda: list_response(records, schema).body, args.repeat
+        )
+        print(
+            f"{schema.__name__:<13} {slow_ms:>18.2f} {fast_ms:>8.2f} "
+            f"{slow_ms / fast_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,126 @@
+"""
+Measure how long a fresh worker takes to become useful: the time to import seedweb.main,
+to run the application's startup (creating the schema), to finish warming the caches, and
+the latency of the first requests compared with the same requests once warm. Each run
+starts a new interpreter against a seeded SQLite database in a temporary directory; the
+seeding imports are kept inside seed() so the child interpreter imports nothing up front.
+
+    python -m benchmarks.startup [--runs 5] [--projects 200]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import time as time_of_day
+from pathlib import Path
+
+PATHS = ("/projects/1", "/projects/1/status", "/projects/1/data/")
+
+
+def seed(uri: str, projects: int) -> None:
+    """
+    Create the schema and a Profile with some Projects.
+    :param uri: the database URI
+    :param projects: the number of Projects to create
+    """
+    from sqlalchemy import insert
+
+    from config import TestingConfig
+    from seedweb.database import make_engine
+    from seedweb.models import Base, Profile, Project
+
+    config = type("Config", (TestingConfig,), {"SQLALCHEMY_DATABASE_URI": uri})
+    engine = make_engine(config)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Profile), [{"name": "Bench", "colors": "[[1, 2, 3]]"}]
+        )
+        connection.execute(
+            insert(Project),
+            [
+                {
+                    "name": f"Bed {number}",
+                    "bed_id": f"bed-{number}",
+                    "description": "Benchmark bed",
+                    "profile_id": 1,
+                    "start": time_of_day(7),
+                    "end": time_of_day(17),
+                }
+                for number in range(projects)
+            ],
+        )
+    engine.dispose()
+
+
+def measure() -> dict:
+    """
+    Run in the child interpreter: import the app, start it and time the first requests.
+    :return: dict of timings in milliseconds
+    """
+    started = time.perf_counter()
+    from fastapi.testclient import TestClient
+
+    from seedweb import main, readiness
+
+    imported = time.perf_counter()
+    timings = {"import_ms": (imported - started) * 1e3}
+    with TestClient(main.app) as client:
+        timings["startup_ms"] = (time.perf_counter() - imported) * 1e3
+        while client.get("/readiness").status_code != 200:
+            time.sleep(0.001)
+        timings["ready_ms"] = (time.perf_counter() - imported) * 1e3
+        timings["warmup_ms"] = readiness.warmup.seconds * 1e3
+        for path in PATHS:
+            for label in ("first", "warm"):
+                requested = time.perf_counter()
+                client.get(path).raise_for_status()
+                timings[f"{label} {path}"] = (time.perf_counter() - requested) * 1e3
+    return timings
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark application startup.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(measure()))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = f"sqlite:///{Path(tmp) / 'startup.db'}"
+        seed(uri, args.projects)
+        env = {
+            **os.environ,
+            "SEEDWEB_ENV": "development",
+            "DATABASE_URI": uri,
+            "ARCHIVE_PATH": str(Path(tmp) / "archive"),
+        }
+        runs = [
+            json.loads(
+                subprocess.run(
+                    [sys.executable, "-m", "benchmarks.startup", "--child"],
+                    env=env,
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+            )
+            for _ in range(args.runs)
+        ]
+
+    print(f"{'measure':<28} {'median ms':>10} {'min ms':>8}")
+    for key in runs[0]:
+        values = [run[key] for run in runs]
+        print(f"{key:<28} {statistics.median(values):>10.1f} {min(values):>8.1f}")
+
+
+if __name__ == "__main__":
+    main_()
@@ -2,42 +2,103 @@
 
 import os
 
-from dotenv import find_dotenv, load_dotenv
+basedir = os.path.abspath(os.path.dirname(__file__))
 
-load_dotenv(find_dotenv())
+env_file = os.path.join(basedir, ".env")
+if os.path.exists(env_file):
+    from dotenv import load_dotenv
 
-basedir = os.path.abspath(os.path.dirname(__file__))
+    load_dotenv(env_file)
 
 
-class DevelopmentConfig:
+class Config:
     """
-    Development configuration.
+    Settings shared by every environment. The environment classes override only what
+    differs.
     """
 
-    SECRET_KEY = os.environ.get("SECRET_KEY")
+    SECRET_KEY = None
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "DATABASE_URI"
     ) or "sqlite:///" + os.path.join(basedir, "instance", "seedy.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_pre_ping": True,
+    }
+    SQLITE_PRAGMAS = {
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "foreign_keys": "ON",
+    }
     BUNDLE_ERRORS = True
     DEBUG = True
+    CREATE_SCHEMA_ON_STARTUP = True
+    WARMUP_RETRY_INTERVAL = 5.0
+    STATUS_CACHE_SIZE = 1024
+    PROJECT_DETAIL_LIMIT = 20
+    INGEST_QUEUE_ENABLED = False
+    INGEST_QUEUE_SIZE = 10000
+    INGEST_BATCH_SIZE = 500
+    INGEST_FLUSH_INTERVAL = 0.5
+    INGEST_ENQUEUE_TIMEOUT = 1.0
+    STATUS_STREAM_HEARTBEAT = 15.0
+    SCHEDULE_TIMEZONE = os.environ.get("SCHEDULE_TIMEZONE")
+    ASYNC_DATABASE_ENABLED = os.environ.get("ASYNC_DATABASE", "") == "1"
+    RETENTION_ENABLED = False
+    DATA_RETENTION_DAYS = None
+    RETENTION_INTERVAL = 3600.0
+    RETENTION_BATCH_SIZE = 1000
+    RETENTION_BATCH_PAUSE = 0.05
+    RETENTION_VACUUM_PAGES = 2000
+    ARCHIVE_PATH = os.environ.get("ARCHIVE_PATH") or os.path.join(
+        basedir, "instance", "archive"
+    )
+    ARCHIVE_AFTER_DAYS = None
+    ARCHIVE_BATCH_SIZE = 1000
+    PURGE_BATCH_SIZE = 1000
+    PURGE_BATCH_PAUSE = 0.05
+    METRICS_ENABLED = True
+    QUERY_PROFILING_ENABLED = True
+    QUERY_PROFILE_HEADERS = True
+    QUERY_REPEAT_THRESHOLD = 10
+    FAST_LIST_RESPONSES = False
 
 
-class ProductionConfig:
+class DevelopmentConfig(Config):
+    """
+    Development configuration.
+    """
+
+    SECRET_KEY = os.environ.get("SECRET_KEY")
+
+
+class ProductionConfig(Config):
     """
     Projection configuration.
     """
 
     SECRET_KEY = os.environ.get("PROD_SECRET_KEY")
-    SQLALCHEMY_DATABASE_URI = os.environ.get(
-        "DATABASE_URI"
-    ) or "sqlite:///" + os.path.join(basedir, "instance", "seedy.db")
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
-    BUNDLE_ERRORS = True
-    DEBUG = True
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": 20,
+        "max_overflow": 20,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+    }
+    SQLITE_PRAGMAS = {
+        **Config.SQLITE_PRAGMAS,
+        "mmap_size": 268435456,
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+    }
+    QUERY_PROFILE_HEADERS = False
 
 
-class TestingConfig:
+class TestingConfig(Config):
     """
     Testing configuration.
     """
@@ -46,9 +107,11 @@ class TestingConfig:
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "TEST_DB_URI"
     ) or "sqlite:///" + os.path.join(basedir, "instance", "test.db")
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
-    BUNDLE_ERRORS = True
-    DEBUG = True
+    SQLALCHEMY_ENGINE_OPTIONS = {"pool_size": 5, "max_overflow": 10}
+    SQLITE_PRAGMAS = {**Config.SQLITE_PRAGMAS, "synchronous": "OFF"}
+    ARCHIVE_PATH = os.environ.get("ARCHIVE_PATH") or os.path.join(
+        basedir, "instance", "test-archive"
+    )
 
 
 config_by_name = dict(
@@ -57,3 +120,22 @@ config_by_name = dict(
     production=ProductionConfig,
     default=DevelopmentConfig,
 )
+
+
+def get_config(name: str) -> type[Config]:
+    """
+    Return the configuration class for an environment name.
+    :param name: a config_by_name key, such as the SEEDWEB_ENV value
+    :return: the configuration class
+    :raises ValueError: if there is no configuration with that name
+    """
+    try:
+        return config_by_name[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown SEEDWEB_ENV {name!r}, expected one of: "
+            + ", ".join(sorted(config_by_name))
+        ) from None
+
+
+active_config = get_config(os.environ.get("SEEDWEB_ENV", "default"))
@@ -0,0 +1,646 @@
+"""
+Cold storage for old sensor readings. Readings older than a threshold are moved out of
+project_data_table into compressed columnar files, one per Project and month, under
+ARCHIVE_PATH. Each file holds a JSON header with the row count and key range, followed by
+one zlib compressed block per column, so a read only inflates the columns it needs and
+files outside the requested range are skipped from their header alone. Files are memory
+mapped while they are read, and each Project's partition headers are kept in an index that
+is only rebuilt when its directory changes, so listings skip partitions without opening
+them. Archive with `python -m seedweb.archive`.
+"""
+
+import argparse
+import array
+import heapq
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterator, NamedTuple
+
+from sqlalchemy import Connection, Engine, delete, func, select
+from sqlalchemy.orm import Session
+
+from config import active_config
+from seedweb.database import engine
+from seedweb.models import SENSOR_METRICS, ProjectData
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SWARC1\n\x00"
+HEADER_LENGTH = struct.Struct("<I")
+EPOCH = datetime(1970, 1, 1)
+
+ARCHIVE_COLUMNS = {
+    "id": "int64",
+    "created_date": "timestamp",
+    "updated_date": "timestamp",
+    **{metric: "float64" for metric in SENSOR_METRICS},
+    "extra": "json",
+}
+
+
+def to_micros(value: datetime) -> int:
+    """
+    Convert a timestamp to microseconds since the epoch. Naive timestamps are taken as UTC,
+    which is how SQLite stores them.
+    :param value: a datetime
+    :return: the microseconds since 1970-01-01 UTC
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value: int) -> datetime:
+    """
+    Convert microseconds since the epoch back to a naive UTC datetime.
+    :param value: the microseconds since 1970-01-01 UTC
+    :return: a naive datetime
+    """
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _packed(typecode: str, values) -> bytes:
+    """Pack numbers as little endian machine values"""
+    packed = array.array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpacked(typecode: str, data: bytes | memoryview) -> array.array:
+    """Unpack little endian machine values"""
+    unpacked = array.array(typecode)
+    unpacked.frombytes(data)
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked
+
+
+def encode_column(column_type: str, values: list) -> bytes:
+    """
+    Encode one column as a null mask followed by its values, compressed with zlib.
+    :param column_type: one of the ARCHIVE_COLUMNS types
+    :param values: the column values, None for nulls
+    :return: the compressed column block
+    """
+    mask = bytes(value is not None for value in values)
+    if column_type == "int64":
+        payload = _packed("q", (value or 0 for value in values))
+    elif column_type == "timestamp":
+        payload = _packed("q", (to_micros(v) if v is not None else 0 for v in values))
+    elif column_type == "float64":
+        payload = _packed("d", (value or 0.0 for value in values))
+    else:
+        if column_type == "json":
+            values = [json.dumps(v) if v is not None else None for v in values]
+        encoded = [value.encode() if value is not None else b"" for value in values]
+        payload = _packed("I", (len(value) for value in encoded)) + b"".join(encoded)
+    return zlib.compress(mask + payload)
+
+
+def decode_column(
+    column_type: str,
+    block: bytes | memoryview,
+    rows: int,
+    low: int = 0,
+    high: int | None = None,
+) -> list:
+    """
+    Decode a column block built by encode_column. The block is inflated whole, but only the
+    values of rows low to high are decoded.
+    :param column_type: one of the ARCHIVE_COLUMNS types
+    :param block: the compressed column block
+    :param rows: the number of rows in the block
+    :param low: the first row to decode
+    :param high: the row to stop before, None for the last row
+    :return: the column values, None for nulls
+    """
+    high = rows if high is None else high
+    data = memoryview(zlib.decompress(block))
+    mask, payload = data[low:high], data[rows:]
+    first, stop = low * 8, high * 8
+    fixed = payload[first:stop]
+    if column_type == "int64":
+        values = list(_unpacked("q", fixed))
+    elif column_type == "timestamp":
+        values = [from_micros(value) for value in _unpacked("q", fixed)]
+    elif column_type == "float64":
+        values = list(_unpacked("d", fixed))
+    else:
+        lengths = _unpacked("I", payload[: rows * 4])
+        values, stop = [], rows * 4 + sum(lengths[:low])
+        for length in lengths[low:high]:
+            start, stop = stop, stop + length
+            values.append(bytes(payload[start:stop]).decode())
+        if column_type == "json":
+            values = [json.loads(value) if value else None for value in values]
+    return [value if present else None for value, present in zip(values, mask)]
+
+
+def write_partition(path: str, project_id: int, rows: list[dict]) -> int:
+    """
+    Write a partition file, replacing any existing one atomically.
+    :param path: the partition file path
+    :param project_id: the Project ID the readings belong to
+    :param rows: the readings ordered by created date and ID
+    :return: the size of the file in bytes
+    """
+    blocks, columns, offset = [], [], 0
+    for name, column_type in ARCHIVE_COLUMNS.items():
+        block = encode_column(column_type, [row[name] for row in rows])
+        columns.append(
+            {"name": name, "type": column_type, "offset": offset, "length": len(block)}
+        )
+        blocks.append(block)
+        offset += len(block)
+    header = json.dumps(
+        {
+            "project_id": project_id,
+            "rows": len(rows),
+            "first": [to_micros(rows[0]["created_date"]), rows[0]["id"]],
+            "last": [to_micros(rows[-1]["created_date"]), rows[-1]["id"]],
+            "columns": columns,
+        }
+    ).encode()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+        for block in blocks:
+            file.write(block)
+    os.replace(temporary, path)
+    return os.path.getsize(path)
+
+
+class Partition:
+    """A memory mapped partition file. Columns are only inflated when read."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"Not an archive partition: {path}")
+        start = len(MAGIC) + HEADER_LENGTH.size
+        (length,) = HEADER_LENGTH.unpack_from(self._map, len(MAGIC))
+        self._data = stop = start + length
+        self.header = json.loads(self._map[start:stop])
+        self.rows = self.header["rows"]
+
+    def __enter__(self) -> "Partition":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Unmap the file"""
+        self._map.close()
+
+    def overlaps(self, start: int | None, end: int | None) -> bool:
+        """
+        Whether any reading falls in a range, judged from the header alone.
+        :param start: the earliest created date in microseconds, inclusive
+        :param end: the latest created date in microseconds, exclusive
+        :return: True if the partition may hold readings in the range
+        """
+        first, last = self.header["first"][0], self.header["last"][0]
+        return (start is None or last >= start) and (end is None or first < end)
+
+    def column(
+        self,
+        name: str,
+        low: int = 0,
+        high: int | None = None,
+        column_type: str | None = None,
+    ) -> list:
+        """
+        Inflate one column, decoding the values of rows low to high.
+        :param name: the column name
+        :param low: the first row to decode
+        :param high: the row to stop before, None for the last row
+        :param column_type: decode as this type instead of the stored one
+        :return: the column values
+        """
+        for column in self.header["columns"]:
+            if column["name"] == name:
+                start = self._data + column["offset"]
+                stop = start + column["length"]
+                with memoryview(self._map) as view, view[start:stop] as block:
+                    return decode_column(
+                        column_type or column["type"], block, self.rows, low, high
+                    )
+        raise KeyError(name)
+
+    def keys(self) -> list[tuple[int, int]]:
+        """
+        Return the (created date in microseconds, ID) key of every reading, decoding the
+        timestamps as plain integers.
+        :return: the keys in file order
+        """
+        return list(
+            zip(self.column("created_date", column_type="int64"), self.column("id"))
+        )
+
+    def read(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        after: tuple[datetime, int] | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        """
+        Read the readings in a range. Only the key columns are inflated to find the range,
+        and only the rows returned are decoded from the other columns.
+        :param start: the earliest created date, inclusive
+        :param end: the latest created date, exclusive
+        :param after: only return readings after this (created date, ID) position
+        :param limit: the max number of readings to return
+        :return: a list of reading dicts ordered by created date and ID
+        """
+        keys = self.keys()
+        low, high = 0, len(keys)
+        if start is not None:
+            low = bisect_left(keys, (to_micros(start),))
+        if after is not None:
+            low = max(low, bisect_right(keys, (to_micros(after[0]), after[1])))
+        if end is not None:
+            high = bisect_left(keys, (to_micros(end),))
+        if limit is not None:
+            high = min(high, low + limit)
+        if low >= high:
+            return []
+        columns = {
+            name: self.column(name, low, high)
+            for name in ARCHIVE_COLUMNS
+            if name not in ("id", "created_date")
+        }
+        rows = []
+        for index, (created_micros, record_id) in enumerate(keys[low:high]):
+            row = {name: values[index] for name, values in columns.items()}
+            row["id"] = record_id
+            row["created_date"] = from_micros(created_micros)
+            row["project_id"] = self.header["project_id"]
+            rows.append(row)
+        return rows
+
+
+def naive_utc(value: datetime) -> datetime:
+    """
+    Drop the timezone of a timestamp after converting it to UTC.
+    :param value: a datetime
+    :return: a naive UTC datetime
+    """
+    return from_micros(to_micros(value))
+
+
+class PartitionInfo(NamedTuple):
+    """The header of a partition file, as kept in the ArchiveStore index"""
+
+    path: str
+    rows: int
+    first: tuple[int, int]
+    last: tuple[int, int]
+
+
+class ArchiveStore:
+    """
+    The partition files of every Project, under root/<project id>/<YYYY-MM>.swa. The index of
+    a Project's partitions is cached with its directory's modification time, so another
+    process archiving or removing partitions is noticed at the cost of one stat.
+    """
+
+    def __init__(self, root: str, batch_size: int = 1000):
+        self.root = root
+        self.batch_size = batch_size
+        self._index: dict[int, tuple[int, list[PartitionInfo]]] = {}
+        self._lock = threading.Lock()
+
+    def partition_path(self, project_id: int, month: date) -> str:
+        """
+        Return the file path of a Project's partition for a month.
+        :param project_id: the Project ID
+        :param month: any date in the month
+        :return: the partition file path
+        """
+        return os.path.join(self.root, str(project_id), f"{month:%Y-%m}.swa")
+
+    def index(self, project_id: int) -> list[PartitionInfo]:
+        """
+        Return the headers of a Project's partitions, oldest month first, from the cache
+        unless the Project's directory changed. A directory modified within the last second
+        is not cached, since a second change in the same clock tick would go unnoticed.
+        :param project_id: the Project ID
+        :return: a list of PartitionInfo tuples
+        """
+        directory = os.path.join(self.root, str(project_id))
+        try:
+            modified = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            self.invalidate(project_id)
+            return []
+        with self._lock:
+            cached = self._index.get(project_id)
+        if cached is not None and cached[0] == modified:
+            return cached[1]
+        infos = []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".swa"):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                with Partition(path) as partition:
+                    header = partition.header
+            except FileNotFoundError:
+                continue
+            infos.append(
+                PartitionInfo(
+                    path, header["rows"], tuple(header["first"]), tuple(header["last"])
+                )
+            )
+        if time.time_ns() - modified > 1_000_000_000:
+            with self._lock:
+                self._index[project_id] = (modified, infos)
+        return infos
+
+    def invalidate(self, project_id: int) -> None:
+        """
+        Drop a Project's cached partition index.
+        :param project_id: the Project ID
+        """
+        with self._lock:
+            self._index.pop(project_id, None)
+
+    def partitions(self, project_id: int) -> list[str]:
+        """
+        List a Project's partition files, oldest month first.
+        :param project_id: the Project ID
+        :return: a list of file paths
+        """
+        return [info.path for info in self.index(project_id)]
+
+    def projects(self) -> list[int]:
+        """
+        List the IDs of the Projects with archived readings.
+        :return: a list of Project IDs
+        """
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name) for name in names if name.isdigit())
+
+    def iter_rows(
+        self,
+        project_id: int,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        after: tuple[datetime, int] | None = None,
+        limit: int | None = None,
+    ) -> Iterator[list[dict]]:
+        """
+        Yield a Project's archived readings in a range, one partition at a time. Partitions
+        outside the range are skipped from the index without being opened.
+        :param project_id: the Project ID
+        :param start: the earliest created date, inclusive
+        :param end: the latest created date, exclusive
+        :param after: only return readings after this (created date, ID) position
+        :param limit: the max number of readings to yield in all
+        :return: an iterator of lists of reading dicts ordered by created date and ID
+        """
+        low = (to_micros(start),) if start is not None else None
+        if after is not None:
+            position = (to_micros(after[0]), after[1])
+            low = position if low is None else max(low, position)
+        high = to_micros(end) if end is not None else None
+        remaining = limit
+        for info in self.index(project_id):
+            if low is not None and info.last <= low:
+                continue
+            if high is not None and info.first[0] >= high:
+                continue
+            with Partition(info.path) as partition:
+                rows = partition.read(start, end, after, remaining)
+            if not rows:
+                continue
+            yield rows
+            if remaining is not None:
+                remaining -= len(rows)
+                if remaining <= 0:
+                    return
+
+    def read(
+        self,
+        project_id: int,
+        after: tuple[datetime, int] | None = None,
+        limit: int = 100,
+    ) -> list[ProjectData]:
+        """
+        Read a page of a Project's archived readings as detached ProjectData objects.
+        :param project_id: the Project ID
+        :param after: only return readings after this (created date, ID) position
+        :param limit: the max number of readings to return
+        :return: a list of ProjectData objects ordered by created date and ID
+        """
+        return [
+            ProjectData(**row)
+            for rows in self.iter_rows(project_id, after=after, limit=limit)
+            for row in rows
+        ]
+
+    def duplicate_ids(self, db: Session | Connection, project_id: int) -> set[int]:
+        """
+        Return the IDs of a Project's readings that are archived but still in the database,
+        left behind when a move stopped after writing the partition and before deleting
+        the rows. Only readings no newer than the newest archived one are looked up, and
+        only the partitions they fall in are read.
+        :param db: SQLAlchemy sessionmaker or connection
+        :param project_id: the Project ID
+        :return: a set of ProjectData IDs
+        """
+        index = self.index(project_id)
+        if not index:
+            return set()
+        newest = from_micros(max(info.last for info in index)[0])
+        candidates = {
+            record_id: to_micros(created_date)
+            for record_id, created_date in db.execute(
+                select(ProjectData.id, ProjectData.created_date).where(
+                    ProjectData.project_id == project_id,
+                    ProjectData.created_date <= newest,
+                )
+            )
+        }
+        duplicates = set()
+        for info in index:
+            ids = {
+                record_id
+                for record_id, created in candidates.items()
+                if info.first[0] <= created <= info.last[0]
+            }
+            if ids:
+                with Partition(info.path) as partition:
+                    duplicates.update(ids.intersection(partition.column("id")))
+        return duplicates
+
+    def remove_project(self, project_id: int) -> None:
+        """
+        Delete every partition of a Project.
+        :param project_id: the Project ID
+        """
+        for path in self.partitions(project_id):
+            os.remove(path)
+        try:
+            os.rmdir(os.path.join(self.root, str(project_id)))
+        except OSError:
+            pass
+        self.invalidate(project_id)
+
+    def archive_month(
+        self, bind: Engine, project_id: int, start: datetime, end: datetime
+    ) -> tuple[int, int]:
+        """
+        Move a Project's readings in part of one month into its partition file, merging
+        them with readings archived earlier, then delete them from the database. If the
+        move stops between the two, the readings left in the database are merged into the
+        partition again and deleted by the next run; until then, readers skip them with
+        duplicate_ids.
+        :param bind: SQLAlchemy engine
+        :param project_id: the Project ID
+        :param start: the earliest created date to move, inclusive
+        :param end: the latest created date to move, exclusive, within start's month
+        :return: the number of readings moved and the size of the partition in bytes
+        """
+        columns = [getattr(ProjectData, name) for name in ARCHIVE_COLUMNS]
+        with bind.connect() as connection:
+            moved = [
+                row._asdict()
+                for row in connection.execute(
+                    select(*columns)
+                    .where(
+                        ProjectData.project_id == project_id,
+                        ProjectData.created_date >= start,
+                        ProjectData.created_date < end,
+                    )
+                    .order_by(ProjectData.created_date, ProjectData.id)
+                )
+            ]
+        if not moved:
+            return 0, 0
+        path = self.partition_path(project_id, start)
+        rows = {}
+        if os.path.exists(path):
+            with Partition(path) as partition:
+                rows = {row["id"]: row for row in partition.read()}
+        rows.update((row["id"], row) for row in moved)
+        size = write_partition(
+            path,
+            project_id,
+            sorted(
+                rows.values(),
+                key=lambda row: (naive_utc(row["created_date"]), row["id"]),
+            ),
+        )
+        self.invalidate(project_id)
+        ids = [row["id"] for row in moved]
+        for first in range(0, len(ids), self.batch_size):
+            last = first + self.batch_size
+            with bind.begin() as connection:
+                connection.execute(
+                    delete(ProjectData).where(ProjectData.id.in_(ids[first:last]))
+                )
+        return len(moved), size
+
+    def archive(self, bind: Engine, before: datetime) -> dict:
+        """
+        Move every reading created before a cutoff into the archive, month by month.
+        :param bind: SQLAlchemy engine
+        :param before: readings created before this time are archived
+        :return: dict report of the readings moved per Project and the partitions written
+        """
+        before = naive_utc(before)
+        projects, partitions, size = {}, 0, 0
+        with bind.connect() as connection:
+            oldest = connection.execute(
+                select(ProjectData.project_id, func.min(ProjectData.created_date))
+                .where(ProjectData.created_date < before)
+                .group_by(ProjectData.project_id)
+            ).all()
+        for project_id, first in oldest:
+            month = naive_utc(first).replace(
+                day=1, hour=0, minute=0, second=0, microsecond=0
+            )
+            while month < before:
+                following = (month + timedelta(days=32)).replace(day=1)
+                moved, written = self.archive_month(
+                    bind, project_id, month, min(following, before)
+                )
+                if moved:
+                    projects[project_id] = projects.get(project_id, 0) + moved
+                    partitions += 1
+                    size += written
+                month = following
+        report = {
+            "rows_archived": sum(projects.values()),
+            "partitions_written": partitions,
+            "bytes_written": size,
+            "projects": projects,
+        }
+        logger.info(
+            "Archived %d readings into %d partitions",
+            report["rows_archived"],
+            partitions,
+        )
+        return report
+
+
+def merge_page(
+    archived: list[ProjectData], hot: list[ProjectData], skip: int, limit: int
+) -> list[ProjectData]:
+    """
+    Merge a page of archived readings with a page of database readings.
+    :param archived: archived readings ordered by created date and ID
+    :param hot: database readings ordered by created date and ID
+    :param skip: the number of merged readings to skip
+    :param limit: the max number of readings to return
+    :return: a list of ProjectData objects ordered by created date and ID
+    """
+    merged, seen = [], set()
+    for record in heapq.merge(
+        archived, hot, key=lambda record: (naive_utc(record.created_date), record.id)
+    ):
+        if record.id not in seen:
+            seen.add(record.id)
+            merged.append(record)
+    return merged[skip:][:limit]
+
+
+archive_store = ArchiveStore(
+    active_config.ARCHIVE_PATH, batch_size=active_config.ARCHIVE_BATCH_SIZE
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old sensor readings")
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=active_config.ARCHIVE_AFTER_DAYS,
+        help="archive readings older than this many days",
+    )
+    args = parser.parse_args()
+    if args.days is None:
+        parser.error("set --days or ARCHIVE_AFTER_DAYS")
+    logging.basicConfig(level=logging.INFO)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.days)
+    print(json.dumps(archive_store.archive(engine, cutoff), indent=2))
@@ -0,0 +1,448 @@
+"""
+Asyncio counterparts of the functions in seedweb.crud, built on AsyncSession. They execute
+the same statements from seedweb.statements and keep the status cache and broker up to
+date the same way, and share the payload parsing and rollup code with crud by running it on
+the session's sync facade.
+"""
+
+from typing import Any
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import Executable
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from seedweb import archive, crud, purge, rollups, schemas, statements
+from seedweb.broker import status_broker
+from seedweb.cache import StatusEntry, status_cache
+from seedweb.models import Profile, Project, ProjectData, ProjectNotes
+from seedweb.pagination import decode_cursor
+
+
+async def write_returning(db: AsyncSession, statement: Executable) -> Any | None:
+    """
+    Execute a single INSERT, UPDATE or DELETE ... RETURNING statement and commit. The async
+    session does not expire objects on commit, so a returned model object keeps the values
+    RETURNING loaded.
+    :param db: SQLAlchemy AsyncSession
+    :param statement: a statement returning a model or a column of at most one row
+    :return: the returned model object or value, or None if no row matched
+    """
+    record = await db.scalar(statement.execution_options(populate_existing=True))
+    await db.commit()
+    return record
+
+
+async def get_profile(db: AsyncSession, profile_id: int) -> Profile | None:
+    """
+    Given a Profile ID, return a Profile record.
+    :param db: SQLAlchemy AsyncSession
+    :param profile_id: The ID of the Profile to return
+    :return: a Profile object
+    """
+    return await db.scalar(statements.profile_by_id(profile_id))
+
+
+async def get_profiles(
+    db: AsyncSession, skip: int = 0, limit: int = 100
+) -> list[Profile]:
+    """
+    Return a list of Profiles
+    :param db: SQLAlchemy AsyncSession
+    :param skip: int - the number of Profiles to skip
+    :param limit: int - the total number of Profiles to return
+    :return: a list of database Profile objects.
+    """
+    return list(await db.scalars(statements.profiles_page(skip, limit)))
+
+
+async def create_profile(db: AsyncSession, profile: schemas.ProfileCreate) -> Profile:
+    """
+    Create a Profile and write it to the DB.
+    :param db: SQLAlchemy AsyncSession
+    :param profile: Pydantic schema for the Profile model
+    :return: a Profile object
+    """
+    return await write_returning(db, statements.insert_profile(profile))
+
+
+async def update_profile(
+    db: AsyncSession, profile_id: int, profile: schemas.ProfileCreate
+) -> Profile | None:
+    """
+    Given a Profile ID, update a Profile record.
+    :param db: SQLAlchemy AsyncSession
+    :param profile_id: int - the Profile ID
+    :param profile: dict - the Profile object
+    :return: a Profile object or None if the Profile does not exist
+    """
+    db_profile = await write_returning(
+        db, statements.update_profile(profile_id, profile)
+    )
+    if db_profile is None:
+        return None
+    status_cache.update_profile(profile_id, db_profile.colors)
+    status_broker.publish_profile(profile_id)
+    return db_profile
+
+
+async def delete_profile(db: AsyncSession, profile_id: int) -> JSONResponse | None:
+    """
+    Given a Profile ID, delete a Profile record.
+    :param db: SQLAlchemy AsyncSession
+    :param profile_id: The Profile ID
+    :return: JSONResponse object with deletion confirmation or None if the Profile does not
+        exist
+    """
+    name = await write_returning(db, statements.delete_profile(profile_id))
+    if name is None:
+        return None
+    status_cache.invalidate_profile(profile_id)
+    status_broker.publish_profile(profile_id)
+    return JSONResponse(content={"profile": f"Profile: {name} deleted"})
+
+
+async def get_project(
+    db: AsyncSession, project_id: int, data_limit: int, notes_limit: int
+) -> schemas.Project | None:
+    """
+    Given a Project ID, return a Project with its latest data and notes, each
+    collection read with its own bounded query.
+    :param db: SQLAlchemy AsyncSession
+    :param project_id: The Project ID
+    :param data_limit: The max number of ProjectData records to embed
+    :param notes_limit: The max number of ProjectNotes records to embed
+    :return: a Project schema object or None if the Project does not exist
+    """
+    db_project = await db.scalar(
+        statements.project_by_id(project_id).execution_options(populate_existing=True)
+    )
+    if db_project is None:
+        return None
+    data = list(await db.scalars(statements.latest_data(project_id, data_limit)))
+    notes = list(await db.scalars(statements.latest_notes(project_id, notes_limit)))
+    return crud.project_detail(db_project, data, notes, data_limit, notes_limit)
+
+
+async def get_projects(
+    db: AsyncSession, skip: int = 0, limit: int = 100
+) -> list[Project]:
+    """
+    Return a list of Project records.
+    :param db: SQLAlchemy AsyncSession
+    :param skip: The number of Projects to skip
+    :param limit: The max number of Projects to return.
+    :return: a list of Project objects
+    """
+    return list(await db.scalars(statements.projects_page(skip, limit)))
+
+
+async def create_project(
+    db: AsyncSession, project: schemas.ProjectCreate
+) -> schemas.Project:
+    """
+    Create a Project object and write it to the database.
+    :param db: SQLAlchemy AsyncSession
+    :param project: the Project object.
+    :return: a Project schema object, with no data or notes yet.
+    """
+    db_project = await write_returning(db, statements.insert_project(project))
+    status_cache.invalidate(db_project.id)
+    return crud.project_detail(db_project, [], [], data_limit=0, notes_limit=0)
+
+
+async def get_status_entry(db: AsyncSession, project_id: int) -> StatusEntry | None:
+    """
+    Return the compiled schedule and Profile colors of a Project, from the status cache when
+    present.
+    :param db: SQLAlchemy AsyncSession
+    :param project_id: The Project ID
+    :return: a StatusEntry or None if the Project does not exist
+    """
+    entry = status_cache.get(project_id)
+    if entry is None:
+        row = (await db.execute(statements.status_rows([project_id]))).first()
+        if row is None:
+            return None
+        entry = StatusEntry.build(
+            row.profile_id, row.start, row.end, row.colors, row.timezone
+        )
+        status_cache.set(project_id, entry)
+    return entry
+
+
+async def update_project(
+    db: AsyncSession, project_id: int, project: schemas.ProjectCreate
+) -> Project | None:
+    """
+    Given a Project ID, update a Project record.
+    :param db: SQLAlchemy AsyncSession
+    :param project_id: the Project ID
+    :param project: the Project object.
+    :return: a Project model object or None if the Project does not exist
+    """
+    db_project = await write_returning(
+        db, statements.update_project(project_id, project)
+    )
+    if db_project is None:
+        return None
+    status_cache.invalidate(project_id)
+    status_broker.publish_project(project_id)
+    return db_project
+
+
+async def delete_project(db: AsyncSession, project_id: int) -> JSONResponse | None:
+    """
+    Given a Project ID, delete a Project record. The database deletes its data, notes and
+    rollups through the foreign keys' ON DELETE CASCADE.
+    :param db: SQLAlchemy AsyncSession
+    :param project_id: the Project ID
+    :return: JSONResponse object with deletion confirmation or None if the Project does not
+        exist
+    """
+    name = await write_returning(db, statements.delete_project(project_id))
+    if name is None:
+        return None
+    await run_in_threadpool(archive.archive_store.remove_project, project_id)
+    status_cache.invalidate(project_id)
+    status_broker.publish_project(project_id)
+    return JSONResponse(content={"project": f"Project: {name} deleted"})
+
+
+async def schedule_project_purge(
+    db: AsyncSession, project_id: int
+) -> JSONResponse | None:
+    """
+    Mark a Project as waiting to be purged and hand it to the purge job, as
+    crud.schedule_project_purge does.
+    :param db: SQLAlchemy AsyncSession
+    :param project_id: the Project ID
+    :return: JSONResponse object with a 202 status or None if the Project does not exist
+    """
+    name = await write_returning(db, statements.request_purge(project_id))
+    if name is None:
+        return None
+    status_cache.invalidate(project_id)
+    status_broker.publish_project(project_id)
+    purge.purge_job.submit(project_id)
+    return JSONResponse(
+        status_code=202, content={"project": f"Project: {name} deletion scheduled"}
+    )
+
+
+async def get_project_data(
+    db: AsyncSession, project_data_id: int
+) -> ProjectData | None:
+    """
+    Given a ProjectData ID, return a ProjectData record.
+    :param db: SQLAlchemy AsyncSession
+    :param project_data_id: the Project Data ID
+    :return: a ProjectData model object
+    """
+    return await db.scalar(statements.project_data_by_id(project_data_id))
+
+
+async def get_projects_data(
+    db: AsyncSession,
+    project_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+) -> list[ProjectData]:
+    """
+    Given a Project ID, return a list of ProjectData associated with the Project, ordered by
+    created date. Pass the cursor of the previous page to seek straight to the next one.
+    Pages reaching back past the oldest reading in the database include archived readings.
+    :param db: SQLAlchemy AsyncSession
+    :param project_id: the Project ID
+    :param skip: the number of records to skip
+    :param limit: the max number of ProjectData to return
+    :param cursor: a cursor from pagination.next_cursor
+    :return: a list of ProjectData objects.
+    :raises ValueError: if the cursor is malformed
+    """
+    query = statements.project_data_page(project_id, cursor, limit)
+    position = decode_cursor(cursor) if cursor is not None else None
+    archived = await run_in_threadpool(
+        archive.archive_store.read, project_id, position, skip + limit
+    )
+    if not archived:
+        return list(await db.scalars(query.offset(skip)))
+    hot = list(await db.scalars(query.limit(skip + limit)))
+    return archive.merge_page(archived, hot, skip, limit)
+
+
+async def create_project_data(
+    db: AsyncSession, project_data: schemas.ProjectDataCreate
+) -> ProjectData:
+    """
+    Create a ProjectData object and write it to the database.
+    :param db: SQLAlchemy AsyncSession
+    :param project_data: a ProjectDataCreate object
+    :return: a ProjectData object
+    """
+    return await add_project_data(db, crud.reading_row(project_data))
+
+
+async def add_project_data(db: AsyncSession, row: dict) -> ProjectData:
+    """
+    Write a ProjectData row whose typed sensor columns are already filled in, with a single
+    INSERT ... RETURNING, and fold it into the rollups in the same transaction.
+    :param db: SQLAlchemy AsyncSession
+    :param row: dict of ProjectData column values
+    :return: a ProjectData object
+    """
+    db_project_data = await db.scalar(
+        statements.insert_project_data(row).execution_options(populate_existing=True)
+    )
+    await db.run_sync(
+        rollups.apply_readings,
+        [(db_project_data.project_id, db_project_data.created_date, row)],
+    )
+    await db.commit()
+    return db_project_data
+
+
+async def create_project_data_bulk(
+    db: AsyncSession, project_data: list[schemas.ProjectDataCreate]
+) -> schemas.ProjectDataBulkResult:
+    """
+    Validate a batch of ProjectData and write it to the database in a single transaction.
+    Nothing is written if any reading is rejected.
+    :param db: SQLAlchemy AsyncSession
+    :param project_data: a list of ProjectDataCreate objects, possibly for several Projects
+    :return: a ProjectDataBulkResult with the created IDs or the per-reading errors
+    """
+    return await db.run_sync(crud.create_project_data_bulk, project_data)
+
+
+async def update_project_data(
+    db: AsyncSession, project_data_id: int, project_data: schemas.ProjectDataCreate
+) -> ProjectData | None:
+    """
+    Update a ProjectData record and recompute the rollups of the buckets it falls in, as
+    crud.update_project_data does.
+    :param db: SQLAlchemy AsyncSession
+    :param project_data_id: The ProjectData ID
+    :param project_data: a ProjectDataCreate object with which to update the data
+    :return: a ProjectData object or None if the record does not exist
+    """
+    row = crud.reading_row(project_data)
+    old_project_id = row["project_id"]
+    db_project_data = await db.scalar(
+        statements.update_project_data(project_data_id, row, old_project_id)
+    )
+    if db_project_data is None:
+        old_project_id = await db.scalar(statements.project_data_owner(project_data_id))
+        if old_project_id is not None:
+            db_project_data = await db.scalar(
+                statements.update_project_data(project_data_id, row, old_project_id)
+            )
+    if db_project_data is None:
+        await db.rollback()
+        return None
+    created_date = db_project_data.created_date
+    await db.run_sync(
+        rollups.refresh_readings,
+        {(old_project_id, created_date), (db_project_data.project_id, created_date)},
+    )
+    await db.commit()
+    return db_project_data
+
+
+async def delete_project_data(
+    db: AsyncSession, project_data_id: int
+) -> JSONResponse | None:
+    """
+    Delete a ProjectData record and recompute the rollups of the buckets it fell in, as
+    crud.delete_project_data does.
+    :param db: SQLAlchemy AsyncSession
+    :param project_data_id: The ProjectData ID
+    :return: JSONResponse object with deletion confirmation or None if the record does not
+        exist
+    """
+    deleted = (
+        await db.execute(statements.delete_project_data(project_data_id))
+    ).first()
+    if deleted is None:
+        await db.rollback()
+        return None
+    await db.run_sync(rollups.refresh_readings, [tuple(deleted)])
+    await db.commit()
+    return JSONResponse(content={"data": f"Project Data: {project_data_id} deleted"})
+
+
+async def get_project_note(
+    db: AsyncSession, project_note_id: int
+) -> ProjectNotes | None:
+    """
+    Given a ProjectNote ID, return a ProjectNote record.
+    :param db: SQLAlchemy AsyncSession
+    :param project_note_id: the ProjectNote ID
+    :return: return a ProjectNotes record object.
+    """
+    return await db.scalar(statements.project_note_by_id(project_note_id))
+
+
+async def get_projects_notes(
+    db: AsyncSession,
+    project_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+) -> list[ProjectNotes]:
+    """
+    Given a Project ID, return a list of ProjectNotes associated with the Project, ordered by
+    created date. Pass the cursor of the previous page to seek straight to the next one.
+    :param db: SQLAlchemy AsyncSession
+    :param project_id: the Project ID
+    :param skip: the number of records to skip
+    :param limit: the max number of results to return
+    :param cursor: a cursor from pagination.next_cursor
+    :return: a list of ProjectNote objects
+    :raises ValueError: if the cursor is malformed
+    """
+    query = statements.project_notes_page(project_id, cursor, limit)
+    return list(await db.scalars(query.offset(skip)))
+
+
+async def create_project_note(
+    db: AsyncSession, project_note: schemas.ProjectNotesCreate
+) -> ProjectNotes:
+    """
+    Create a note to associate with a Project with the given Project ID.
+    :param db: SQLAlchemy AsyncSession
+    :param project_note: The ProjectNote
+    :return: a ProjectNote object
+    """
+    return await write_returning(db, statements.insert_project_note(project_note))
+
+
+async def update_project_note(
+    db: AsyncSession, project_note_id: int, project_note: schemas.ProjectNotesCreate
+) -> ProjectNotes | None:
+    """
+    Given a ProjectNote ID, update the ProjectNote
+    :param db: SQLAlchemy AsyncSession
+    :param project_note_id: The ProjectNote ID
+    :param project_note: The ProjectNote object
+    :return: a ProjectNote object or None if the note does not exist
+    """
+    return await write_returning(
+        db, statements.update_project_note(project_note_id, project_note)
+    )
+
+
+async def delete_project_note(
+    db: AsyncSession, project_note_id: int
+) -> JSONResponse | None:
+    """
+    Given a ProjectNote ID, delete the ProjectNote record
+    :param db: SQLAlchemy AsyncSession
+    :param project_note_id: a ProjectNote ID
+    :return: JSONResponse object or None if the note does not exist
+    """
+    deleted = await write_returning(db, statements.delete_project_note(project_note_id))
+    if deleted is None:
+        return None
+    return JSONResponse(content={"note": f"Project Note: {project_note_id} deleted"})
@@ -0,0 +1,516 @@
+"""
+The CRUD routes as async def endpoints backed by AsyncSession. While a request waits on the
+database the event loop serves other requests, instead of each waiting request holding one
+of the threadpool slots the sync routes run in. Enabled with ASYNC_DATABASE_ENABLED, in
+which case use_async_routes swaps these in for their sync counterparts in seedweb.main.
+"""
+
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import active_config
+from seedweb import async_crud, crud, ingest, schemas, wire
+from seedweb.database import AsyncSessionLocal
+from seedweb.etag import etag_response
+from seedweb.models import Profile, Project, ProjectData, ProjectNotes
+from seedweb.pagination import set_next_cursor
+from seedweb.serialization import list_response
+
+router = APIRouter()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Create a new asyncio database session.
+    :return: SQLAlchemy AsyncSession
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def use_async_routes(app: FastAPI) -> None:
+    """
+    Replace the app's sync routes with the async routes for the same paths and methods.
+    :param app: the FastAPI application
+    """
+    replaced = {
+        (route.path, method) for route in router.routes for method in route.methods
+    }
+    app.router.routes = [
+        route
+        for route in app.router.routes
+        if not isinstance(route, APIRoute)
+        or not any((route.path, method) in replaced for method in route.methods)
+    ]
+    app.include_router(router)
+    app.openapi_schema = None
+
+
+@router.post("/profiles/", response_model=schemas.Profile)
+async def create_profile(
+    profile: schemas.ProfileCreate, db: AsyncSession = Depends(get_async_db)
+) -> Profile:
+    """
+    Endpoint for creating a Profile
+    :param profile: Pydantic schema for the Profile model
+    :param db: SQLAlchemy AsyncSession
+    :return: json response
+    """
+    return await async_crud.create_profile(db=db, profile=profile)
+
+
+@router.get("/profiles/", response_model=list[schemas.Profile])
+async def get_profiles(
+    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)
+) -> Response | list[Profile]:
+    """
+    Endpoint to return a list of Profiles
+    :param skip: int - the number of Profiles to skip
+    :param limit: int - the total number of Profiles to return
+    :param db: SQLAlchemy AsyncSession
+    :return: json response
+    """
+    profiles = await async_crud.get_profiles(db, skip=skip, limit=limit)
+    if active_config.FAST_LIST_RESPONSES:
+        return list_response(profiles, schemas.Profile)
+    return profiles
+
+
+@router.get("/profiles/{profile_id}", response_model=schemas.Profile)
+async def get_profile(
+    profile_id: int, request: Request, db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    """
+    An endpoint to return a Profile given a Profile ID. Answers If-None-Match with a 304
+    when the Profile is unchanged.
+    :param profile_id: int - the Profile ID
+    :param request: the incoming request
+    :param db: SQLAlchemy AsyncSession
+    :return: json response
+    """
+    db_profile = await async_crud.get_profile(db, profile_id=profile_id)
+    if db_profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return etag_response(
+        request, schemas.Profile.model_validate(db_profile, from_attributes=True)
+    )
+
+
+@router.patch("/profiles/{profile_id}", response_model=schemas.Profile)
+async def update_profile(
+    profile_id: int,
+    profile: schemas.ProfileCreate,
+    db: AsyncSession = Depends(get_async_db),
+) -> Profile:
+    """
+    An endpoint to update a Profile
+    :param profile_id: int - the Profile ID
+    :param profile: dict - the Profile object
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    db_profile = await async_crud.update_profile(
+        db, profile_id=profile_id, profile=profile
+    )
+    if db_profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return db_profile
+
+
+@router.delete("/profiles/{profile_id}")
+async def delete_profile(
+    profile_id: int, db: AsyncSession = Depends(get_async_db)
+) -> JSONResponse:
+    """
+    An endpoint to delete a given Profile.
+    :param profile_id: int - the Profile ID
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    db_profile = await async_crud.delete_profile(db, profile_id=profile_id)
+    if db_profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return db_profile
+
+
+@router.post("/projects/", response_model=schemas.Project)
+async def create_project(
+    project: schemas.ProjectCreate, db: AsyncSession = Depends(get_async_db)
+) -> schemas.Project:
+    """
+    Endpoint for creating a Project
+    :param project: Pydantic schema for the Project model
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    return await async_crud.create_project(db=db, project=project)
+
+
+@router.get("/projects/", response_model=list[schemas.ProjectList])
+async def get_projects(
+    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)
+) -> list[Project]:
+    """
+    Endpoint to return a list of Projects
+    :param skip: int - the number of Projects to skip
+    :param limit: int - the total number of Projects to return
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    return await async_crud.get_projects(db, skip=skip, limit=limit)
+
+
+@router.get("/projects/{project_id}", response_model=schemas.Project)
+async def get_project(
+    project_id: int,
+    request: Request,
+    data_limit: int = Query(active_config.PROJECT_DETAIL_LIMIT, ge=0, le=1000),
+    notes_limit: int = Query(active_config.PROJECT_DETAIL_LIMIT, ge=0, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+) -> Response:
+    """
+    An endpoint to return a Project given a Project ID. Answers If-None-Match with a 304
+    when the Project is unchanged. Only the latest data and notes are embedded; links
+    point to the full listings when there are older records.
+    :param project_id: int - the Project ID
+    :param request: the incoming request
+    :param data_limit: int - the max number of Project Data records to embed
+    :param notes_limit: int - the max number of Project Notes records to embed
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    db_project = await async_crud.get_project(
+        db, project_id=project_id, data_limit=data_limit, notes_limit=notes_limit
+    )
+    if db_project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return etag_response(request, db_project)
+
+
+@router.get("/projects/{project_id}/status")
+async def get_project_status(
+    project_id: int, request: Request, db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    """
+    An endpoint to return a Projects status. The status determines if the lights should be
+    on or off based on the start and end values.
+    :param project_id: int - the Project ID
+    :param request: the incoming request
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    entry = await async_crud.get_status_entry(db, project_id=project_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    content = crud.status_content(entry)
+    return etag_response(request, content, etag=crud.status_etag(entry, content))
+
+
+@router.patch("/projects/{project_id}", response_model=schemas.ProjectList)
+async def update_project(
+    project_id: int,
+    project: schemas.ProjectUpdate,
+    db: AsyncSession = Depends(get_async_db),
+) -> Project:
+    """
+    An endpoint to update a Project.
+    :param project_id: int - the Project ID
+    :param project: the Project object
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    db_project = await async_crud.update_project(
+        db, project_id=project_id, project=project
+    )
+    if db_project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return db_project
+
+
+@router.delete(
+    "/projects/{project_id}",
+    responses={202: {"description": "Project scheduled for a chunked purge"}},
+)
+async def delete_project(
+    project_id: int, chunked: bool = False, db: AsyncSession = Depends(get_async_db)
+) -> JSONResponse:
+    """
+    An endpoint to delete a given Project. With chunked, the Project is handed to the purge
+    job, which deletes its records in batches, and a 202 is returned at once.
+    :param project_id: int - the Project ID
+    :param chunked: bool - delete the Project's records in batches in the background
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    if chunked:
+        db_project = await async_crud.schedule_project_purge(db, project_id=project_id)
+    else:
+        db_project = await async_crud.delete_project(db, project_id=project_id)
+    if db_project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return db_project
+
+
+@router.post(
+    "/projects/{project_id}/data/",
+    response_model=schemas.ProjectData,
+    responses={202: {"description": "Reading queued for a later group commit"}},
+    openapi_extra=wire.READING_OPENAPI,
+)
+async def create_project_data(
+    project_data: schemas.ProjectDataCreate | dict = Depends(wire.reading_body),
+    db: AsyncSession = Depends(get_async_db),
+) -> ProjectData | JSONResponse:
+    """
+    Endpoint for creating Project Data, posted as JSON or in the binary format of
+    seedweb.wire. When queued ingestion is running the reading is handed to the writer
+    thread and a 202 is returned instead of the created record. A reading that arrives
+    while the writer is stopping is written at once.
+    :param project_data: Pydantic schema for the ProjectData model, or the ProjectData row
+        decoded from a binary reading
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    if ingest.ingest_queue.running:
+        try:
+            await run_in_threadpool(
+                ingest.ingest_queue.put,
+                ingest.queued_reading(project_data),
+                timeout=active_config.INGEST_ENQUEUE_TIMEOUT,
+            )
+        except ingest.IngestQueueFull:
+            raise HTTPException(
+                status_code=503,
+                detail="Ingestion queue is full",
+                headers={"Retry-After": "1"},
+            )
+        except ingest.IngestQueueStopped:
+            pass
+        else:
+            return JSONResponse(status_code=202, content={"queued": True})
+    if isinstance(project_data, dict):
+        return await async_crud.add_project_data(db, project_data)
+    return await async_crud.create_project_data(db=db, project_data=project_data)
+
+
+@router.post("/projects/data/bulk", response_model=schemas.ProjectDataBulkResult)
+async def create_project_data_bulk(
+    project_data: list[schemas.ProjectDataCreate],
+    db: AsyncSession = Depends(get_async_db),
+) -> schemas.ProjectDataBulkResult | JSONResponse:
+    """
+    Endpoint for creating a batch of Project Data, possibly for several Projects, in one
+    transaction. Returns the created IDs or, with a 422, the reasons each reading was rejected.
+    :param project_data: a list of Pydantic schemas for the ProjectData model
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    result = await async_crud.create_project_data_bulk(db=db, project_data=project_data)
+    if result.errors:
+        return JSONResponse(status_code=422, content=result.model_dump())
+    return result
+
+
+@router.get("/projects/{project_id}/data/", response_model=list[schemas.ProjectData])
+async def get_projects_data(
+    project_id: int,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+) -> Response | list[ProjectData]:
+    """
+    Endpoint to return a list of Project Data. The X-Next-Cursor header holds the cursor
+    for the next page when there may be more records.
+    :param project_id: int - The Project ID
+    :param response: the outgoing response
+    :param skip: int - the number of records to skip
+    :param limit: int - the total number of records to return
+    :param cursor: str - the X-Next-Cursor value of the previous page
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    try:
+        db_data = await async_crud.get_projects_data(
+            db, project_id=project_id, skip=skip, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    set_next_cursor(response, db_data, limit)
+    if active_config.FAST_LIST_RESPONSES:
+        return list_response(db_data, schemas.ProjectData, response.headers)
+    return db_data
+
+
+@router.get(
+    "/projects/{project_id}/data/{project_data_id}", response_model=schemas.ProjectData
+)
+async def get_project_data(
+    project_data_id: int, db: AsyncSession = Depends(get_async_db)
+) -> ProjectData:
+    """
+    An endpoint to return Project Data given an ID
+    :param project_data_id: int - The ID of the Project Data
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    db_data = await async_crud.get_project_data(db, project_data_id=project_data_id)
+    if db_data is None:
+        raise HTTPException(status_code=404, detail="Project Data not found")
+    return db_data
+
+
+@router.patch(
+    "/projects/{project_id}/data/{project_data_id}", response_model=schemas.ProjectData
+)
+async def update_project_data(
+    project_data_id: int,
+    project_data: schemas.ProjectDataCreate,
+    db: AsyncSession = Depends(get_async_db),
+) -> ProjectData:
+    """
+    An endpoint to update Project Data.
+    :param project_data_id: Project Data ID
+    :param project_data: A JSON data object of the project data.
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    db_data = await async_crud.update_project_data(
+        db, project_data_id=project_data_id, project_data=project_data
+    )
+    if db_data is None:
+        raise HTTPException(status_code=404, detail="Project Data not found")
+    return db_data
+
+
+@router.delete("/projects/{project_id}/data/{project_data_id}")
+async def delete_project_data(
+    project_data_id: int, db: AsyncSession = Depends(get_async_db)
+) -> JSONResponse:
+    """
+    An endpoint to delete a Project Data record.
+    :param project_data_id: The Project Data ID
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    db_project_data = await async_crud.delete_project_data(
+        db, project_data_id=project_data_id
+    )
+    if db_project_data is None:
+        raise HTTPException(status_code=404, detail="Project Data not found")
+    return db_project_data
+
+
+@router.post("/projects/{project_id}/notes/", response_model=schemas.ProjectNotes)
+async def create_project_note(
+    project_notes: schemas.ProjectNotesCreate,
+    db: AsyncSession = Depends(get_async_db),
+) -> ProjectNotes:
+    """
+    Endpoint for creating Project Notes
+    :param project_notes: Pydantic schema for the ProjectNotes model
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    return await async_crud.create_project_note(db=db, project_note=project_notes)
+
+
+@router.get("/projects/{project_id}/notes/", response_model=list[schemas.ProjectNotes])
+async def get_projects_notes(
+    project_id: int,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+) -> Response | list[ProjectNotes]:
+    """
+    Endpoint to return a list of Project Notes. The X-Next-Cursor header holds the cursor
+    for the next page when there may be more records.
+    :param project_id: int - The Project ID
+    :param response: the outgoing response
+    :param skip: int - the number of records to skip
+    :param limit: int - the total number of records to return
+    :param cursor: str - the X-Next-Cursor value of the previous page
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    try:
+        db_project_note = await async_crud.get_projects_notes(
+            db, project_id=project_id, skip=skip, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    set_next_cursor(response, db_project_note, limit)
+    if active_config.FAST_LIST_RESPONSES:
+        return list_response(db_project_note, schemas.ProjectNotes, response.headers)
+    return db_project_note
+
+
+@router.get(
+    "/projects/{project_id}/notes/{project_note_id}",
+    response_model=schemas.ProjectNotes,
+)
+async def get_project_note(
+    project_note_id: int, db: AsyncSession = Depends(get_async_db)
+) -> ProjectNotes:
+    """
+    An endpoint to return a Project Note given an ID.
+    :param project_note_id: int - The ID of the Project Note
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    db_project_note = await async_crud.get_project_note(
+        db, project_note_id=project_note_id
+    )
+    if db_project_note is None:
+        raise HTTPException(status_code=404, detail="Project Note not found")
+    return db_project_note
+
+
+@router.patch(
+    "/projects/{project_id}/notes/{project_note_id}",
+    response_model=schemas.ProjectNotes,
+)
+async def update_project_note(
+    project_note_id: int,
+    project_note: schemas.ProjectNotesCreate,
+    db: AsyncSession = Depends(get_async_db),
+) -> ProjectNotes:
+    """
+    An endpoint to update a Project Note
+    :param project_note_id: Project Note ID
+    :param project_note: A JSON data object of the project note.
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    db_project_note = await async_crud.update_project_note(
+        db, project_note_id=project_note_id, project_note=project_note
+    )
+    if db_project_note is None:
+        raise HTTPException(status_code=404, detail="Project Note not found")
+    return db_project_note
+
+
+@router.delete("/projects/{project_id}/notes/{project_note_id}")
+async def delete_project_note(
+    project_note_id: int, db: AsyncSession = Depends(get_async_db)
+) -> JSONResponse:
+    """
+    An endpoint to delete a Project Note record.
+    :param project_note_id: The Project Note ID
+    :param db: SQLAlchemy AsyncSession
+    :return: JSON response
+    """
+    db_project_note = await async_crud.delete_project_note(
+        db, project_note_id=project_note_id
+    )
+    if db_project_note is None:
+        raise HTTPException(status_code=404, detail="Project Note not found")
+    return db_project_note
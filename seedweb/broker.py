@@ -0,0 +1,88 @@
+import asyncio
+from collections import defaultdict
+from typing import Iterable
+
+
+class Subscription:
+    """A status stream waiting for changes to one Project"""
+
+    __slots__ = ("project_id", "profile_id", "event")
+
+    def __init__(self, project_id: int):
+        self.project_id = project_id
+        self.profile_id: int | None = None
+        self.event = asyncio.Event()
+
+
+class StatusBroker:
+    """
+    Wakes status streams when their Project or Profile is written. Subscriptions live on a
+    single event loop; publish may be called from any thread.
+    """
+
+    def __init__(self):
+        self._subscriptions: dict[int, set[Subscription]] = defaultdict(set)
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def __len__(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def subscribe(self, project_id: int) -> Subscription:
+        """
+        Register a stream for a Project. Must be called on the event loop.
+        :param project_id: the Project ID
+        :return: a Subscription
+        """
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(project_id)
+        self._subscriptions[project_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Remove a stream. Must be called on the event loop.
+        :param subscription: the Subscription to remove
+        """
+        subscriptions = self._subscriptions.get(subscription.project_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.project_id]
+
+    def publish_project(self, project_id: int) -> None:
+        """
+        Wake the streams of a Project.
+        :param project_id: the Project ID
+        """
+        self._call_soon(self._wake_project, project_id)
+
+    def publish_profile(self, profile_id: int) -> None:
+        """
+        Wake the streams of every Project last seen using a Profile.
+        :param profile_id: the Profile ID
+        """
+        self._call_soon(self._wake_profile, profile_id)
+
+    def _call_soon(self, callback, *args) -> None:
+        """Schedule a callback on the subscribers' event loop, if there is one"""
+        if self._loop is None or not self._subscriptions:
+            return
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            self._loop = None
+
+    @staticmethod
+    def _wake(subscriptions: Iterable[Subscription]) -> None:
+        for subscription in list(subscriptions):
+            subscription.event.set()
+
+    def _wake_project(self, project_id: int) -> None:
+        self._wake(self._subscriptions.get(project_id, ()))
+
+    def _wake_profile(self, profile_id: int) -> None:
+        for subscriptions in self._subscriptions.values():
+            self._wake(s for s in subscriptions if s.profile_id == profile_id)
+
+
+status_broker = StatusBroker()
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import time
+from typing import Any, NamedTuple
+
+from config import active_config
+from seedweb.schedule import Schedule
+
+
+class StatusEntry(NamedTuple):
+    """The parts of a Project and its Profile needed to answer a status poll"""
+
+    profile_id: int | None
+    start: time
+    end: time
+    colors: Any
+    version: str
+    timezone: str | None
+    schedule: Schedule
+
+    @classmethod
+    def build(
+        cls,
+        profile_id: int | None,
+        start: time,
+        end: time,
+        colors: Any,
+        timezone: str | None = None,
+    ) -> "StatusEntry":
+        """
+        Create an entry, compiling its Schedule, whose version changes whenever the schedule
+        or colors change.
+        :param profile_id: the Profile ID
+        :param start: the Project start time
+        :param end: the Project end time
+        :param colors: the Profile colors
+        :param timezone: the Project timezone
+        :return: a StatusEntry
+        """
+        key = json.dumps(
+            [profile_id, str(start), str(end), colors, timezone], sort_keys=True
+        )
+        version = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+        schedule = Schedule.compile(start, end, timezone)
+        return cls(profile_id, start, end, colors, version, timezone, schedule)
+
+
+class StatusCache:
+    """
+    A process-local, size-bounded LRU cache of StatusEntry records keyed by Project ID.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, StatusEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, project_id: int) -> StatusEntry | None:
+        """
+        Return the cached entry for a Project and mark it as most recently used.
+        :param project_id: the Project ID
+        :return: a StatusEntry or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(project_id)
+            self.hits += 1
+            return entry
+
+    def set(self, project_id: int, entry: StatusEntry) -> None:
+        """
+        Store an entry, evicting the least recently used entries beyond max_size.
+        :param project_id: the Project ID
+        :param entry: the StatusEntry to cache
+        """
+        with self._lock:
+            self._entries[project_id] = entry
+            self._entries.move_to_end(project_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, project_id: int) -> None:
+        """
+        Drop the entry for a Project.
+        :param project_id: the Project ID
+        """
+        with self._lock:
+            self._entries.pop(project_id, None)
+
+    def update_profile(self, profile_id: int, colors: Any) -> None:
+        """
+        Refresh the colors of every entry using the given Profile.
+        :param profile_id: the Profile ID
+        :param colors: the Profile's new colors
+        """
+        with self._lock:
+            for project_id, entry in self._entries.items():
+                if entry.profile_id == profile_id:
+                    self._entries[project_id] = StatusEntry.build(
+                        profile_id, entry.start, entry.end, colors, entry.timezone
+                    )
+
+    def invalidate_profile(self, profile_id: int) -> None:
+        """
+        Drop every entry using the given Profile.
+        :param profile_id: the Profile ID
+        """
+        with self._lock:
+            stale = [k for k, v in self._entries.items() if v.profile_id == profile_id]
+            for project_id in stale:
+                del self._entries[project_id]
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Return the cache counters.
+        :return: dict of size, max_size, hits and misses
+        """
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+status_cache = StatusCache(max_size=active_config.STATUS_CACHE_SIZE)
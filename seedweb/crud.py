@@ -1,11 +1,40 @@
 from datetime import datetime
-from typing import Type
+from typing import Any, Type
 
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session, joinedload
-
-from seedweb import schemas
-from seedweb.models import Profile, Project, ProjectData, ProjectNotes
+from sqlalchemy import Executable, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from seedweb import archive, purge, rollups, schemas, statements
+from seedweb.broker import status_broker
+from seedweb.cache import StatusEntry, status_cache
+from seedweb.database import Base
+from seedweb.etag import make_etag
+from seedweb.models import (
+    SENSOR_METRICS,
+    Profile,
+    Project,
+    ProjectData,
+    ProjectNotes,
+)
+from seedweb.pagination import decode_cursor
+
+
+def write_returning(db: Session, statement: Executable) -> Any | None:
+    """
+    Execute a single INSERT, UPDATE or DELETE ... RETURNING statement and commit. A returned
+    model object is detached before the commit so the values RETURNING loaded survive it,
+    rather than being expired and read back with another SELECT.
+    :param db: SQLAlchemy sessionmaker
+    :param statement: a statement returning a model or a column of at most one row
+    :return: the returned model object or value, or None if no row matched
+    """
+    record = db.scalar(statement.execution_options(populate_existing=True))
+    if isinstance(record, Base):
+        db.expunge(record)
+    db.commit()
+    return record
 
 
 def get_profile(db: Session, profile_id: int) -> Type[Profile] | None:
@@ -15,7 +44,7 @@ def get_profile(db: Session, profile_id: int) -> Type[Profile] | None:
     :param profile_id: The ID of the Profile to return
     :return: a Profile object
     """
-    return db.query(Profile).filter(Profile.id == profile_id).first()
+    return db.scalar(statements.profile_by_id(profile_id))
 
 
 def get_profiles(
@@ -28,7 +57,7 @@ def get_profiles(
     :param db: SQLAlchemy sessionmaker
     :return: a list of database Profile objects.
     """
-    return db.query(Profile).offset(skip).limit(limit).all()
+    return list(db.scalars(statements.profiles_page(skip, limit)))
 
 
 def create_profile(db: Session, profile: schemas.ProfileCreate) -> Profile:
@@ -38,61 +67,104 @@ def create_profile(db: Session, profile: schemas.ProfileCreate) -> Profile:
     :param profile: Pydantic schema for the Profile model
     :return: a Profile object
     """
-    db_profile = Profile(name=profile.name, colors=profile.colors)
-    db.add(db_profile)
-    db.commit()
-    db.refresh(db_profile)
-    return db_profile
+    return write_returning(db, statements.insert_profile(profile))
 
 
 def update_profile(
     db: Session, profile_id: int, profile: schemas.ProfileCreate
-) -> Type[Profile]:
+) -> Profile | None:
     """
     Given a Profile ID, update a Profile record.
     :param profile_id: int - the Profile ID
     :param profile: dict - the Profile object
     :param db: SQLAlchemy sessionmaker
-    :return: a Profile object
+    :return: a Profile object or None if the Profile does not exist
     """
-    db_profile = db.query(Profile).filter(Profile.id == profile_id).first()
-    db_profile.name = profile.name
-    db_profile.colors = profile.colors
-    db.commit()
-    db.refresh(db_profile)
+    db_profile = write_returning(db, statements.update_profile(profile_id, profile))
+    if db_profile is None:
+        return None
+    status_cache.update_profile(profile_id, db_profile.colors)
+    status_broker.publish_profile(profile_id)
     return db_profile
 
 
-def delete_profile(db: Session, profile_id: int) -> JSONResponse:
+def delete_profile(db: Session, profile_id: int) -> JSONResponse | None:
     """
-    Given a Profile ID, return a Profile record.
+    Given a Profile ID, delete a Profile record.
     :param db: SQLAlchemy sessionmaker
     :param profile_id: The Profile ID
-    :return: JSONResponse object with deletion confirmation
+    :return: JSONResponse object with deletion confirmation or None if the Profile does not
+        exist
+    """
+    name = write_returning(db, statements.delete_profile(profile_id))
+    if name is None:
+        return None
+    status_cache.invalidate_profile(profile_id)
+    status_broker.publish_profile(profile_id)
+    return JSONResponse(content={"profile": f"Profile: {name} deleted"})
+
+
+def project_detail(
+    db_project: Project,
+    data: list[ProjectData],
+    notes: list[ProjectNotes],
+    data_limit: int,
+    notes_limit: int,
+) -> schemas.Project:
+    """
+    Build the Project view from the latest data and notes. The records are attached to the
+    Project as already loaded collections, oldest first, so nothing else is lazy loaded, and
+    a link to the full listing, which starts at the oldest record, is set for each
+    collection that has older records.
+    :param db_project: a Project model object
+    :param data: up to data_limit + 1 ProjectData records, newest first
+    :param notes: up to notes_limit + 1 ProjectNotes records, newest first
+    :param data_limit: the max number of ProjectData records to embed
+    :param notes_limit: the max number of ProjectNotes records to embed
+    :return: a Project schema object
+    """
+    older_data = len(data) > data_limit or bool(
+        archive.archive_store.partitions(db_project.id)
+    )
+    set_committed_value(db_project, "data", data[:data_limit][::-1])
+    set_committed_value(db_project, "notes", notes[:notes_limit][::-1])
+    detail = schemas.Project.model_validate(db_project, from_attributes=True)
+    detail.links = schemas.ProjectLinks(
+        data=f"/projects/{db_project.id}/data/" if older_data else None,
+        notes=f"/projects/{db_project.id}/notes/" if len(notes) > notes_limit else None,
+    )
+    return detail
+
+
+def project_exists(db: Session, project_id: int) -> bool:
     """
-    db_profile = db.query(Profile).filter(Profile.id == profile_id).first()
-    db.delete(db_profile)
-    db.commit()
-    return JSONResponse(content={"profile": f"Profile: {db_profile.name} deleted"})
+    Check whether a Project exists without loading it.
+    :param db: SQLAlchemy sessionmaker
+    :param project_id: The Project ID
+    :return: True if the Project exists
+    """
+    return db.scalar(statements.project_name(project_id)) is not None
 
 
-def get_project(db: Session, project_id: int) -> Type[Project] | None:
+def get_project(
+    db: Session, project_id: int, data_limit: int, notes_limit: int
+) -> schemas.Project | None:
     """
-    Given a Project ID, return a Project record.
+    Given a Project ID, return a Project with its latest data and notes. Each
+    collection is read with its own bounded query rather than joined, so the rows neither
+    multiply nor grow with the age of the Project.
     :param db: SQLAlchemy sessionmaker
     :param project_id: The Project ID
-    :return: a Project object
-    """
-    return (
-        db.query(Project)
-        .options(
-            joinedload(Project.profile),
-            joinedload(Project.data),
-            joinedload(Project.notes),
-        )
-        .filter(Project.id == project_id)
-        .first()
-    )
+    :param data_limit: The max number of ProjectData records to embed
+    :param notes_limit: The max number of ProjectNotes records to embed
+    :return: a Project schema object or None if the Project does not exist
+    """
+    db_project = db.scalar(statements.project_by_id(project_id))
+    if db_project is None:
+        return None
+    data = list(db.scalars(statements.latest_data(project_id, data_limit)))
+    notes = list(db.scalars(statements.latest_notes(project_id, notes_limit)))
+    return project_detail(db_project, data, notes, data_limit, notes_limit)
 
 
 def get_projects(
@@ -105,75 +177,173 @@ def get_projects(
     :param limit: The max number of Projects to return.
     :return: a list of Project objects
     """
-    return db.query(Project).offset(skip).limit(limit).all()
+    return list(db.scalars(statements.projects_page(skip, limit)))
 
 
-def create_project(db: Session, project: schemas.ProjectCreate) -> Project:
+def create_project(db: Session, project: schemas.ProjectCreate) -> schemas.Project:
     """
-    Create a Project object and write them to the database.
+    Create a Project object and write it to the database.
     :param db: SQLAlchemy sessionmaker
     :param project: the Project object.
-    :return: a Project model object.
+    :return: a Project schema object, with no data or notes yet.
     """
-    db_project = Project(**project.model_dump())
-    db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
-    return db_project
+    db_project = write_returning(db, statements.insert_project(project))
+    status_cache.invalidate(db_project.id)
+    return project_detail(db_project, [], [], data_limit=0, notes_limit=0)
+
+
+def get_status_entry(db: Session, project_id: int) -> StatusEntry | None:
+    """
+    Return the compiled schedule and Profile colors of a Project, from the status cache when
+    present.
+    :param db: SQLAlchemy sessionmaker
+    :param project_id: The Project ID
+    :return: a StatusEntry or None if the Project does not exist
+    """
+    entry = status_cache.get(project_id)
+    if entry is None:
+        row = db.execute(statements.status_rows([project_id])).first()
+        if row is None:
+            return None
+        entry = StatusEntry.build(
+            row.profile_id, row.start, row.end, row.colors, row.timezone
+        )
+        status_cache.set(project_id, entry)
+    return entry
+
+
+def status_content(entry: StatusEntry, now: datetime | None = None) -> dict:
+    """
+    Calculate whether the lights should be on or off as well as the color pattern to use,
+    and when the lights next switch so devices can sleep until then.
+    :param entry: the Project's StatusEntry
+    :param now: the current time, defaults to now
+    :return: dict of the status, the Profile colors and the next transition
+    """
+    if not entry.profile_id:
+        return {"error": "Project not found"}
+    state = entry.schedule.state(now)
+    return {
+        "status": state.status,
+        "profile": entry.colors,
+        "next_transition": (
+            state.next_transition.isoformat() if state.next_transition else None
+        ),
+        "seconds_until_next_transition": state.seconds_until_next_transition,
+    }
 
 
-def get_project_status(db: Session, project_id: int) -> JSONResponse:
+def status_etag(entry: StatusEntry, content: dict) -> str:
+    """
+    Build the entity tag of a status response. It changes with the schedule, the colors and
+    at every transition, but not as the countdown to the next transition ticks down.
+    :param entry: the Project's StatusEntry
+    :param content: the status content built by status_content
+    :return: a quoted entity tag
+    """
+    return make_etag(
+        f"{entry.version}-{content.get('status')}-{content.get('next_transition')}"
+    )
+
+
+def get_projects_status(db: Session, project_ids: list[int] | None = None) -> dict:
+    """
+    Calculate the status of every Project, or of the given Projects, with a single joined
+    query. Each Profile's colors are included once however many Projects share it, and the
+    status cache is refreshed with the rows read.
+    :param db: SQLAlchemy sessionmaker
+    :param project_ids: the Project IDs to include, or None for all Projects
+    :return: dict of Project statuses and the colors of the Profiles they use
+    """
+    projects, profiles = [], {}
+    for row in db.execute(statements.status_rows(project_ids)):
+        entry = StatusEntry.build(
+            row.profile_id, row.start, row.end, row.colors, row.timezone
+        )
+        status_cache.set(row.id, entry)
+        state = entry.schedule.state()
+        projects.append(
+            {
+                "id": row.id,
+                "status": state.status,
+                "profile_id": row.profile_id,
+                "seconds_until_next_transition": state.seconds_until_next_transition,
+            }
+        )
+        if row.profile_id is not None:
+            profiles[str(row.profile_id)] = row.colors
+    return {"projects": projects, "profiles": profiles}
+
+
+def get_project_status(db: Session, project_id: int) -> JSONResponse | None:
     """
     Calculate whether the lights should be on or off as well as the color pattern to use.
+    The Project's schedule and Profile colors are served from the status cache when present.
     :param db: SQLAlchemy sessionmaker
     :param project_id: The Project ID
-    :return: a JSONResponse object
+    :return: a JSONResponse object or None if the Project does not exist
     """
-    project = db.query(Project).filter(Project.id == project_id).first()
-    current_time = datetime.now().time()
-    if project.profile_id:
-        profile = db.query(Profile).filter(Profile.id == project.profile_id).first()
-        colors = profile.colors
-        status = True if current_time >= project.start <= project.end else False
-        content = {"status": status, "profile": colors}
-        return JSONResponse(content)
-    else:
-        return JSONResponse({"error": "Project not found"})
+    entry = get_status_entry(db, project_id)
+    if entry is None:
+        return None
+    return JSONResponse(status_content(entry))
 
 
 def update_project(
     db: Session, project_id: int, project: schemas.ProjectCreate
-) -> Type[Project]:
+) -> Project | None:
     """
     Given a Project ID, update a Project record.
     :param db: SQLAlchemy sessionmaker
     :param project_id: the Project ID
     :param project: the Project object.
-    :return: a Project model object
-    """
-    db_project = db.query(Project).filter(Project.id == project_id).first()
-    db_project.name = project.name
-    db_project.bed_id = project.bed_id
-    db_project.description = project.description
-    db_project.profile_id = project.profile_id
-    db_project.start = project.start
-    db_project.end = project.end
-    db.commit()
-    db.refresh(db_project)
+    :return: a Project model object or None if the Project does not exist
+    """
+    db_project = write_returning(db, statements.update_project(project_id, project))
+    if db_project is None:
+        return None
+    status_cache.invalidate(project_id)
+    status_broker.publish_project(project_id)
     return db_project
 
 
-def delete_project(db: Session, project_id: int) -> JSONResponse:
+def delete_project(db: Session, project_id: int) -> JSONResponse | None:
     """
-    Given a Project ID, delete a Project record.
+    Given a Project ID, delete a Project record. Its data, notes and rollups are deleted by
+    the database through the foreign keys' ON DELETE CASCADE, without being loaded. Use
+    purge.purge_job to delete a Project with many records in batches instead.
     :param db: SQLAlchemy sessionmaker
     :param project_id: the Project ID
-    :return: JSONResponse object with deletion confirmation
+    :return: JSONResponse object with deletion confirmation or None if the Project does not
+        exist
     """
-    db_project = db.query(Project).filter(Project.id == project_id).first()
-    db.delete(db_project)
-    db.commit()
-    return JSONResponse(content={"project": f"Project: {db_project.name} deleted"})
+    name = write_returning(db, statements.delete_project(project_id))
+    if name is None:
+        return None
+    archive.archive_store.remove_project(project_id)
+    status_cache.invalidate(project_id)
+    status_broker.publish_project(project_id)
+    return JSONResponse(content={"project": f"Project: {name} deleted"})
+
+
+def schedule_project_purge(db: Session, project_id: int) -> JSONResponse | None:
+    """
+    Mark a Project as waiting to be purged and hand it to the purge job, which deletes its
+    records in batches and then the Project itself. The mark is committed before the 202,
+    so a purge interrupted by a restart is resumed when the job starts again.
+    :param db: SQLAlchemy sessionmaker
+    :param project_id: the Project ID
+    :return: JSONResponse object with a 202 status or None if the Project does not exist
+    """
+    name = write_returning(db, statements.request_purge(project_id))
+    if name is None:
+        return None
+    status_cache.invalidate(project_id)
+    status_broker.publish_project(project_id)
+    purge.purge_job.submit(project_id)
+    return JSONResponse(
+        status_code=202, content={"project": f"Project: {name} deletion scheduled"}
+    )
 
 
 def get_project_data(db: Session, project_data_id: int) -> Type[ProjectData] | None:
@@ -183,27 +353,84 @@ def get_project_data(db: Session, project_data_id: int) -> Type[ProjectData] | N
     :param project_data_id: the Project Data ID
     :return: a ProjectData model object
     """
-    return db.query(ProjectData).filter(ProjectData.id == project_data_id).first()
+    return db.scalar(statements.project_data_by_id(project_data_id))
 
 
 def get_projects_data(
-    db: Session, project_id: int, skip: int = 0, limit: int = 100
+    db: Session,
+    project_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
 ) -> list[Type[ProjectData]] | None:
     """
-    Given a Project ID, return a list of ProjectData associated with the Project.
+    Given a Project ID, return a list of ProjectData associated with the Project, ordered by
+    created date. Pass the cursor of the previous page to seek straight to the next one.
+    Pages reaching back past the oldest reading in the database include archived readings.
     :param db: SQLAlchemy sessionmaker
     :param project_id: the Project ID
     :param skip: the number of Project ID to skip
     :param limit: the max number of ProjectData to return
+    :param cursor: a cursor from pagination.next_cursor
     :return: a list of ProjectData objects.
+    :raises ValueError: if the cursor is malformed
+    """
+    query = statements.project_data_page(project_id, cursor, limit)
+    position = decode_cursor(cursor) if cursor is not None else None
+    archived = archive.archive_store.read(project_id, position, skip + limit)
+    if not archived:
+        return list(db.scalars(query.offset(skip)))
+    hot = list(db.scalars(query.limit(skip + limit)))
+    return archive.merge_page(archived, hot, skip, limit)
+
+
+def sensor_columns(payload: dict) -> dict:
+    """
+    Split a sensor payload into the typed ProjectData columns. Known numeric metrics get
+    their own column and everything else is kept in the extra column.
+    :param payload: a validated sensor payload
+    :return: dict of ProjectData column values
+    """
+    columns: dict = dict.fromkeys(SENSOR_METRICS)
+    extra = {}
+    for key, value in payload.items():
+        if key in columns:
+            columns[key] = value
+        else:
+            extra[key] = value
+    columns["extra"] = extra or None
+    return columns
+
+
+def parse_sensor_text(text: str | None) -> dict:
+    """
+    Validate a sensor payload stored as JSON text, the way readings were stored before
+    sensor_data was structured. Text that does not validate is kept under a "raw" key
+    rather than dropped.
+    :param text: the stored sensor_data text
+    :return: the structured sensor payload
+    """
+    if text is None:
+        return {}
+    try:
+        return schemas.SensorData.model_validate_json(text).model_dump(
+            exclude_unset=True
+        )
+    except ValueError:
+        return {"raw": text}
+
+
+def reading_row(reading: schemas.ProjectDataCreate) -> dict:
     """
-    return (
-        db.query(ProjectData)
-        .filter(ProjectData.project_id == project_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    Build the ProjectData row of a validated reading. The payload is split into the typed
+    columns and extra, which the ProjectData schema joins back into sensor_data.
+    :param reading: a ProjectDataCreate object
+    :return: dict of ProjectData column values
+    """
+    return {
+        "project_id": reading.project_id,
+        **sensor_columns(reading.sensor_data.model_dump(exclude_unset=True)),
+    }
 
 
 def create_project_data(
@@ -215,43 +442,149 @@ def create_project_data(
     :param project_data: a ProjectDataCreate object
     :return: a ProjectData object
     """
-    db_project_data = ProjectData(**project_data.model_dump())
-    db.add(db_project_data)
+    return add_project_data(db, reading_row(project_data))
+
+
+def add_project_data(db: Session, row: dict) -> ProjectData:
+    """
+    Write a ProjectData row whose typed sensor columns are already filled in, with a single
+    INSERT ... RETURNING, and fold it into the rollups in the same transaction.
+    :param db: SQLAlchemy sessionmaker
+    :param row: dict of ProjectData column values
+    :return: a ProjectData object
+    """
+    db_project_data = db.scalar(
+        statements.insert_project_data(row).execution_options(populate_existing=True)
+    )
+    rollups.apply_readings(
+        db, [(db_project_data.project_id, db_project_data.created_date, row)]
+    )
+    db.expunge(db_project_data)
     db.commit()
-    db.refresh(db_project_data)
     return db_project_data
 
 
+def prepare_project_data(
+    db: Session, project_data: list[schemas.ProjectDataCreate]
+) -> tuple[list[dict], list[schemas.ProjectDataBulkError]]:
+    """
+    Check a batch of ProjectData against the database, looking up every Project in one query,
+    and build the insert rows, typed sensor columns included, for the readings that pass.
+    :param db: SQLAlchemy sessionmaker
+    :param project_data: a list of ProjectDataCreate objects, possibly for several Projects
+    :return: a tuple of the insert rows and a list of errors, one for each rejected reading
+    """
+    rows, errors = [], []
+    project_ids = {reading.project_id for reading in project_data}
+    known_ids = set(
+        db.scalars(
+            select(Project.id).where(
+                Project.id.in_(project_ids), statements.LIVE_PROJECT
+            )
+        ).all()
+    )
+    for index, reading in enumerate(project_data):
+        if reading.project_id not in known_ids:
+            errors.append(
+                schemas.ProjectDataBulkError(index=index, detail="Project not found")
+            )
+            continue
+        rows.append(reading_row(reading))
+    return rows, errors
+
+
+def insert_project_data(db: Session, rows: list[dict]) -> list[int]:
+    """
+    Insert a batch of ProjectData rows with a single executemany INSERT and fold them into
+    the rollups. The caller commits.
+    :param db: SQLAlchemy sessionmaker
+    :param rows: a list of rows built by prepare_project_data
+    :return: the created ProjectData IDs, in the order of rows
+    """
+    if not rows:
+        return []
+    created = db.execute(statements.insert_project_data_rows(), rows).all()
+    rollups.apply_readings(
+        db,
+        (
+            (row["project_id"], record.created_date, row)
+            for row, record in zip(rows, created)
+        ),
+    )
+    return [record.id for record in created]
+
+
+def create_project_data_bulk(
+    db: Session, project_data: list[schemas.ProjectDataCreate]
+) -> schemas.ProjectDataBulkResult:
+    """
+    Validate a batch of ProjectData and write it to the database in a single transaction.
+    Nothing is written if any reading is rejected.
+    :param db: SQLAlchemy sessionmaker
+    :param project_data: a list of ProjectDataCreate objects, possibly for several Projects
+    :return: a ProjectDataBulkResult with the created IDs or the per-reading errors
+    """
+    result = schemas.ProjectDataBulkResult()
+    if not project_data:
+        return result
+    rows, result.errors = prepare_project_data(db, project_data)
+    if result.errors:
+        return result
+    result.created = insert_project_data(db, rows)
+    db.commit()
+    return result
+
+
 def update_project_data(
     db: Session, project_data_id: int, project_data: schemas.ProjectDataCreate
-) -> Type[ProjectData]:
+) -> ProjectData | None:
     """
-    Update a ProjectData record
+    Update a ProjectData record and recompute the rollups of the buckets it falls in, under
+    its old Project and its new one, in the same transaction. The UPDATE matches the record
+    under the Project in the payload; only if it moves to another Project, or does not
+    exist, is its old Project read and the UPDATE repeated under it.
     :param db: SQLAlchemy sessionmaker
     :param project_data_id: The ProjectData ID
     :param project_data: a ProjectDataCreate object with which to update the data
-    :return: a ProjectData object
+    :return: a ProjectData object or None if the record does not exist
     """
-    db_project_data = (
-        db.query(ProjectData).filter(ProjectData.id == project_data_id).first()
+    row = reading_row(project_data)
+    old_project_id = row["project_id"]
+    db_project_data = db.scalar(
+        statements.update_project_data(project_data_id, row, old_project_id)
+    )
+    if db_project_data is None:
+        old_project_id = db.scalar(statements.project_data_owner(project_data_id))
+        if old_project_id is not None:
+            db_project_data = db.scalar(
+                statements.update_project_data(project_data_id, row, old_project_id)
+            )
+    if db_project_data is None:
+        db.rollback()
+        return None
+    created_date = db_project_data.created_date
+    rollups.refresh_readings(
+        db, {(old_project_id, created_date), (db_project_data.project_id, created_date)}
     )
-    db_project_data.data = project_data.data
+    db.expunge(db_project_data)
     db.commit()
-    db.refresh(db_project_data)
     return db_project_data
 
 
-def delete_project_data(db: Session, project_data_id: int) -> JSONResponse:
+def delete_project_data(db: Session, project_data_id: int) -> JSONResponse | None:
     """
-    Delete a ProjectData record
+    Delete a ProjectData record and recompute the rollups of the buckets it fell in, in the
+    same transaction.
     :param db: SQLAlchemy sessionmaker
     :param project_data_id: The ProjectData ID
-    :return: JSONResponse object with deletion confirmation
-    """
-    db_project_data = (
-        db.query(ProjectData).filter(ProjectData.id == project_data_id).first()
-    )
-    db.delete(db_project_data)
+    :return: JSONResponse object with deletion confirmation or None if the record does not
+        exist
+    """
+    deleted = db.execute(statements.delete_project_data(project_data_id)).first()
+    if deleted is None:
+        db.rollback()
+        return None
+    rollups.refresh_readings(db, [tuple(deleted)])
     db.commit()
     return JSONResponse(content={"data": f"Project Data: {project_data_id} deleted"})
 
@@ -263,27 +596,29 @@ def get_project_note(db: Session, project_note_id: int) -> Type[ProjectNotes]:
     :param project_note_id: the ProjectNote ID
     :return: return a ProjectNotes record object.
     """
-    return db.query(ProjectNotes).filter(ProjectNotes.id == project_note_id).first()
+    return db.scalar(statements.project_note_by_id(project_note_id))
 
 
 def get_projects_notes(
-    db: Session, project_id: int, skip: int = 0, limit: int = 100
+    db: Session,
+    project_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
 ) -> list[Type[ProjectNotes]] | None:
     """
-    Given a Project ID, return a list of ProjectNotes associated with the Project.
+    Given a Project ID, return a list of ProjectNotes associated with the Project, ordered by
+    created date. Pass the cursor of the previous page to seek straight to the next one.
     :param db: SQLAlchemy sessionmaker
     :param project_id: the ProjectNote ID
     :param skip: the number of records to skip
     :param limit: the max number of results to return
+    :param cursor: a cursor from pagination.next_cursor
     :return: a list of ProjectNote objects
+    :raises ValueError: if the cursor is malformed
     """
-    return (
-        db.query(ProjectNotes)
-        .filter(ProjectNotes.project_id == project_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    query = statements.project_notes_page(project_id, cursor, limit)
+    return list(db.scalars(query.offset(skip)))
 
 
 def create_project_note(
@@ -295,42 +630,32 @@ def create_project_note(
     :param project_note: The ProjectNote
     :return: a ProjectNote object
     """
-    db_project_notes = ProjectNotes(**project_note.model_dump())
-    db.add(db_project_notes)
-    db.commit()
-    db.refresh(db_project_notes)
-    return db_project_notes
+    return write_returning(db, statements.insert_project_note(project_note))
 
 
 def update_project_note(
     db: Session, project_note_id: int, project_note: schemas.ProjectNotesCreate
-) -> Type[ProjectNotes] | None:
+) -> ProjectNotes | None:
     """
     Given a ProjectNote ID, update the ProjectNote
     :param db: SQLAlchemy sessionmaker
     :param project_note_id: The ProjectNote ID
     :param project_note: The ProjectNote object
-    :return: a ProjectNote object
+    :return: a ProjectNote object or None if the note does not exist
     """
-    db_project_note = (
-        db.query(ProjectNotes).filter(ProjectNotes.id == project_note_id).first()
+    return write_returning(
+        db, statements.update_project_note(project_note_id, project_note)
     )
-    db_project_note.note = project_note.note
-    db.commit()
-    db.refresh(db_project_note)
-    return db_project_note
 
 
-def delete_project_note(db: Session, project_note_id: int) -> JSONResponse:
+def delete_project_note(db: Session, project_note_id: int) -> JSONResponse | None:
     """
     Given a ProjectNote ID, delete the ProjectNote record
     :param db: SQLAlchemy sessionmaker
     :param project_note_id: a ProjectNote ID
-    :return: JSONResponse object
+    :return: JSONResponse object or None if the note does not exist
     """
-    db_project_note = (
-        db.query(ProjectNotes).filter(ProjectNotes.id == project_note_id).first()
-    )
-    db.delete(db_project_note)
-    db.commit()
+    deleted = write_returning(db, statements.delete_project_note(project_note_id))
+    if deleted is None:
+        return None
     return JSONResponse(content={"note": f"Project Note: {project_note_id} deleted"})
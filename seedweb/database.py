@@ -1,13 +1,201 @@
-from sqlalchemy import create_engine
+import re
+import time
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+
+from sqlalchemy import URL, AsyncAdaptedQueuePool, Engine, create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-from config import DevelopmentConfig
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import active_config
+
+
+def engine_options(config) -> dict:
+    """
+    Build the create_engine keyword arguments for a config. SQLite gets the connect args it
+    needs to be shared across threads; pool settings only apply to pooled connections, so
+    they are dropped for in-memory SQLite.
+    :param config: a configuration class
+    :return: dict of create_engine keyword arguments
+    """
+    url = make_url(config.SQLALCHEMY_DATABASE_URI)
+    options = dict(getattr(config, "SQLALCHEMY_ENGINE_OPTIONS", {}))
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            for key in ("pool_size", "max_overflow", "pool_timeout", "pool_recycle"):
+                options.pop(key, None)
+    return options
+
+
+def apply_pragmas(engine: Engine, pragmas: dict) -> None:
+    """
+    Run a set of SQLite PRAGMA statements on every new connection of an engine.
+    :param engine: a SQLite engine
+    :param pragmas: dict of pragma names and values
+    """
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+PLACEHOLDER_LIST = re.compile(
+    r"\((?:\?|%\(\w+\)s|\$\d+)(?:, (?:\?|%\(\w+\)s|\$\d+))+\)"
+)
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Reduce a SQL statement to its shape, so statements differing only in the length of an
+    expanded IN list are counted together. Values are bound parameters already.
+    :param statement: the SQL sent to the driver
+    :return: the statement with every list of placeholders collapsed to one
+    """
+    return PLACEHOLDER_LIST.sub("(?)", " ".join(statement.split()))
+
+
+class QueryProfile:
+    """The number of statements one request executed and the time they took, per shape"""
+
+    __slots__ = ("count", "seconds", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: dict[str, list] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        """
+        Record an executed statement.
+        :param statement: the SQL sent to the driver
+        :param seconds: the time the driver took to execute it
+        """
+        self.count += 1
+        self.seconds += seconds
+        totals = self.shapes.setdefault(statement_shape(statement), [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """
+        Find the statement shapes executed more than threshold times, the mark of a query
+        run once per row, such as a lazy load in a loop.
+        :param threshold: the number of executions allowed per shape
+        :return: (shape, count) tuples, most executed first
+        """
+        return sorted(
+            (
+                (shape, count)
+                for shape, (count, _) in self.shapes.items()
+                if count > threshold
+            ),
+            key=lambda item: -item[1],
+        )
 
-SQLALCHEMY_DATABASE_URL = DevelopmentConfig.SQLALCHEMY_DATABASE_URI
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+query_profile: ContextVar[QueryProfile | None] = ContextVar(
+    "query_profile", default=None
 )
+
+
+def profile_queries(engine: Engine) -> None:
+    """
+    Time every statement an engine executes and record it in the QueryProfile of the
+    current request, if there is one. The profile is held in a context variable, which
+    FastAPI's threadpool and the asyncio engine's greenlets both carry over.
+    :param engine: a SQLAlchemy Engine
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_started"].pop()
+        profile = query_profile.get()
+        if profile is not None:
+            profile.record(statement, seconds)
+
+
+def make_engine(config) -> Engine:
+    """
+    Create the engine for a config, applying its pool settings and, for SQLite, its pragmas,
+    and hooking up the query profiling when it is enabled.
+    :param config: a configuration class
+    :return: a SQLAlchemy Engine
+    """
+    engine = create_engine(config.SQLALCHEMY_DATABASE_URI, **engine_options(config))
+    pragmas = getattr(config, "SQLITE_PRAGMAS", {})
+    if engine.dialect.name == "sqlite" and pragmas:
+        apply_pragmas(engine, pragmas)
+    if getattr(config, "QUERY_PROFILING_ENABLED", False):
+        profile_queries(engine)
+    return engine
+
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_url(uri: str) -> URL:
+    """
+    Swap the default driver of a database URI for its asyncio counterpart. URIs that name
+    a driver explicitly are left alone.
+    :param uri: the database URI
+    :return: the URL to use with the asyncio engine
+    """
+    url = make_url(uri)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None or "+" in url.drivername:
+        return url
+    return url.set(drivername=driver)
+
+
+def make_async_engine(config) -> "AsyncEngine":
+    """
+    Create the asyncio engine for a config, with the same pool settings, pragmas and query
+    profiling as make_engine.
+    :param config: a configuration class
+    :return: a SQLAlchemy AsyncEngine
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    options = engine_options(config)
+    if "pool_size" in options:
+        options["poolclass"] = AsyncAdaptedQueuePool
+    engine = create_async_engine(
+        async_database_url(config.SQLALCHEMY_DATABASE_URI), **options
+    )
+    pragmas = getattr(config, "SQLITE_PRAGMAS", {})
+    if engine.dialect.name == "sqlite" and pragmas:
+        apply_pragmas(engine.sync_engine, pragmas)
+    if getattr(config, "QUERY_PROFILING_ENABLED", False):
+        profile_queries(engine.sync_engine)
+    return engine
+
+
+SQLALCHEMY_DATABASE_URL = active_config.SQLALCHEMY_DATABASE_URI
+
+engine = make_engine(active_config)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+if active_config.ASYNC_DATABASE_ENABLED:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = make_async_engine(active_config)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
 Base = declarative_base()
@@ -0,0 +1,63 @@
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def make_etag(data: bytes | str) -> str:
+    """
+    Build a strong entity tag from a response body or a version string.
+    :param data: the bytes or string to tag
+    :return: a quoted entity tag
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    return f'"{hashlib.blake2b(data, digest_size=8).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check whether the request's If-None-Match header matches an entity tag.
+    :param request: the incoming request
+    :param etag: the current entity tag
+    :return: True if the client already holds the current representation
+    """
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Build a body-less 304 response.
+    :param etag: the current entity tag
+    :return: a 304 Response
+    """
+    return Response(
+        status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
+
+
+def etag_response(request: Request, content: Any, etag: str | None = None) -> Response:
+    """
+    Build a JSON response tagged with an ETag, or a 304 if the client's copy is current.
+    Without an explicit etag the tag is a hash of the encoded body.
+    :param request: the incoming request
+    :param content: the response content
+    :param etag: a precomputed entity tag
+    :return: a JSONResponse or a 304 Response
+    """
+    if etag is not None and etag_matches(request, etag):
+        return not_modified(etag)
+    response = JSONResponse(jsonable_encoder(content))
+    if etag is None:
+        etag = make_etag(response.body)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
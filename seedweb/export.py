@@ -0,0 +1,148 @@
+"""
+Streaming export of a Project's sensor history. Rows are read from the archive and the
+database in chunks and encoded chunk by chunk so memory use does not grow with the length
+of the history.
+"""
+
+import csv
+import io
+import json
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from typing import Iterable, Iterator, Sequence
+
+from sqlalchemy import Row, select
+from sqlalchemy.orm import Session
+
+from seedweb import archive
+from seedweb.models import SENSOR_METRICS, ProjectData
+
+EXPORT_COLUMNS = ("id", "created_date", "project_id", *SENSOR_METRICS, "extra")
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+ArchivedRow = namedtuple("ArchivedRow", EXPORT_COLUMNS)
+
+
+def read_chunks(
+    db: Session,
+    project_id: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    chunk_size: int = 1000,
+) -> Iterator[Sequence[Row]]:
+    """
+    Yield a Project's readings in created date order, chunk_size rows at a time, closing the
+    session once the last chunk has been read. Archived readings, which all predate the
+    readings in the database, come first, one partition at a time. Readings left in the
+    database by an interrupted archive move are only exported from the archive.
+    :param db: SQLAlchemy sessionmaker
+    :param project_id: the Project ID
+    :param start: the earliest created date to export, inclusive
+    :param end: the latest created date to export, exclusive
+    :param chunk_size: the number of rows fetched from the cursor at a time
+    :return: an iterator of row chunks
+    """
+    query = select(*(getattr(ProjectData, column) for column in EXPORT_COLUMNS)).where(
+        ProjectData.project_id == project_id
+    )
+    if start is not None:
+        query = query.where(ProjectData.created_date >= start)
+    if end is not None:
+        query = query.where(ProjectData.created_date < end)
+    query = query.order_by(ProjectData.created_date, ProjectData.id)
+    try:
+        duplicates = archive.archive_store.duplicate_ids(db, project_id)
+        if duplicates:
+            query = query.where(ProjectData.id.not_in(duplicates))
+        for rows in archive.archive_store.iter_rows(project_id, start, end):
+            archived = [
+                ArchivedRow(*(row[column] for column in EXPORT_COLUMNS)) for row in rows
+            ]
+            for first in range(0, len(archived), chunk_size):
+                last = first + chunk_size
+                yield archived[first:last]
+        result = db.execute(query.execution_options(yield_per=chunk_size))
+        yield from result.partitions()
+    finally:
+        db.close()
+
+
+def ndjson_chunks(chunks: Iterable[Sequence[Row]]) -> Iterator[bytes]:
+    """
+    Encode row chunks as newline delimited JSON.
+    :param chunks: an iterator of row chunks
+    :return: an iterator of encoded chunks
+    """
+    for rows in chunks:
+        lines = []
+        for row in rows:
+            record = row._asdict()
+            record["created_date"] = row.created_date.isoformat()
+            lines.append(json.dumps(record, separators=(",", ":")))
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def csv_chunks(chunks: Iterable[Sequence[Row]]) -> Iterator[bytes]:
+    """
+    Encode row chunks as CSV with a header row. The extra column holds JSON.
+    :param chunks: an iterator of row chunks
+    :return: an iterator of encoded chunks
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        for row in rows:
+            writer.writerow(
+                (
+                    row.id,
+                    row.created_date.isoformat(),
+                    row.project_id,
+                    *(getattr(row, metric) for metric in SENSOR_METRICS),
+                    json.dumps(row.extra) if row.extra is not None else None,
+                )
+            )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding header accepts gzip, either by name or through "*", with a
+    q-value above zero.
+    :param accept_encoding: the Accept-Encoding header value
+    :return: True if the response may be gzip encoded
+    """
+    qualities = {}
+    for token in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in token.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Compress a byte stream into a single gzip member.
+    :param chunks: an iterator of encoded chunks
+    :return: an iterator of compressed chunks
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
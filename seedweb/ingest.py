@@ -0,0 +1,273 @@
+import logging
+import queue
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from config import active_config
+from seedweb import crud, schemas
+from seedweb.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueueFull(Exception):
+    """Raised when a reading cannot be queued before the enqueue timeout"""
+
+
+class IngestQueueStopped(Exception):
+    """Raised when a reading is put after the writer has been told to stop"""
+
+
+def queued_reading(
+    reading: schemas.ProjectDataCreate | dict,
+) -> schemas.ProjectDataCreate:
+    """
+    Prepare a posted reading for the queue. Binary readings are decoded into a ProjectData
+    row; they are wrapped in a ProjectDataCreate without validating them again.
+    :param reading: a ProjectDataCreate object or a decoded ProjectData row
+    :return: a ProjectDataCreate object
+    """
+    if not isinstance(reading, dict):
+        return reading
+    return schemas.ProjectDataCreate.model_construct(
+        project_id=reading["project_id"],
+        sensor_data=schemas.SensorData.model_construct(
+            **schemas.sensor_payload(SimpleNamespace(**reading))
+        ),
+    )
+
+
+class IngestQueue:
+    """
+    A bounded write-behind queue for ProjectData. A single writer thread drains the queue
+    and writes readings in group commits, flushing when a batch is full or when the oldest
+    queued reading has waited flush_interval seconds.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueued = 0
+        self.written = 0
+        self.rejected = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        """True while the writer thread is accepting readings"""
+        return self._thread is not None and not self._stopping.is_set()
+
+    def start(self) -> None:
+        """Start the writer thread, unless a writer is still running or draining"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="seedweb-ingest", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stop accepting readings, write everything still queued, and wait for the writer. If
+        the wait times out, the writer keeps draining and the job cannot be started again
+        until it has finished.
+        :param timeout: the max number of seconds to wait for the queue to drain
+        """
+        if self._thread is None:
+            return
+        with self._lock:
+            self._stopping.set()
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._thread = None
+
+    def put(
+        self, reading: schemas.ProjectDataCreate, timeout: float | None = None
+    ) -> None:
+        """
+        Queue a reading, waiting for up to timeout seconds while the queue is full. Readings
+        are refused once stop() has been called, under the same lock, so every queued
+        reading is written by the writer's final drain at the latest.
+        :param reading: a ProjectDataCreate object
+        :param timeout: the max number of seconds to wait for a free slot
+        :raises IngestQueueFull: if no slot was free before the timeout
+        :raises IngestQueueStopped: if the writer is stopping or stopped
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if self._stopping.is_set():
+                    raise IngestQueueStopped("Ingestion queue is stopped")
+                try:
+                    self._queue.put_nowait((time.monotonic(), reading))
+                except queue.Full:
+                    pass
+                else:
+                    self.enqueued += 1
+                    return
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise IngestQueueFull("Ingestion queue is full")
+            self._stopping.wait(0.01 if remaining is None else min(0.01, remaining))
+
+    def lag(self) -> float:
+        """
+        Return how long the oldest queued reading has been waiting.
+        :return: the lag in seconds
+        """
+        with self._queue.mutex:
+            if not self._queue.queue:
+                return 0.0
+            queued_at = self._queue.queue[0][0]
+        return time.monotonic() - queued_at
+
+    def stats(self) -> dict:
+        """
+        Return the queue metrics.
+        :return: dict of queue depth, lag and writer counters
+        """
+        with self._lock:
+            counters = {
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
+        return {
+            "running": self.running,
+            "depth": self._queue.qsize(),
+            "max_size": self._queue.maxsize,
+            "lag_seconds": self.lag(),
+            "max_lag_seconds": self.max_lag_seconds,
+            **counters,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+    def _next_batch(self) -> list[tuple[float, schemas.ProjectDataCreate]]:
+        """
+        Wait for the first reading, then gather more until the batch is full or the
+        flush interval has passed. Once stopping, only what is already queued is taken.
+        :return: a list of (queued at, reading) tuples
+        """
+        try:
+            if self._stopping.is_set():
+                batch = [self._queue.get_nowait()]
+            else:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = batch[0][0] + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._stopping.is_set():
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: list[tuple[float, schemas.ProjectDataCreate]]) -> None:
+        """
+        Write a batch of readings in one transaction, dropping readings that fail validation.
+        If the transaction fails, for example because a Project was deleted after its reading
+        was queued, the rows are written one at a time so only the failing ones are lost.
+        :param batch: a list of (queued at, reading) tuples
+        """
+        started = time.monotonic()
+        self.max_lag_seconds = max(self.max_lag_seconds, started - batch[0][0])
+        readings = [reading for _, reading in batch]
+        written = failed = 0
+        db = self.session_factory()
+        try:
+            rows, errors = crud.prepare_project_data(db, readings)
+            for error in errors:
+                logger.warning(
+                    "Dropped queued reading for Project %s: %s",
+                    readings[error.index].project_id,
+                    error.detail,
+                )
+            try:
+                crud.insert_project_data(db, rows)
+                db.commit()
+                written = len(rows)
+            except Exception:
+                db.rollback()
+                logger.exception(
+                    "Failed to write %d queued readings, retrying one by one", len(rows)
+                )
+                written, failed = self._write_rows(db, rows)
+        except Exception:
+            db.rollback()
+            errors, failed = [], len(readings)
+            logger.exception("Failed to write %d queued readings", len(readings))
+        finally:
+            db.close()
+        with self._lock:
+            self.written += written
+            self.rejected += len(errors)
+            self.failed += failed
+            self.batches += 1
+        self.last_flush_seconds = time.monotonic() - started
+
+    @staticmethod
+    def _write_rows(db: Session, rows: list[dict]) -> tuple[int, int]:
+        """
+        Write rows one per transaction, dropping the ones that fail.
+        :param db: SQLAlchemy session
+        :param rows: the ProjectData rows
+        :return: the number of rows written and the number that failed
+        """
+        written = failed = 0
+        for row in rows:
+            try:
+                crud.insert_project_data(db, [row])
+                db.commit()
+                written += 1
+            except Exception as error:
+                db.rollback()
+                failed += 1
+                logger.warning(
+                    "Dropped queued reading for Project %s: %s",
+                    row["project_id"],
+                    error,
+                )
+        return written, failed
+
+    def _run(self) -> None:
+        """Drain the queue until stopped and empty"""
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+            elif self._stopping.is_set():
+                break
+
+
+ingest_queue = IngestQueue(
+    SessionLocal,
+    max_size=active_config.INGEST_QUEUE_SIZE,
+    batch_size=active_config.INGEST_BATCH_SIZE,
+    flush_interval=active_config.INGEST_FLUSH_INTERVAL,
+)
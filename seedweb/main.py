@@ -1,17 +1,80 @@
-from typing import Type
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Literal, Type
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from seedweb import crud, schemas
-from seedweb.database import SessionLocal, engine
-from seedweb.models import Base, Profile, Project, ProjectData, ProjectNotes
-
-Base.metadata.create_all(bind=engine)
+from config import active_config
+from seedweb import (
+    crud,
+    export,
+    ingest,
+    metrics,
+    profiling,
+    purge,
+    readiness,
+    retention,
+    rollups,
+    schemas,
+    stream,
+    wire,
+)
+from seedweb.database import SessionLocal, async_engine, engine
+from seedweb.etag import etag_response
+from seedweb.models import Profile, Project, ProjectData, ProjectNotes
+from seedweb.pagination import set_next_cursor
+from seedweb.serialization import list_response
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create any missing tables and start warming the caches, start the ingestion writer and
+    the retention job when they are enabled and the purge job, and stop them on shutdown,
+    closing the asyncio engine's connections.
+    :param app: the FastAPI application
+    """
+    if active_config.CREATE_SCHEMA_ON_STARTUP:
+        await run_in_threadpool(readiness.create_schema, engine)
+    readiness.warmup.start()
+    if active_config.INGEST_QUEUE_ENABLED:
+        ingest.ingest_queue.start()
+    if active_config.RETENTION_ENABLED:
+        retention.retention_job.start()
+    purge.purge_job.start()
+    yield
+    await run_in_threadpool(purge.purge_job.stop)
+    await run_in_threadpool(retention.retention_job.stop)
+    await run_in_threadpool(ingest.ingest_queue.stop)
+    await run_in_threadpool(readiness.warmup.stop)
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(IntegrityError)
+def integrity_error(request: Request, error: IntegrityError) -> JSONResponse:
+    """
+    Answer writes the database rejects, such as a duplicate name or a reference to a missing
+    Profile or Project, with a 409 rather than a 500.
+    :param request: the incoming request
+    :param error: the IntegrityError raised by the write
+    :return: JSONResponse
+    """
+    return JSONResponse(
+        status_code=409,
+        content={
+            "detail": "Conflicts with an existing record or refers to a missing one"
+        },
+    )
 
-app = FastAPI()
 
 origins = [
     "http://localhost",
@@ -26,7 +89,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", *profiling.PROFILE_HEADERS],
 )
+app.add_middleware(metrics.MetricsMiddleware, registry=metrics.registry)
+if active_config.QUERY_PROFILING_ENABLED:
+    app.add_middleware(
+        profiling.QueryProfileMiddleware,
+        headers=active_config.QUERY_PROFILE_HEADERS,
+        repeat_threshold=active_config.QUERY_REPEAT_THRESHOLD,
+    )
 
 
 def get_db() -> SessionLocal:
@@ -53,6 +124,56 @@ def healthcheck(db: Session = Depends(get_db)) -> JSONResponse:
     return JSONResponse({"database": status})
 
 
+@app.get("/ingest/stats")
+def ingest_stats() -> JSONResponse:
+    """
+    Endpoint returning the ingestion queue depth, lag and writer counters.
+    :return: JSONResponse
+    """
+    return JSONResponse(ingest.ingest_queue.stats())
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """
+    Endpoint returning the per-route request counts, latencies and sizes and the requests in
+    progress, in the Prometheus text format.
+    :return: Response
+    """
+    return Response(
+        metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/purge/stats")
+def purge_stats() -> JSONResponse:
+    """
+    Endpoint returning the Projects waiting to be purged and the purge job totals.
+    :return: JSONResponse
+    """
+    return JSONResponse(purge.purge_job.stats())
+
+
+@app.get("/readiness")
+def get_readiness() -> JSONResponse:
+    """
+    Readiness endpoint. Answers 503 until the caches have been warmed after startup, then
+    200, with the warm-up state in both cases.
+    :return: JSONResponse
+    """
+    status_code = 200 if readiness.warmup.ready else 503
+    return JSONResponse(readiness.warmup.stats(), status_code=status_code)
+
+
+@app.get("/retention/stats")
+def retention_stats() -> JSONResponse:
+    """
+    Endpoint returning the retention job totals and the rows and bytes freed by its last run.
+    :return: JSONResponse
+    """
+    return JSONResponse(retention.retention_job.stats())
+
+
 @app.post("/profiles/", response_model=schemas.Profile)
 def create_profile(
     profile: schemas.ProfileCreate, db: Session = Depends(get_db)
@@ -69,7 +190,7 @@ def create_profile(
 @app.get("/profiles/", response_model=list[schemas.Profile])
 def get_profiles(
     skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
-) -> list[Type[Profile]] | None:
+) -> Response | list[Profile]:
     """
     Endpoint to return a list of Profiles
     :param skip: int - the number of Profiles to skip
@@ -78,21 +199,29 @@ def get_profiles(
     :return: json response
     """
     profiles = crud.get_profiles(db, skip=skip, limit=limit)
+    if active_config.FAST_LIST_RESPONSES:
+        return list_response(profiles, schemas.Profile)
     return profiles
 
 
 @app.get("/profiles/{profile_id}", response_model=schemas.Profile)
-def get_profile(profile_id: int, db: Session = Depends(get_db)) -> Type[Profile]:
+def get_profile(
+    profile_id: int, request: Request, db: Session = Depends(get_db)
+) -> Response:
     """
-    An endpoint to return a Profile given a Profile ID.
+    An endpoint to return a Profile given a Profile ID. Answers If-None-Match with a 304
+    when the Profile is unchanged.
     :param profile_id: int - the Profile ID
+    :param request: the incoming request
     :param db: SQLAlchemy sessionmaker
     :return: json response
     """
     db_profile = crud.get_profile(db, profile_id=profile_id)
     if db_profile is None:
         raise HTTPException(status_code=404, detail="Profile not found")
-    return db_profile
+    return etag_response(
+        request, schemas.Profile.model_validate(db_profile, from_attributes=True)
+    )
 
 
 @app.patch("/profiles/{profile_id}", response_model=schemas.Profile)
@@ -129,7 +258,7 @@ def delete_profile(profile_id: int, db: Session = Depends(get_db)) -> JSONRespon
 @app.post("/projects/", response_model=schemas.Project)
 def create_project(
     project: schemas.ProjectCreate, db: Session = Depends(get_db)
-) -> Project:
+) -> schemas.Project:
     """
     Endpoint for creating a Project
     :param project: Pydantic schema for the Profile model
@@ -154,39 +283,124 @@ def get_projects(
     return projects
 
 
+@app.get("/projects/status")
+def get_projects_status(
+    request: Request,
+    project_ids: list[int] | None = Query(None, alias="id"),
+    db: Session = Depends(get_db),
+) -> Response:
+    """
+    An endpoint to return the status of every Project, or of the Projects given by repeated id
+    parameters, in one response. Profiles shared by several Projects are listed once.
+    :param request: the incoming request
+    :param project_ids: list[int] - the Project IDs to include, defaults to all Projects
+    :param db: SQLAlchemy sessionmaker
+    :return: JSON response
+    """
+    return etag_response(request, crud.get_projects_status(db, project_ids=project_ids))
+
+
 @app.get("/projects/{project_id}", response_model=schemas.Project)
-def get_project(project_id: int, db: Session = Depends(get_db)) -> Type[Project]:
+def get_project(
+    project_id: int,
+    request: Request,
+    data_limit: int = Query(active_config.PROJECT_DETAIL_LIMIT, ge=0, le=1000),
+    notes_limit: int = Query(active_config.PROJECT_DETAIL_LIMIT, ge=0, le=1000),
+    db: Session = Depends(get_db),
+) -> Response:
     """
-    An endpoint to return a Project given a Profile ID.
+    An endpoint to return a Project given a Profile ID. Answers If-None-Match with a 304
+    when the Project is unchanged. Only the latest data and notes are embedded; links
+    point to the full listings when there are older records.
     :param project_id: int - the Profile ID
+    :param request: the incoming request
+    :param data_limit: int - the max number of Project Data records to embed
+    :param notes_limit: int - the max number of Project Notes records to embed
     :param db: SQLAlchemy sessionmaker
     :return: JSON response
     """
-    db_project = crud.get_project(db, project_id=project_id)
+    db_project = crud.get_project(
+        db, project_id=project_id, data_limit=data_limit, notes_limit=notes_limit
+    )
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    return db_project
+    return etag_response(request, db_project)
 
 
 @app.get("/projects/{project_id}/status")
-def get_project_status(project_id: int, db: Session = Depends(get_db)) -> JSONResponse:
+def get_project_status(
+    project_id: int, request: Request, db: Session = Depends(get_db)
+) -> Response:
     """
     An endpoint to return a Projects status. The status determines if the lights should be on or off
-    based on the start and end values.
+    based on the start and end values, and seconds_until_next_transition tells the device how
+    long it can sleep before the status changes. The ETag is derived from the cached schedule,
+    colors and next transition, so a matching If-None-Match is answered with a 304 without a
+    database query.
     :param project_id: int - the Profile ID
+    :param request: the incoming request
     :param db: SQLAlchemy sessionmaker
     :return: JSON response
     """
-    db_project = crud.get_project_status(db, project_id=project_id)
-    if db_project is None:
+    entry = crud.get_status_entry(db, project_id=project_id)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    return db_project
+    content = crud.status_content(entry)
+    return etag_response(request, content, etag=crud.status_etag(entry, content))
 
 
-@app.patch("/projects/{project_id}", response_model=schemas.ProjectUpdate)
+@app.get("/projects/{project_id}/schedule")
+def get_project_schedule(
+    project_id: int, request: Request, db: Session = Depends(get_db)
+) -> Response:
+    """
+    An endpoint to return a Project's day plan: its window in seconds after midnight, its
+    timezone and UTC offset, and the transitions of the next 24 hours, so devices can keep
+    the schedule locally and only check back for changes.
+    :param project_id: int - the Project ID
+    :param request: the incoming request
+    :param db: SQLAlchemy sessionmaker
+    :return: JSON response
+    """
+    entry = crud.get_status_entry(db, project_id=project_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return etag_response(request, entry.schedule.day_plan())
+
+
+@app.get(
+    "/projects/{project_id}/status/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+def stream_project_status(
+    project_id: int, db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """
+    An endpoint that pushes a Project's status as Server-Sent Events. A status event is sent
+    on connect and whenever the on/off state or Profile colors change, so devices can hold
+    the connection open instead of polling. The session is closed after the existence
+    check and after every status lookup of the stream, so an open stream holds no
+    connection.
+    :param project_id: int - the Project ID
+    :param db: SQLAlchemy sessionmaker
+    :return: an event stream
+    """
+    if stream.read_status_entry(db, project_id) is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return StreamingResponse(
+        stream.status_events(
+            project_id, db, heartbeat=active_config.STATUS_STREAM_HEARTBEAT
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.patch("/projects/{project_id}", response_model=schemas.ProjectList)
 def update_project(
     project_id: int, project: schemas.ProjectCreate, db: Session = Depends(get_db)
-) -> Type[Project] | None:
+) -> Project:
     """
     An endpoint to update a Project
     :param project_id: int - the Project ID
@@ -200,50 +414,204 @@ def update_project(
     return db_project
 
 
-@app.delete("/projects/{project_id}")
-def delete_project(project_id: int, db: Session = Depends(get_db)) -> JSONResponse:
+@app.delete(
+    "/projects/{project_id}",
+    responses={202: {"description": "Project scheduled for a chunked purge"}},
+)
+def delete_project(
+    project_id: int, chunked: bool = False, db: Session = Depends(get_db)
+) -> JSONResponse:
     """
-    An endpoint to delete a given Project.
+    An endpoint to delete a given Project. With chunked, the Project is handed to the purge
+    job, which deletes its records in batches, and a 202 is returned at once.
     :param project_id: int - the Profile ID
+    :param chunked: bool - delete the Project's records in batches in the background
     :param db: SQLAlchemy sessionmaker
     :return: JSON response
     """
-    db_project = crud.delete_project(db, project_id=project_id)
+    if chunked:
+        db_project = crud.schedule_project_purge(db, project_id=project_id)
+    else:
+        db_project = crud.delete_project(db, project_id=project_id)
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     return db_project
 
 
-@app.post("/projects/{project_id}/data/", response_model=schemas.ProjectData)
+@app.post(
+    "/projects/{project_id}/data/",
+    response_model=schemas.ProjectData,
+    responses={202: {"description": "Reading queued for a later group commit"}},
+    openapi_extra=wire.READING_OPENAPI,
+)
 def create_project_data(
-    project_data: schemas.ProjectDataCreate,
+    project_data: schemas.ProjectDataCreate | dict = Depends(wire.reading_body),
     db: Session = Depends(get_db),
-) -> ProjectData:
-    """
-    Endpoint for creating Project Data
-    :param project_data: Pydantic schema for the ProjectData model
+) -> ProjectData | JSONResponse:
+    """
+    Endpoint for creating Project Data, posted as JSON or in the binary format of
+    seedweb.wire. When queued ingestion is running the reading is handed to the writer
+    thread and a 202 is returned instead of the created record. A reading that arrives
+    while the writer is stopping is written at once.
+    :param project_data: Pydantic schema for the ProjectData model, or the ProjectData row
+        decoded from a binary reading
     :param db: SQLAlchemy sessionmaker
     :return: JSON response
     """
+    if ingest.ingest_queue.running:
+        try:
+            ingest.ingest_queue.put(
+                ingest.queued_reading(project_data),
+                timeout=active_config.INGEST_ENQUEUE_TIMEOUT,
+            )
+        except ingest.IngestQueueFull:
+            raise HTTPException(
+                status_code=503,
+                detail="Ingestion queue is full",
+                headers={"Retry-After": "1"},
+            )
+        except ingest.IngestQueueStopped:
+            pass
+        else:
+            return JSONResponse(status_code=202, content={"queued": True})
+    if isinstance(project_data, dict):
+        return crud.add_project_data(db, project_data)
     return crud.create_project_data(db=db, project_data=project_data)
 
 
+@app.post("/projects/data/bulk", response_model=schemas.ProjectDataBulkResult)
+def create_project_data_bulk(
+    project_data: list[schemas.ProjectDataCreate],
+    db: Session = Depends(get_db),
+) -> schemas.ProjectDataBulkResult | JSONResponse:
+    """
+    Endpoint for creating a batch of Project Data, possibly for several Projects, in one
+    transaction. Returns the created IDs or, with a 422, the reasons each reading was rejected.
+    :param project_data: a list of Pydantic schemas for the ProjectData model
+    :param db: SQLAlchemy sessionmaker
+    :return: JSON response
+    """
+    result = crud.create_project_data_bulk(db=db, project_data=project_data)
+    if result.errors:
+        return JSONResponse(status_code=422, content=result.model_dump())
+    return result
+
+
 @app.get("/projects/{project_id}/data/", response_model=list[schemas.ProjectData])
 def get_projects_data(
-    project_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
-) -> list[Type[ProjectData]] | None:
+    project_id: int,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+) -> Response | list[ProjectData]:
     """
-    Endpoint to return a list of Project Data
+    Endpoint to return a list of Project Data. The X-Next-Cursor header holds the cursor
+    for the next page when there may be more records.
     :param project_id: int - The Project ID
+    :param response: the outgoing response
     :param skip: int - the number of Projects to skip
     :param limit: int - the total number of Profiles to return
+    :param cursor: str - the X-Next-Cursor value of the previous page
     :param db: SQLAlchemy sessionmaker
     :return: JSON response
     """
-    db_data = crud.get_projects_data(db, project_id=project_id, skip=skip, limit=limit)
+    try:
+        db_data = crud.get_projects_data(
+            db, project_id=project_id, skip=skip, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    set_next_cursor(response, db_data, limit)
+    if active_config.FAST_LIST_RESPONSES:
+        return list_response(db_data, schemas.ProjectData, response.headers)
     return db_data
 
 
+@app.get(
+    "/projects/{project_id}/data/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {media_type: {} for media_type in export.MEDIA_TYPES.values()}}
+    },
+)
+def export_project_data(
+    project_id: int,
+    request: Request,
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to"),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    """
+    Endpoint to stream a Project's full sensor history as NDJSON or CSV. The response is
+    gzip encoded when the client accepts it.
+    :param project_id: int - The Project ID
+    :param request: the incoming request
+    :param export_format: the export format, ndjson or csv
+    :param start: the earliest created date to export, inclusive
+    :param end: the latest created date to export, exclusive
+    :param db: SQLAlchemy sessionmaker
+    :return: a streaming response
+    """
+    if not crud.project_exists(db, project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    chunks = export.read_chunks(db, project_id, start=start, end=end)
+    if export_format == "csv":
+        body = export.csv_chunks(chunks)
+    else:
+        body = export.ndjson_chunks(chunks)
+    filename = f"project-{project_id}.{export_format}"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Vary": "Accept-Encoding",
+    }
+    if export.accepts_gzip(request.headers.get("Accept-Encoding", "")):
+        body = export.gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        body, media_type=export.MEDIA_TYPES[export_format], headers=headers
+    )
+
+
+@app.get(
+    "/projects/{project_id}/data/rollup",
+    response_model=list[schemas.ProjectDataRollup],
+)
+def get_project_data_rollup(
+    project_id: int,
+    bucket: Literal["minute", "hour", "day"] = "hour",
+    start: datetime | None = Query(None, alias="from"),
+    end: datetime | None = Query(None, alias="to"),
+    metric: str | None = None,
+    db: Session = Depends(get_db),
+) -> list[schemas.ProjectDataRollup]:
+    """
+    Endpoint to return the min, max, mean and count of a Project's sensor metrics per bucket
+    :param project_id: int - The Project ID
+    :param bucket: the bucket size, one of minute, hour or day
+    :param start: the earliest bucket start to return, inclusive
+    :param end: the latest bucket start to return, exclusive
+    :param metric: only return rollups of this metric
+    :param db: SQLAlchemy sessionmaker
+    :return: JSON response
+    """
+    return [
+        schemas.ProjectDataRollup(
+            bucket_start=rollup.bucket_start,
+            metric=rollup.metric,
+            count=rollup.count,
+            min=rollup.min_value,
+            max=rollup.max_value,
+            mean=rollup.total / rollup.count,
+        )
+        for rollup in rollups.get_rollups(
+            db, project_id, bucket, start=start, end=end, metric=metric
+        )
+    ]
+
+
 @app.get(
     "/projects/{project_id}/data/{project_data_id}", response_model=schemas.ProjectData
 )
@@ -317,19 +685,33 @@ def create_project_note(
 
 @app.get("/projects/{project_id}/notes/", response_model=list[schemas.ProjectNotes])
 def get_projects_notes(
-    project_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
-) -> list[Type[ProjectNotes]] | None:
+    project_id: int,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+) -> Response | list[ProjectNotes]:
     """
-    Endpoint to return a list of Project Notes
+    Endpoint to return a list of Project Notes. The X-Next-Cursor header holds the cursor
+    for the next page when there may be more records.
     :param project_id: int - The Project ID
+    :param response: the outgoing response
     :param skip: int - the number of Projects to skip
     :param limit: int - the total number of Profiles to return
+    :param cursor: str - the X-Next-Cursor value of the previous page
     :param db: SQLAlchemy sessionmaker
     :return: JSON response
     """
-    db_project_note = crud.get_projects_notes(
-        db, project_id=project_id, skip=skip, limit=limit
-    )
+    try:
+        db_project_note = crud.get_projects_notes(
+            db, project_id=project_id, skip=skip, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    set_next_cursor(response, db_project_note, limit)
+    if active_config.FAST_LIST_RESPONSES:
+        return list_response(db_project_note, schemas.ProjectNotes, response.headers)
     return db_project_note
 
 
@@ -353,7 +735,8 @@ def get_project_note(
 
 
 @app.patch(
-    "/projects/{project_id}/notes/{project_note_id}", response_model=schemas.ProjectData
+    "/projects/{project_id}/notes/{project_note_id}",
+    response_model=schemas.ProjectNotes,
 )
 def update_project_note(
     project_note_id: int,
@@ -371,7 +754,7 @@ def update_project_note(
         db, project_note_id=project_note_id, project_note=project_note
     )
     if db_project_note is None:
-        raise HTTPException(status_code=404, detail="Project Data not found")
+        raise HTTPException(status_code=404, detail="Project Note not found")
     return db_project_note
 
 
@@ -389,3 +772,9 @@ def delete_project_note(
     if db_project_note is None:
         raise HTTPException(status_code=404, detail="Project Note not found")
     return db_project_note
+
+
+if active_config.ASYNC_DATABASE_ENABLED:
+    from seedweb.async_routes import use_async_routes
+
+    use_async_routes(app)
@@ -0,0 +1,246 @@
+"""
+Request metrics in the Prometheus text format. MetricsMiddleware is a plain ASGI middleware,
+so it adds no task or body buffering to a request: it times the request, counts the bytes
+of the request and response bodies as they pass through and, once the route has been
+matched, records them under the route's path template, so /projects/1 and /projects/2
+share a series. Requests that match no route are recorded as "unmatched". All updates run
+on the event loop, so no locks are taken. GET /metrics renders the registry.
+"""
+
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import active_config
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+UNMATCHED = "unmatched"
+
+
+class Histogram:
+    """Counts of observations per bucket, with their sum, for one series"""
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """
+        Record an observation.
+        :param value: the observed value
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> Iterable[tuple[str, int]]:
+        """
+        Return the cumulative bucket counts, the +Inf bucket last.
+        :return: (upper bound, count) tuples
+        """
+        running = 0
+        for bound, count in zip((*self.bounds, "+Inf"), self.counts):
+            running += count
+            yield str(bound), running
+
+
+def escape_label(value: str) -> str:
+    """
+    Escape a label value for the text format.
+    :param value: the label value
+    :return: the escaped value
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    """
+    Format the label set of a sample.
+    :param names: the label names
+    :param values: the label values, in the order of names
+    :param extra: an already formatted label to append, such as le="0.5"
+    :return: the label set in braces
+    """
+    pairs = [
+        f'{name}="{escape_label(str(value))}"' for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+class MetricsRegistry:
+    """Holds the request metrics and renders them in the Prometheus text format"""
+
+    def __init__(self, prefix: str = "seedweb", enabled: bool = True):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.started = time.time()
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop every recorded sample"""
+        self.requests: dict[tuple, int] = defaultdict(int)
+        self.in_progress: dict[tuple, int] = defaultdict(int)
+        self.latency: dict[tuple, Histogram] = {}
+        self.request_size: dict[tuple, Histogram] = {}
+        self.response_size: dict[tuple, Histogram] = {}
+
+    def record(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        seconds: float,
+        request_bytes: int,
+        response_bytes: int,
+    ) -> None:
+        """
+        Record a finished request.
+        :param method: the HTTP method
+        :param route: the route's path template
+        :param status: the response status code
+        :param seconds: the time taken to answer
+        :param request_bytes: the size of the request body
+        :param response_bytes: the size of the response body
+        """
+        key = (method, route)
+        self.requests[(method, route, status)] += 1
+        for series, bounds, value in (
+            (self.latency, LATENCY_BUCKETS, seconds),
+            (self.request_size, SIZE_BUCKETS, request_bytes),
+            (self.response_size, SIZE_BUCKETS, response_bytes),
+        ):
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(bounds)
+            histogram.observe(value)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        :return: the exposition text
+        """
+        lines = []
+        prefix = self.prefix
+        route_labels = ("method", "route")
+
+        name = f"{prefix}_http_requests_total"
+        lines.append(f"# HELP {name} Requests answered, by route and status code.")
+        lines.append(f"# TYPE {name} counter")
+        for labels, count in sorted(self.requests.items()):
+            lines.append(
+                f"{name}{format_labels((*route_labels, 'status'), labels)} {count}"
+            )
+
+        name = f"{prefix}_http_requests_in_progress"
+        lines.append(f"# HELP {name} Requests being answered, by method.")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, count in sorted(self.in_progress.items()):
+            lines.append(f"{name}{format_labels(('method',), labels)} {count}")
+
+        for name, help_text, series in (
+            (
+                f"{prefix}_http_request_duration_seconds",
+                "Time taken to answer requests, by route.",
+                self.latency,
+            ),
+            (
+                f"{prefix}_http_request_size_bytes",
+                "Size of request bodies, by route.",
+                self.request_size,
+            ),
+            (
+                f"{prefix}_http_response_size_bytes",
+                "Size of response bodies, by route.",
+                self.response_size,
+            ),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(series.items()):
+                for bound, count in histogram.cumulative():
+                    label_set = format_labels(route_labels, labels, f'le="{bound}"')
+                    lines.append(f"{name}_bucket{label_set} {count}")
+                label_set = format_labels(route_labels, labels)
+                lines.append(f"{name}_sum{label_set} {histogram.total}")
+                lines.append(f"{name}_count{label_set} {histogram.count}")
+
+        name = f"{prefix}_process_start_time_seconds"
+        lines.append(f"# HELP {name} Start time of the process since the epoch.")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {self.started}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording every HTTP request in a MetricsRegistry"""
+
+    def __init__(self, app: ASGIApp, registry: "MetricsRegistry"):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        registry = self.registry
+        if scope["type"] != "http" or not registry.enabled:
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        started = time.perf_counter()
+        request_bytes = response_bytes = 0
+        status = 500
+
+        async def counting_receive() -> Message:
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message: Message) -> None:
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        registry.in_progress[(method,)] += 1
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            registry.in_progress[(method,)] -= 1
+            route = scope.get("route")
+            registry.record(
+                method,
+                getattr(route, "path", UNMATCHED),
+                status,
+                time.perf_counter() - started,
+                request_bytes,
+                response_bytes,
+            )
+
+
+registry = MetricsRegistry(enabled=active_config.METRICS_ENABLED)
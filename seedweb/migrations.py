@@ -0,0 +1,334 @@
+"""
+Bring a database created from older models up to date. Run with `python -m seedweb.migrations`.
+"""
+
+import logging
+
+from pydantic import ValidationError
+from sqlalchemy import (
+    Connection,
+    Engine,
+    ForeignKeyConstraint,
+    String,
+    Table,
+    cast,
+    inspect,
+    literal_column,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import AddConstraint
+
+from seedweb import archive, schemas
+from seedweb.crud import parse_sensor_text, sensor_columns
+from seedweb.database import engine
+from seedweb.models import SENSOR_METRICS, Base, Profile, ProjectData
+
+logger = logging.getLogger(__name__)
+
+
+def add_missing_columns(bind: Engine) -> list[str]:
+    """
+    Add model columns that are missing from existing tables. Only nullable columns without
+    constraints are added, which covers every column added since the initial models.
+    :param bind: SQLAlchemy engine
+    :return: a list of the added columns as table.column
+    """
+    added = []
+    inspector = inspect(bind)
+    preparer = bind.dialect.identifier_preparer
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {preparer.format_table(table)} "
+                        f"ADD COLUMN {preparer.format_column(column)} {column_type}"
+                    )
+                )
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def create_missing_indexes(bind: Engine) -> None:
+    """
+    Create model indexes that are missing from existing tables.
+    :param bind: SQLAlchemy engine
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
+
+
+def outdated_foreign_keys(bind: Engine) -> dict[str, list[ForeignKeyConstraint]]:
+    """
+    Find the model foreign keys with an ON DELETE action that existing tables lack, such as
+    those created before the cascades were declared.
+    :param bind: SQLAlchemy engine
+    :return: dict of table names and their outdated foreign keys
+    """
+    outdated = {}
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {
+            tuple(key["constrained_columns"]): (key["options"].get("ondelete") or "")
+            for key in inspector.get_foreign_keys(table.name)
+        }
+        keys = [
+            constraint
+            for constraint in table.foreign_key_constraints
+            if constraint.ondelete
+            and existing.get(tuple(constraint.column_keys), "").upper()
+            != constraint.ondelete.upper()
+        ]
+        if keys:
+            outdated[table.name] = keys
+    return outdated
+
+
+def rebuild_sqlite_table(connection: Connection, table: Table) -> None:
+    """
+    Recreate a SQLite table from its model and copy its rows over, since SQLite cannot alter
+    a constraint. NULLs in columns the model declares NOT NULL take the column's server
+    default.
+    :param connection: a SQLite connection in a transaction, with foreign keys off
+    :param table: the model Table
+    """
+    preparer = connection.dialect.identifier_preparer
+    legacy = f"{table.name}_legacy"
+    inspector = inspect(connection)
+    shared = [
+        table.columns[column["name"]]
+        for column in inspector.get_columns(table.name)
+        if column["name"] in table.columns
+    ]
+    values = []
+    for column in shared:
+        value = preparer.format_column(column)
+        if not column.nullable and column.server_default is not None:
+            default = column.server_default.arg.compile(dialect=connection.dialect)
+            value = f"COALESCE({value}, {default})"
+        values.append(value)
+    indexes = [index["name"] for index in inspector.get_indexes(table.name)]
+    connection.exec_driver_sql(
+        f"ALTER TABLE {preparer.format_table(table)} RENAME TO {preparer.quote(legacy)}"
+    )
+    for name in indexes:
+        connection.exec_driver_sql(f"DROP INDEX {preparer.quote(name)}")
+    table.create(connection)
+    columns = ", ".join(preparer.format_column(column) for column in shared)
+    connection.exec_driver_sql(
+        f"INSERT INTO {preparer.format_table(table)} ({columns}) "
+        f"SELECT {', '.join(values)} FROM {preparer.quote(legacy)}"
+    )
+    connection.exec_driver_sql(f"DROP TABLE {preparer.quote(legacy)}")
+
+
+def cascade_foreign_keys(bind: Engine) -> list[str]:
+    """
+    Give existing tables the ON DELETE actions of the model foreign keys, so deleting a
+    Project deletes its records in the database. PostgreSQL constraints are replaced; SQLite
+    tables are rebuilt with foreign keys switched off for the connection.
+    :param bind: SQLAlchemy engine
+    :return: a list of the updated tables
+    """
+    outdated = outdated_foreign_keys(bind)
+    if not outdated:
+        return []
+    if bind.dialect.name == "sqlite":
+        with bind.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as connection:
+            enforced = connection.exec_driver_sql("PRAGMA foreign_keys").scalar()
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            try:
+                connection.exec_driver_sql("BEGIN")
+                for name in outdated:
+                    rebuild_sqlite_table(connection, Base.metadata.tables[name])
+                connection.exec_driver_sql("COMMIT")
+            except Exception:
+                connection.exec_driver_sql("ROLLBACK")
+                raise
+            finally:
+                connection.exec_driver_sql(f"PRAGMA foreign_keys={enforced}")
+        return list(outdated)
+    preparer = bind.dialect.identifier_preparer
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for name, constraints in outdated.items():
+            table = Base.metadata.tables[name]
+            stale = {tuple(constraint.column_keys) for constraint in constraints}
+            for key in inspector.get_foreign_keys(name):
+                if tuple(key["constrained_columns"]) in stale:
+                    connection.exec_driver_sql(
+                        f"ALTER TABLE {preparer.format_table(table)} "
+                        f"DROP CONSTRAINT {preparer.quote(key['name'])}"
+                    )
+            for constraint in constraints:
+                connection.execute(AddConstraint(constraint))
+    return list(outdated)
+
+
+def normalize_sensor_data(bind: Engine, batch_size: int = 1000) -> int:
+    """
+    Move the sensor_data payloads that older versions stored next to the typed sensor
+    columns into those columns and extra, validating payloads stored as JSON text on the way.
+    Rows whose columns already match their payload are left alone.
+    :param bind: SQLAlchemy engine
+    :param batch_size: the number of rows to read per transaction
+    :return: the number of rows updated
+    """
+    existing = inspect(bind).get_columns(ProjectData.__tablename__)
+    if "sensor_data" not in {column["name"] for column in existing}:
+        return 0
+    typed = [getattr(ProjectData, key) for key in (*SENSOR_METRICS, "extra")]
+    updated, last_id = 0, 0
+    while True:
+        with Session(bind) as db:
+            rows = db.execute(
+                select(
+                    ProjectData.id,
+                    cast(literal_column("sensor_data"), String).label("stored"),
+                    *typed,
+                )
+                .where(ProjectData.id > last_id)
+                .order_by(ProjectData.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return updated
+            values = []
+            for row in rows:
+                columns = sensor_columns(parse_sensor_text(row.stored))
+                if columns != {key: getattr(row, key) for key in columns}:
+                    values.append({"id": row.id, **columns})
+            if values:
+                db.execute(update(ProjectData), values)
+            db.commit()
+            updated += len(values)
+            last_id = rows[-1].id
+
+
+def drop_sensor_data_column(bind: Engine) -> bool:
+    """
+    Drop the sensor_data column once its payloads have been moved into the typed columns.
+    :param bind: SQLAlchemy engine
+    :return: True if the column was dropped
+    """
+    columns = inspect(bind).get_columns(ProjectData.__tablename__)
+    if "sensor_data" not in {column["name"] for column in columns}:
+        return False
+    preparer = bind.dialect.identifier_preparer
+    with bind.begin() as connection:
+        connection.execute(
+            text(
+                f"ALTER TABLE {preparer.format_table(ProjectData.__table__)} "
+                "DROP COLUMN sensor_data"
+            )
+        )
+    return True
+
+
+def normalize_profile_colors(bind: Engine) -> int:
+    """
+    Replace Profile colors stored as a JSON encoded string by the list of colors it encodes.
+    Colors that do not validate are cleared and logged.
+    :param bind: SQLAlchemy engine
+    :return: the number of Profiles updated
+    """
+    with Session(bind) as db:
+        values = []
+        for row in db.execute(select(Profile.id, Profile.name, Profile.colors)):
+            try:
+                colors = schemas.ProfileBase(name=row.name, colors=row.colors).colors
+            except ValidationError:
+                logger.warning("Clearing invalid colors of Profile %s", row.id)
+                colors = None
+            if colors != row.colors:
+                values.append({"id": row.id, "colors": colors})
+        if values:
+            db.execute(update(Profile), values)
+        db.commit()
+    return len(values)
+
+
+def upgrade_archive(store: archive.ArchiveStore) -> int:
+    """
+    Rewrite archive partitions written while sensor_data was archived, moving its payloads
+    into the typed columns and extra the way normalize_sensor_data does.
+    :param store: the ArchiveStore to upgrade
+    :return: the number of partition files rewritten
+    """
+    upgraded = 0
+    for project_id in store.projects():
+        for path in store.partitions(project_id):
+            with archive.Partition(path) as partition:
+                types = {c["name"]: c["type"] for c in partition.header["columns"]}
+                if "sensor_data" not in types:
+                    continue
+                rows = partition.read()
+                payloads = partition.column("sensor_data")
+            for row, payload in zip(rows, payloads):
+                if types["sensor_data"] == "text":
+                    payload = parse_sensor_text(payload)
+                row.update(sensor_columns(payload or {}))
+            archive.write_partition(path, project_id, rows)
+            upgraded += 1
+        store.invalidate(project_id)
+    return upgraded
+
+
+def enable_incremental_vacuum(bind: Engine) -> bool:
+    """
+    Switch a SQLite database to incremental auto_vacuum so retention can reclaim space. The
+    mode of an existing database only changes after a full VACUUM, which rewrites the file
+    once.
+    :param bind: SQLAlchemy engine
+    :return: True if the database was vacuumed
+    """
+    if bind.dialect.name != "sqlite":
+        return False
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            return False
+        connection.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.exec_driver_sql("VACUUM")
+    return True
+
+
+def migrate(bind: Engine) -> None:
+    """
+    Create missing tables, columns and indexes, normalize stored payloads and backfill
+    derived data, then add the ON DELETE actions of the foreign keys.
+    :param bind: SQLAlchemy engine
+    """
+    Base.metadata.create_all(bind=bind)
+    for column in add_missing_columns(bind):
+        logger.info("Added column %s", column)
+    create_missing_indexes(bind)
+    if enable_incremental_vacuum(bind):
+        logger.info("Enabled incremental vacuum")
+    logger.info("Normalized %d sensor readings", normalize_sensor_data(bind))
+    if drop_sensor_data_column(bind):
+        logger.info("Dropped the sensor_data column")
+    logger.info("Normalized the colors of %d Profiles", normalize_profile_colors(bind))
+    for table in cascade_foreign_keys(bind):
+        logger.info("Updated the foreign keys of %s", table)
+    logger.info(
+        "Upgraded %d archive partitions", upgrade_archive(archive.archive_store)
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate(engine)
@@ -1,11 +1,31 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import JSON, DateTime, ForeignKey, String, Time, func
+from sqlalchemy import (
+    JSON,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Time,
+    UniqueConstraint,
+    func,
+)
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from seedweb.database import Base
 
+SENSOR_METRICS = ("temperature", "humidity", "soil_moisture")
+
+# Keyset pagination compares created_date against bound parameters. SQLite stores the
+# server default as "YYYY-MM-DD HH:MM:SS", so bind in that format too or ties won't match.
+CreatedDate = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(truncate_microseconds=True), "sqlite"
+)
+
 
 class Profile(Base):
     """Profile SQLAlchemy model"""
@@ -20,7 +40,7 @@ class Profile(Base):
         DateTime(timezone=True), server_default=func.now()
     )
     name: Mapped[str] = mapped_column(String, unique=True, nullable=False)
-    colors: Mapped[Optional[dict | list]] = mapped_column(JSON)
+    colors: Mapped[Optional[list]] = mapped_column(JSON(none_as_null=True))
 
     def __repr__(self):
         return f"Profile: {self.name}"
@@ -45,11 +65,14 @@ class Project(Base):
     profile: Mapped["Profile"] = relationship()
     start: Mapped[datetime] = mapped_column(Time)
     end: Mapped[datetime] = mapped_column(Time)
+    timezone: Mapped[str | None] = mapped_column(String)
+    retention_days: Mapped[int | None] = mapped_column(Integer)
+    purge_requested_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     data: Mapped[List["ProjectData"]] = relationship(
-        back_populates="project", cascade="all, delete"
+        back_populates="project", cascade="all, delete", passive_deletes=True
     )
     notes: Mapped[List["ProjectNotes"]] = relationship(
-        back_populates="project", cascade="all, delete"
+        back_populates="project", cascade="all, delete", passive_deletes=True
     )
 
     def __repr__(self):
@@ -60,36 +83,73 @@ class ProjectData(Base):
     """ProjectData SQLAlchemy model"""
 
     __tablename__ = "project_data_table"
+    __table_args__ = (
+        Index("ix_project_data_project_created", "project_id", "created_date", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     created_date: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        CreatedDate, server_default=func.now()
     )
     updated_date: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
-    sensor_data: Mapped[str] = mapped_column(String)
-    project_id: Mapped[int] = mapped_column(ForeignKey("project_table.id"))
+    temperature: Mapped[float | None] = mapped_column(Float)
+    humidity: Mapped[float | None] = mapped_column(Float)
+    soil_moisture: Mapped[float | None] = mapped_column(Float)
+    extra: Mapped[Optional[dict | list]] = mapped_column(JSON(none_as_null=True))
+    project_id: Mapped[int] = mapped_column(
+        ForeignKey("project_table.id", ondelete="CASCADE")
+    )
     project: Mapped["Project"] = relationship(back_populates="data")
 
     def __repr__(self):
         return f"Project Data: {self.id}"
 
 
+class ProjectDataRollup(Base):
+    """Aggregates of one sensor metric for one Project over one time bucket"""
+
+    __tablename__ = "project_data_rollup_table"
+    __table_args__ = (
+        UniqueConstraint("project_id", "bucket", "bucket_start", "metric"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    project_id: Mapped[int] = mapped_column(
+        ForeignKey("project_table.id", ondelete="CASCADE")
+    )
+    bucket: Mapped[str] = mapped_column(String, nullable=False)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    metric: Mapped[str] = mapped_column(String, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    min_value: Mapped[float] = mapped_column(Float, nullable=False)
+    max_value: Mapped[float] = mapped_column(Float, nullable=False)
+    total: Mapped[float] = mapped_column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"Rollup: {self.project_id} {self.metric} {self.bucket_start}"
+
+
 class ProjectNotes(Base):
     """ProjectNotes SQLAlchemy model"""
 
     __tablename__ = "project_notes_tables"
+    __table_args__ = (
+        Index("ix_project_notes_project_created", "project_id", "created_date", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     created_date: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now()
+        CreatedDate, server_default=func.now()
     )
     updated_date: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
     note: Mapped[List[str]] = mapped_column(String)
-    project_id: Mapped[int] = mapped_column(ForeignKey("project_table.id"))
+    project_id: Mapped[int] = mapped_column(
+        ForeignKey("project_table.id", ondelete="CASCADE")
+    )
     project: Mapped["Project"] = relationship(back_populates="notes")
 
     def __repr__(self):
@@ -0,0 +1,88 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import Response
+from sqlalchemy import Select, literal, tuple_
+
+
+def encode_cursor(created_date: datetime, record_id: int) -> str:
+    """
+    Build an opaque cursor pointing just past a record.
+    :param created_date: the record's created date
+    :param record_id: the record's ID
+    :return: a URL safe cursor string
+    """
+    raw = json.dumps([created_date.isoformat(), record_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Read the position out of a cursor built by encode_cursor.
+    :param cursor: the cursor string
+    :return: a tuple of the created date and ID the cursor points past
+    :raises ValueError: if the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_date, record_id = json.loads(raw)
+        return datetime.fromisoformat(created_date), int(record_id)
+    except (TypeError, ValueError) as error:
+        raise ValueError("Invalid cursor") from error
+
+
+def keyset_page(query: Select, model, cursor: str | None, limit: int) -> Select:
+    """
+    Order a query by (created_date, id) and restrict it to the page after a cursor.
+    :param query: the SELECT to paginate
+    :param model: the model with created_date and id columns
+    :param cursor: a cursor from a previous page, or None for the first page
+    :param limit: the max number of records to return
+    :return: the paginated SELECT
+    :raises ValueError: if the cursor is malformed
+    """
+    if cursor is not None:
+        created_date, record_id = decode_cursor(cursor)
+        position = tuple_(
+            literal(created_date, model.created_date.type),
+            literal(record_id, model.id.type),
+        )
+        query = query.where(tuple_(model.created_date, model.id) > position)
+    return query.order_by(model.created_date, model.id).limit(limit)
+
+
+def latest_page(query: Select, model, limit: int) -> Select:
+    """
+    Order a query newest first by (created_date, id) and fetch one record more than limit,
+    so the caller can tell whether older records were left out.
+    :param query: the SELECT to restrict
+    :param model: the model with created_date and id columns
+    :param limit: the max number of records the caller keeps
+    :return: the restricted SELECT
+    """
+    return query.order_by(model.created_date.desc(), model.id.desc()).limit(limit + 1)
+
+
+def next_cursor(records: list, limit: int) -> str | None:
+    """
+    Return the cursor for the page after records, or None if this was the last page.
+    :param records: the records of the current page
+    :param limit: the page size the records were fetched with
+    :return: a cursor string or None
+    """
+    if not records or len(records) < limit:
+        return None
+    return encode_cursor(records[-1].created_date, records[-1].id)
+
+
+def set_next_cursor(response: Response, records: list, limit: int) -> None:
+    """
+    Set the X-Next-Cursor header when a listing may have more records.
+    :param response: the outgoing response
+    :param records: the records of the current page
+    :param limit: the page size the records were fetched with
+    """
+    cursor = next_cursor(records, limit)
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = cursor
@@ -0,0 +1,78 @@
+"""
+Per-request SQL profiling. QueryProfileMiddleware opens a QueryProfile for every HTTP
+request, and the engine hooks in seedweb.database record each statement the request
+executes in it, counted and timed per statement shape. When QUERY_PROFILE_HEADERS is set,
+the totals are returned in the X-DB-Queries and X-DB-Time (milliseconds) response headers.
+A statement shape executed more than QUERY_REPEAT_THRESHOLD times in one request, the mark
+of an N+1 query pattern such as a lazy load in a loop, is logged as a warning.
+"""
+
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from seedweb.database import QueryProfile, query_profile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADERS = ("X-DB-Queries", "X-DB-Time")
+
+
+class QueryProfileMiddleware:
+    """ASGI middleware attributing the statements executed to the current HTTP request"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        headers: bool = False,
+        repeat_threshold: int = 10,
+    ):
+        self.app = app
+        self.headers = headers
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = QueryProfile()
+        token = query_profile.set(profile)
+
+        async def profiled_send(message: Message) -> None:
+            if self.headers and message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers[PROFILE_HEADERS[0]] = str(profile.count)
+                headers[PROFILE_HEADERS[1]] = f"{profile.seconds * 1e3:.3f}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, profiled_send)
+        finally:
+            query_profile.reset(token)
+            self.report(scope, profile)
+
+    def report(self, scope: Scope, profile: QueryProfile) -> None:
+        """
+        Log the statements a request executed, warning of any shape repeated too often.
+        :param scope: the request's ASGI scope
+        :param profile: the request's QueryProfile
+        """
+        if not profile.count:
+            return
+        route = getattr(scope.get("route"), "path", scope["path"])
+        for shape, count in profile.repeated(self.repeat_threshold):
+            logger.warning(
+                "%s %s executed the same statement %d times: %s",
+                scope["method"],
+                route,
+                count,
+                shape,
+            )
+        logger.debug(
+            "%s %s executed %d statements in %.3f ms",
+            scope["method"],
+            route,
+            profile.count,
+            profile.seconds * 1e3,
+        )
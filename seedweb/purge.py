@@ -0,0 +1,256 @@
+"""
+Chunked deletion of Projects. Deleting a Project removes its data, notes and rollups in the
+same statement, through the foreign keys' ON DELETE CASCADE, which holds the write lock for
+as long as that takes. DELETE /projects/{project_id}?chunked=true marks the Project as
+waiting to be purged, which hides it from reads, and hands it to the PurgeJob instead,
+returning at once: its records are deleted in small batches, each in its own short
+transaction, then the Project itself. The mark is kept in the database, so every worker
+sees the pending purges and a purge lost to a restart is resumed by the next job to start.
+Run on one Project with `python -m seedweb.purge PROJECT_ID`.
+"""
+
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import Engine, delete, select
+
+from config import active_config
+from seedweb import archive, statements
+from seedweb.broker import status_broker
+from seedweb.cache import status_cache
+from seedweb.database import engine
+from seedweb.models import Project, ProjectData, ProjectDataRollup, ProjectNotes
+
+logger = logging.getLogger(__name__)
+
+PURGED_MODELS = (ProjectDataRollup, ProjectData, ProjectNotes)
+
+
+def purge_batch(bind: Engine, model: type, project_id: int, limit: int) -> int:
+    """
+    Delete up to limit of a Project's records of one model in one short transaction.
+    :param bind: SQLAlchemy engine
+    :param model: a model with a project_id column
+    :param project_id: the Project ID
+    :param limit: the max number of records to delete
+    :return: the number of records deleted
+    """
+    batch = select(model.id).where(model.project_id == project_id).limit(limit)
+    with bind.begin() as connection:
+        result = connection.execute(
+            delete(model).where(model.id.in_(batch.scalar_subquery()))
+        )
+    return result.rowcount
+
+
+def purge_project(
+    bind: Engine, project_id: int, batch_size: int = 1000, pause: float = 0.0
+) -> dict | None:
+    """
+    Mark a Project as waiting to be purged, if it is not already, then delete its records
+    batch by batch, pausing between batches so other writers can take the lock, then delete
+    the Project. Records written meanwhile are removed with it by the cascade.
+    :param bind: SQLAlchemy engine
+    :param project_id: the Project ID
+    :param batch_size: the max number of records deleted per transaction
+    :param pause: the number of seconds to sleep between batches
+    :return: dict report of the records deleted per table, or None if the Project does not
+        exist
+    """
+    started = time.monotonic()
+    with bind.begin() as connection:
+        connection.execute(statements.request_purge(project_id))
+    deleted = {}
+    for model in PURGED_MODELS:
+        total = 0
+        while True:
+            count = purge_batch(bind, model, project_id, batch_size)
+            total += count
+            if count < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+        deleted[model.__tablename__] = total
+    with bind.begin() as connection:
+        name = connection.scalar(
+            delete(Project).where(Project.id == project_id).returning(Project.name)
+        )
+    if name is None:
+        return None
+    archive.archive_store.remove_project(project_id)
+    status_cache.invalidate(project_id)
+    status_broker.publish_project(project_id)
+    logger.info("Purged Project %s with %d records", name, sum(deleted.values()))
+    return {
+        "project_id": project_id,
+        "name": name,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "seconds": time.monotonic() - started,
+        "rows_deleted": deleted,
+    }
+
+
+class PurgeJob:
+    """
+    Purges the Projects submitted to it, one at a time, on a background thread, and keeps
+    the report of the last purge. The Projects marked as waiting to be purged, by this
+    worker or another, are resumed when the job thread starts.
+    """
+
+    def __init__(self, bind: Engine, batch_size: int = 1000, pause: float = 0.05):
+        self.bind = bind
+        self.batch_size = batch_size
+        self.pause = pause
+        self.purged = 0
+        self.failed = 0
+        self.rows_deleted = 0
+        self.last_report: dict | None = None
+        self._queue: queue.Queue = queue.Queue()
+        self._queued: set[int] = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        """True while the job thread is purging submitted Projects"""
+        return self._thread is not None and not self._stopping.is_set()
+
+    @property
+    def pending(self) -> list[int]:
+        """The IDs of the Projects waiting to be purged, by any worker"""
+        with self.bind.connect() as connection:
+            return sorted(connection.scalars(statements.purge_requests()))
+
+    def start(self) -> None:
+        """
+        Start the job thread, which first resumes the Projects waiting to be purged, unless
+        a job thread is still running or finishing a purge.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="seedweb-purge", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stop the job, waiting for a purge in progress to finish. Projects still pending are
+        purged when the job is started again. If the wait times out, the purge in progress
+        carries on and the job cannot be started again until it has finished.
+        :param timeout: the max number of seconds to wait for the thread
+        """
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._thread = None
+
+    def submit(self, project_id: int) -> None:
+        """
+        Schedule a Project for purging. A Project already queued is not queued twice.
+        :param project_id: the Project ID
+        """
+        with self._lock:
+            if project_id in self._queued:
+                return
+            self._queued.add(project_id)
+        self._queue.put(project_id)
+
+    def resume(self) -> list[int]:
+        """
+        Queue every Project marked as waiting to be purged, such as those whose purge was
+        interrupted by a restart.
+        :return: the IDs of the Projects waiting to be purged
+        """
+        pending = self.pending
+        for project_id in pending:
+            self.submit(project_id)
+        return pending
+
+    def run_once(self) -> list[dict]:
+        """
+        Purge every pending Project now.
+        :return: a list of the purge reports
+        """
+        reports = []
+        while True:
+            try:
+                project_id = self._queue.get_nowait()
+            except queue.Empty:
+                return reports
+            report = self._purge(project_id)
+            if report is not None:
+                reports.append(report)
+
+    def stats(self) -> dict:
+        """
+        Return the job metrics.
+        :return: dict of the pending Projects, the job totals and the last purge's report
+        """
+        return {
+            "running": self.running,
+            "pending": self.pending,
+            "purged": self.purged,
+            "failed": self.failed,
+            "rows_deleted": self.rows_deleted,
+            "last_report": self.last_report,
+        }
+
+    def _purge(self, project_id: int) -> dict | None:
+        """
+        Purge one Project, recording the outcome.
+        :param project_id: the Project ID
+        :return: the purge report or None if the Project was gone or the purge failed
+        """
+        try:
+            report = purge_project(self.bind, project_id, self.batch_size, self.pause)
+        except Exception:
+            self.failed += 1
+            logger.exception("Purge of Project %s failed", project_id)
+            return None
+        finally:
+            with self._lock:
+                self._queued.discard(project_id)
+        if report is not None:
+            self.purged += 1
+            self.rows_deleted += sum(report["rows_deleted"].values())
+            self.last_report = report
+        return report
+
+    def _run(self) -> None:
+        """Resume the pending purges, then purge submitted Projects until stopped"""
+        try:
+            self.resume()
+        except Exception:
+            logger.exception("Resuming the pending purges failed")
+        while not self._stopping.is_set():
+            try:
+                project_id = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self._purge(project_id)
+
+
+purge_job = PurgeJob(
+    engine,
+    batch_size=active_config.PURGE_BATCH_SIZE,
+    pause=active_config.PURGE_BATCH_PAUSE,
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete a Project in batches")
+    parser.add_argument("project_id", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    purge_job.submit(args.project_id)
+    print(json.dumps(purge_job.run_once(), indent=2))
@@ -0,0 +1,150 @@
+"""
+Startup work kept out of import time. Importing seedweb.main does not touch the database:
+the application's lifespan creates any missing tables, then a Warmup thread fills the
+status cache and compiles the list encoders while the server already accepts connections.
+GET /readiness answers 503 until the warm-up has finished, so a load balancer can hold
+traffic back from a cold worker.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import sessionmaker
+
+from config import active_config
+from seedweb import crud, schemas
+from seedweb.database import SessionLocal
+from seedweb.models import Base
+from seedweb.serialization import row_encoder
+
+logger = logging.getLogger(__name__)
+
+LIST_SCHEMAS = (schemas.Profile, schemas.ProjectData, schemas.ProjectNotes)
+
+
+def create_schema(bind: Engine) -> None:
+    """
+    Create the tables that do not exist yet. Existing tables are left alone; use
+    seedweb.migrations to bring them up to date. When several workers start at once, another
+    one may create a table between the check and the CREATE; the tables are then checked
+    again. Every such collision leaves one more table in place, so a failure that persists
+    through a retry per table is raised.
+    :param bind: the engine to create the tables with
+    """
+    attempts = len(Base.metadata.tables)
+    for attempt in range(1, attempts + 1):
+        try:
+            Base.metadata.create_all(bind=bind)
+            return
+        except (OperationalError, ProgrammingError):
+            if attempt == attempts:
+                raise
+            logger.info("Tables were created concurrently, checking them again")
+
+
+class Warmup:
+    """
+    Warms the caches on a background thread, retrying every retry_interval seconds until it
+    succeeds, and records when the application became ready.
+    """
+
+    def __init__(self, session_factory: sessionmaker, retry_interval: float = 5.0):
+        self.session_factory = session_factory
+        self.retry_interval = retry_interval
+        self.started_at: datetime | None = None
+        self.ready_at: datetime | None = None
+        self.seconds: float | None = None
+        self.projects_cached = 0
+        self.failed = 0
+        self.last_error: str | None = None
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def ready(self) -> bool:
+        """True once a warm-up has completed"""
+        return self._ready.is_set()
+
+    def start(self) -> None:
+        """Start the warm-up thread, unless a warm-up thread is still running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self.started_at = datetime.now(timezone.utc)
+        self._thread = threading.Thread(
+            target=self._run, name="seedweb-warmup", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stop retrying, waiting for a warm-up in progress to finish. If the wait times out,
+        the warm-up in progress carries on and cannot be started again until it has finished.
+        :param timeout: the max number of seconds to wait for the thread
+        """
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._thread = None
+
+    def run_once(self) -> None:
+        """
+        Compile the list encoders, load the schedule of every Project into the status cache
+        and run the Project detail and listing queries once, so their SQL is in the
+        engine's compiled statement cache, then mark the application ready.
+        """
+        started = time.perf_counter()
+        for schema in LIST_SCHEMAS:
+            row_encoder(schema)
+        with self.session_factory() as db:
+            statuses = crud.get_projects_status(db)
+            if statuses["projects"]:
+                project_id = statuses["projects"][0]["id"]
+                limit = active_config.PROJECT_DETAIL_LIMIT
+                crud.get_project(db, project_id, data_limit=limit, notes_limit=limit)
+                crud.get_projects_data(db, project_id, limit=1)
+                crud.get_projects_notes(db, project_id, limit=1)
+        self.projects_cached = len(statuses["projects"])
+        self.seconds = round(time.perf_counter() - started, 3)
+        self.ready_at = datetime.now(timezone.utc)
+        self._ready.set()
+        logger.info(
+            "Warm-up cached %d Projects in %.3fs", self.projects_cached, self.seconds
+        )
+
+    def stats(self) -> dict:
+        """
+        Return the warm-up state.
+        :return: dict of whether the application is ready and what the warm-up did
+        """
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at and self.started_at.isoformat(),
+            "ready_at": self.ready_at and self.ready_at.isoformat(),
+            "seconds": self.seconds,
+            "projects_cached": self.projects_cached,
+            "failed": self.failed,
+            "last_error": self.last_error,
+        }
+
+    def _run(self) -> None:
+        """Warm up, retrying until it succeeds or the warm-up is stopped"""
+        while not self._stopping.is_set():
+            try:
+                self.run_once()
+                return
+            except Exception as error:
+                self.failed += 1
+                self.last_error = repr(error)
+                logger.exception("Warm-up failed")
+            self._stopping.wait(self.retry_interval)
+
+
+warmup = Warmup(SessionLocal, retry_interval=active_config.WARMUP_RETRY_INTERVAL)
@@ -0,0 +1,295 @@
+"""
+Retention for raw sensor readings. Readings older than their Project's retention_days, or
+DATA_RETENTION_DAYS when the Project sets none, are deleted in small batches so the write
+lock is only held briefly, then SQLite's free pages are handed back to the filesystem with
+an incremental vacuum. Rollups are kept. Run once with `python -m seedweb.retention`.
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Engine, delete, select
+
+from config import active_config
+from seedweb.database import engine
+from seedweb.models import Project, ProjectData
+
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def retention_cutoffs(
+    bind: Engine, default_days: int | None = None, now: datetime | None = None
+) -> dict[int, datetime]:
+    """
+    Work out the oldest reading to keep for every Project with a retention policy.
+    :param bind: SQLAlchemy engine
+    :param default_days: the retention for Projects without their own, None keeps forever
+    :param now: the current time, defaults to now in UTC
+    :return: dict of Project IDs and the time before which readings expire
+    """
+    now = datetime.now(timezone.utc) if now is None else now
+    with bind.connect() as connection:
+        rows = connection.execute(select(Project.id, Project.retention_days)).all()
+    cutoffs = {}
+    for project_id, days in rows:
+        days = days or default_days
+        if days:
+            cutoffs[project_id] = now - timedelta(days=days)
+    return cutoffs
+
+
+def prune_batch(bind: Engine, project_id: int, cutoff: datetime, limit: int) -> int:
+    """
+    Delete up to limit of a Project's oldest expired readings in one short transaction.
+    :param bind: SQLAlchemy engine
+    :param project_id: the Project ID
+    :param cutoff: readings created before this time are deleted
+    :param limit: the max number of readings to delete
+    :return: the number of readings deleted
+    """
+    expired = (
+        select(ProjectData.id)
+        .where(ProjectData.project_id == project_id)
+        .where(ProjectData.created_date < cutoff)
+        .order_by(ProjectData.created_date, ProjectData.id)
+        .limit(limit)
+    )
+    with bind.begin() as connection:
+        result = connection.execute(
+            delete(ProjectData).where(ProjectData.id.in_(expired.scalar_subquery()))
+        )
+    return result.rowcount
+
+
+def prune_project(
+    bind: Engine,
+    project_id: int,
+    cutoff: datetime,
+    batch_size: int = 1000,
+    pause: float = 0.0,
+) -> int:
+    """
+    Delete all of a Project's expired readings, batch by batch, pausing between batches so
+    other writers can take the lock.
+    :param bind: SQLAlchemy engine
+    :param project_id: the Project ID
+    :param cutoff: readings created before this time are deleted
+    :param batch_size: the max number of readings deleted per transaction
+    :param pause: the number of seconds to sleep between batches
+    :return: the number of readings deleted
+    """
+    total = 0
+    while True:
+        deleted = prune_batch(bind, project_id, cutoff, batch_size)
+        total += deleted
+        if deleted < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
+
+
+def database_pages(bind: Engine) -> tuple[int, int, int]:
+    """
+    Read the size of a SQLite database file.
+    :param bind: a SQLite engine
+    :return: the page size in bytes, the page count and the number of free pages
+    """
+    with bind.connect() as connection:
+        return tuple(
+            connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ("page_size", "page_count", "freelist_count")
+        )
+
+
+def reclaim_space(bind: Engine, max_pages: int | None = None) -> int:
+    """
+    Return free pages to the filesystem with an incremental vacuum. Only SQLite databases
+    with auto_vacuum set to INCREMENTAL can be vacuumed this way; others are left alone.
+    :param bind: SQLAlchemy engine
+    :param max_pages: the max number of pages to release, None releases them all
+    :return: the number of bytes the database file shrank by
+    """
+    if bind.dialect.name != "sqlite":
+        return 0
+    with bind.connect() as connection:
+        mode = connection.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+    if mode != AUTO_VACUUM_INCREMENTAL:
+        logger.debug("Skipping incremental vacuum, auto_vacuum is %s", mode)
+        return 0
+    page_size, before, _ = database_pages(bind)
+    with bind.connect() as connection:
+        pages = "" if max_pages is None else f"({int(max_pages)})"
+        connection.exec_driver_sql(f"PRAGMA incremental_vacuum{pages}")
+        connection.commit()
+    _, after, _ = database_pages(bind)
+    return (before - after) * page_size
+
+
+def enforce_retention(
+    bind: Engine,
+    default_days: int | None = None,
+    batch_size: int = 1000,
+    pause: float = 0.0,
+    max_vacuum_pages: int | None = None,
+) -> dict:
+    """
+    Prune every Project's expired readings, then reclaim the freed space.
+    :param bind: SQLAlchemy engine
+    :param default_days: the retention for Projects without their own, None keeps forever
+    :param batch_size: the max number of readings deleted per transaction
+    :param pause: the number of seconds to sleep between batches
+    :param max_vacuum_pages: the max number of pages the vacuum releases
+    :return: dict report of the rows deleted per Project and the bytes freed
+    """
+    started = time.monotonic()
+    projects = {}
+    for project_id, cutoff in retention_cutoffs(bind, default_days).items():
+        deleted = prune_project(bind, project_id, cutoff, batch_size, pause)
+        if deleted:
+            projects[project_id] = deleted
+    bytes_freed = reclaim_space(bind, max_vacuum_pages)
+    report = {
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "seconds": time.monotonic() - started,
+        "rows_deleted": sum(projects.values()),
+        "bytes_freed": bytes_freed,
+        "projects": projects,
+    }
+    logger.info(
+        "Retention deleted %d readings and freed %d bytes",
+        report["rows_deleted"],
+        bytes_freed,
+    )
+    return report
+
+
+class RetentionJob:
+    """
+    Runs enforce_retention on a background thread every interval seconds and keeps the
+    report of the last run.
+    """
+
+    def __init__(
+        self,
+        bind: Engine,
+        interval: float = 3600.0,
+        default_days: int | None = None,
+        batch_size: int = 1000,
+        pause: float = 0.05,
+        max_vacuum_pages: int | None = None,
+    ):
+        self.bind = bind
+        self.interval = interval
+        self.default_days = default_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self.max_vacuum_pages = max_vacuum_pages
+        self.runs = 0
+        self.failed = 0
+        self.rows_deleted = 0
+        self.bytes_freed = 0
+        self.last_report: dict | None = None
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        """True while the job thread is scheduled to run"""
+        return self._thread is not None and not self._stopping.is_set()
+
+    def start(self) -> None:
+        """Start the job thread, unless a job thread is still running or finishing a run"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="seedweb-retention", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stop the job, waiting for a run in progress to finish. If the wait times out, the
+        run in progress carries on and the job cannot be started again until it has finished.
+        :param timeout: the max number of seconds to wait for the thread
+        """
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._thread = None
+
+    def run_once(self) -> dict:
+        """
+        Enforce retention now.
+        :return: dict report of the run
+        """
+        report = enforce_retention(
+            self.bind,
+            self.default_days,
+            self.batch_size,
+            self.pause,
+            self.max_vacuum_pages,
+        )
+        self.runs += 1
+        self.rows_deleted += report["rows_deleted"]
+        self.bytes_freed += report["bytes_freed"]
+        self.last_report = report
+        return report
+
+    def stats(self) -> dict:
+        """
+        Return the job metrics.
+        :return: dict of the job totals and the last run's report
+        """
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "default_days": self.default_days,
+            "runs": self.runs,
+            "failed": self.failed,
+            "rows_deleted": self.rows_deleted,
+            "bytes_freed": self.bytes_freed,
+            "last_report": self.last_report,
+        }
+
+    def _run(self) -> None:
+        """Run until stopped, waiting interval seconds between runs"""
+        while not self._stopping.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                self.failed += 1
+                logger.exception("Retention run failed")
+            self._stopping.wait(self.interval)
+
+
+retention_job = RetentionJob(
+    engine,
+    interval=active_config.RETENTION_INTERVAL,
+    default_days=active_config.DATA_RETENTION_DAYS,
+    batch_size=active_config.RETENTION_BATCH_SIZE,
+    pause=active_config.RETENTION_BATCH_PAUSE,
+    max_vacuum_pages=active_config.RETENTION_VACUUM_PAGES,
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete expired sensor readings")
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=active_config.DATA_RETENTION_DAYS,
+        help="retention for Projects without their own",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    retention_job.default_days = args.days
+    print(json.dumps(retention_job.run_once(), indent=2))
@@ -0,0 +1,301 @@
+"""
+Time-bucket rollups of sensor readings. Rollups are updated incrementally as readings are
+written. When a reading is updated or deleted, the buckets it fell in are recomputed from
+the raw readings in the same transaction, since a min or max cannot be taken back. Every
+rollup can be rebuilt from the raw readings with `python -m seedweb.rollups`.
+"""
+
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import Engine, delete, func, select, tuple_
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
+
+from seedweb import archive
+from seedweb.database import engine
+from seedweb.models import SENSOR_METRICS, ProjectData, ProjectDataRollup
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ("minute", "hour", "day")
+
+_TRUNCATE = {
+    "minute": dict(second=0, microsecond=0),
+    "hour": dict(minute=0, second=0, microsecond=0),
+    "day": dict(hour=0, minute=0, second=0, microsecond=0),
+}
+
+
+def bucket_start(timestamp: datetime, bucket: str) -> datetime:
+    """
+    Truncate a timestamp to the start of its bucket.
+    :param timestamp: the reading timestamp
+    :param bucket: one of BUCKETS
+    :return: the start of the bucket
+    """
+    return timestamp.replace(**_TRUNCATE[bucket])
+
+
+def rollup_rows(readings: Iterable[tuple[int, datetime, dict]]) -> list[dict]:
+    """
+    Aggregate readings into one row per Project, bucket, bucket start and metric.
+    :param readings: (project ID, created date, sensor column values) tuples
+    :return: a list of ProjectDataRollup rows
+    """
+    aggregates: dict[tuple, list] = {}
+    for project_id, created_date, values in readings:
+        for metric in SENSOR_METRICS:
+            value = values.get(metric)
+            if value is None:
+                continue
+            for bucket in BUCKETS:
+                key = (project_id, bucket, bucket_start(created_date, bucket), metric)
+                aggregate = aggregates.get(key)
+                if aggregate is None:
+                    aggregates[key] = [1, value, value, value]
+                else:
+                    aggregate[0] += 1
+                    aggregate[1] = min(aggregate[1], value)
+                    aggregate[2] = max(aggregate[2], value)
+                    aggregate[3] += value
+    return [
+        dict(
+            project_id=project_id,
+            bucket=bucket,
+            bucket_start=start,
+            metric=metric,
+            count=count,
+            min_value=min_value,
+            max_value=max_value,
+            total=total,
+        )
+        for (project_id, bucket, start, metric), (
+            count,
+            min_value,
+            max_value,
+            total,
+        ) in aggregates.items()
+    ]
+
+
+def _upsert_statement(dialect_name: str):
+    """
+    Build an INSERT that merges into existing rollup rows on conflict.
+    :param dialect_name: the database dialect name
+    :return: an INSERT ... ON CONFLICT DO UPDATE statement
+    :raises NotImplementedError: if the dialect is neither SQLite nor PostgreSQL
+    """
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects import postgresql
+
+        statement = postgresql.insert(ProjectDataRollup.__table__)
+        smaller, larger = func.least, func.greatest
+    elif dialect_name == "sqlite":
+        statement = sqlite.insert(ProjectDataRollup.__table__)
+        smaller, larger = func.min, func.max
+    else:
+        raise NotImplementedError(
+            f"Rollups need INSERT ... ON CONFLICT DO UPDATE, which is only built for "
+            f"SQLite and PostgreSQL, not {dialect_name}"
+        )
+    table = ProjectDataRollup.__table__.c
+    excluded = statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=["project_id", "bucket", "bucket_start", "metric"],
+        set_={
+            "count": table.count + excluded.count,
+            "min_value": smaller(table.min_value, excluded.min_value),
+            "max_value": larger(table.max_value, excluded.max_value),
+            "total": table.total + excluded.total,
+        },
+    )
+
+
+def apply_readings(db: Session, readings: Iterable[tuple[int, datetime, dict]]) -> None:
+    """
+    Fold new readings into the rollup tables. The caller commits.
+    :param db: SQLAlchemy sessionmaker
+    :param readings: (project ID, created date, sensor column values) tuples
+    """
+    rows = rollup_rows(readings)
+    if rows:
+        db.execute(_upsert_statement(db.get_bind().dialect.name), rows)
+
+
+def refresh_readings(
+    db: Session, readings: Iterable[tuple[int, datetime | None]]
+) -> None:
+    """
+    Recompute the rollups of the buckets some readings fell in, after they were updated or
+    deleted. The raw readings of each affected day, archived and in the database, are read
+    once and only the affected minute, hour and day rows are replaced. The caller commits.
+    :param db: SQLAlchemy sessionmaker
+    :param readings: (project ID, created date) tuples of the changed readings
+    """
+    keys = {
+        (project_id, bucket, bucket_start(created_date, bucket))
+        for project_id, created_date in readings
+        if created_date is not None
+        for bucket in BUCKETS
+    }
+    if not keys:
+        return
+    db.execute(
+        delete(ProjectDataRollup).where(
+            tuple_(
+                ProjectDataRollup.project_id,
+                ProjectDataRollup.bucket,
+                ProjectDataRollup.bucket_start,
+            ).in_(keys)
+        )
+    )
+    columns = [getattr(ProjectData, metric) for metric in SENSOR_METRICS]
+    raw = []
+    for project_id, bucket, start in keys:
+        if bucket != "day":
+            continue
+        end = start + timedelta(days=1)
+        rows = db.execute(
+            select(ProjectData.id, ProjectData.created_date, *columns).where(
+                ProjectData.project_id == project_id,
+                ProjectData.created_date >= start,
+                ProjectData.created_date < end,
+            )
+        ).all()
+        raw.extend((project_id, row.created_date, row._asdict()) for row in rows)
+        hot_ids = {row.id for row in rows}
+        for archived in archive.archive_store.iter_rows(project_id, start, end):
+            raw.extend(
+                (project_id, row["created_date"], row)
+                for row in archived
+                if row["id"] not in hot_ids
+            )
+    rows = [
+        row
+        for row in rollup_rows(raw)
+        if (row["project_id"], row["bucket"], row["bucket_start"]) in keys
+    ]
+    if rows:
+        db.execute(_upsert_statement(db.get_bind().dialect.name), rows)
+
+
+def get_rollups(
+    db: Session,
+    project_id: int,
+    bucket: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    metric: str | None = None,
+) -> list[ProjectDataRollup]:
+    """
+    Return the rollups of a Project for a bucket size and time range.
+    :param db: SQLAlchemy sessionmaker
+    :param project_id: the Project ID
+    :param bucket: one of BUCKETS
+    :param start: the earliest bucket start to return, inclusive
+    :param end: the latest bucket start to return, exclusive
+    :param metric: only return rollups of this metric
+    :return: a list of ProjectDataRollup objects ordered by bucket start
+    """
+    query = select(ProjectDataRollup).where(
+        ProjectDataRollup.project_id == project_id, ProjectDataRollup.bucket == bucket
+    )
+    if start is not None:
+        query = query.where(ProjectDataRollup.bucket_start >= start)
+    if end is not None:
+        query = query.where(ProjectDataRollup.bucket_start < end)
+    if metric is not None:
+        query = query.where(ProjectDataRollup.metric == metric)
+    query = query.order_by(ProjectDataRollup.bucket_start, ProjectDataRollup.metric)
+    return list(db.scalars(query))
+
+
+def rebuild(bind: Engine, project_id: int | None = None, batch_size: int = 5000) -> int:
+    """
+    Recompute rollups from the raw readings, archived and in the database, for one Project
+    or for all of them. Use after backfilling readings or importing them outside the API.
+    Each Project is rebuilt in one transaction, so readings written meanwhile are folded
+    in once, either by the rebuild or as they are written.
+    :param bind: SQLAlchemy engine
+    :param project_id: the Project ID, or None for every Project
+    :param batch_size: the number of raw readings to read at a time
+    :return: the number of readings folded in
+    """
+    if project_id is None:
+        with Session(bind) as db:
+            projects = set(archive.archive_store.projects())
+            projects.update(db.scalars(select(ProjectData.project_id).distinct()))
+            projects.update(db.scalars(select(ProjectDataRollup.project_id).distinct()))
+    else:
+        projects = {project_id}
+    folded = 0
+    for rebuilt_id in sorted(projects):
+        with Session(bind) as db:
+            folded += _rebuild_project(db, rebuilt_id, batch_size)
+            db.commit()
+    return folded
+
+
+def _rebuild_project(db: Session, project_id: int, batch_size: int) -> int:
+    """
+    Replace the rollups of one Project. The delete comes first, so on SQLite the
+    transaction holds the write lock before the high-water ID is read, and only readings
+    up to it are folded in: later ones are folded in by apply_readings as they are
+    written. Readings left in the database by an interrupted archive move are only folded
+    in from the archive. The caller commits.
+    :param db: SQLAlchemy sessionmaker
+    :param project_id: the Project ID
+    :param batch_size: the number of raw readings to read at a time
+    :return: the number of readings folded in
+    """
+    db.execute(
+        delete(ProjectDataRollup).where(ProjectDataRollup.project_id == project_id)
+    )
+    high_water = db.scalar(
+        select(func.max(ProjectData.id)).where(ProjectData.project_id == project_id)
+    )
+
+    folded = 0
+    for rows in archive.archive_store.iter_rows(project_id):
+        apply_readings(db, ((project_id, row["created_date"], row) for row in rows))
+        folded += len(rows)
+    if high_water is None:
+        return folded
+
+    columns = [getattr(ProjectData, metric) for metric in SENSOR_METRICS]
+    query = select(ProjectData.id, ProjectData.created_date, *columns).where(
+        ProjectData.project_id == project_id, ProjectData.id <= high_water
+    )
+    duplicates = archive.archive_store.duplicate_ids(db, project_id)
+    if duplicates:
+        query = query.where(ProjectData.id.not_in(duplicates))
+    last_id = 0
+    while True:
+        rows = db.execute(
+            query.where(ProjectData.id > last_id)
+            .order_by(ProjectData.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return folded
+        apply_readings(
+            db,
+            (
+                (project_id, row.created_date, row._asdict())
+                for row in rows
+                if row.created_date is not None
+            ),
+        )
+        folded += len(rows)
+        last_id = rows[-1].id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild sensor data rollups")
+    parser.add_argument("--project", type=int, help="only rebuild this Project ID")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    logger.info("Folded %d readings into rollups", rebuild(engine, args.project))
@@ -0,0 +1,162 @@
+"""
+Daily light schedules. A Project's start and end times are compiled once into a Schedule,
+which answers whether the lights are on at a given moment and when that will next change.
+Windows whose end is earlier than their start run overnight, and times are read on the
+wall clock of the Project's timezone, so transitions follow daylight saving changes.
+"""
+
+from datetime import datetime, time, timedelta, timezone, tzinfo
+from typing import NamedTuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from config import active_config
+
+
+def load_timezone(name: str | None) -> tzinfo | None:
+    """
+    Resolve an IANA timezone name, falling back to SCHEDULE_TIMEZONE. None means the
+    server's local time.
+    :param name: an IANA timezone name such as "America/New_York"
+    :return: a tzinfo or None
+    :raises ValueError: if the name is not a known timezone
+    """
+    name = name or active_config.SCHEDULE_TIMEZONE
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def seconds_of_day(value: time) -> int:
+    """
+    Return the number of seconds after midnight of a time of day.
+    :param value: a time of day
+    :return: the seconds after midnight
+    """
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+class ScheduleState(NamedTuple):
+    """Whether a Schedule is on at a moment and when that next changes"""
+
+    status: bool
+    next_transition: datetime | None
+    seconds_until_next_transition: int | None
+
+
+class Schedule(NamedTuple):
+    """A compiled daily on/off window"""
+
+    start: int
+    end: int
+    tz: tzinfo | None
+
+    @classmethod
+    def compile(
+        cls, start: time | None, end: time | None, timezone_name: str | None = None
+    ) -> "Schedule":
+        """
+        Compile a Project's start and end times. A window with no start or end, or with
+        equal start and end, is always off.
+        :param start: the time the lights turn on
+        :param end: the time the lights turn off
+        :param timezone_name: the IANA timezone the times are in
+        :return: a Schedule
+        """
+        if start is None or end is None:
+            return cls(0, 0, load_timezone(timezone_name))
+        return cls(
+            seconds_of_day(start), seconds_of_day(end), load_timezone(timezone_name)
+        )
+
+    @property
+    def overnight(self) -> bool:
+        """Whether the window crosses midnight"""
+        return self.end < self.start
+
+    def is_on(self, seconds: int) -> bool:
+        """
+        Whether the lights are on at a time of day.
+        :param seconds: the seconds after midnight, on the Schedule's wall clock
+        :return: True if the lights are on
+        """
+        if self.start == self.end:
+            return False
+        if self.overnight:
+            return seconds >= self.start or seconds < self.end
+        return self.start <= seconds < self.end
+
+    def now(self) -> datetime:
+        """
+        Return the current time on the Schedule's wall clock.
+        :return: an aware datetime, or a naive local one without a timezone
+        """
+        return datetime.now(self.tz)
+
+    def transitions(self, now: datetime, days: int = 1) -> list[tuple[datetime, bool]]:
+        """
+        List the moments the lights change, from now until days later.
+        :param now: the current time on the Schedule's wall clock
+        :param days: how far ahead to look
+        :return: a list of the transition times and the status they switch to
+        """
+        if self.start == self.end:
+            return []
+        horizon = now + timedelta(days=days)
+        found = []
+        for offset in range(days + 1):
+            day = now.date() + timedelta(days=offset)
+            for seconds, status in ((self.start, True), (self.end, False)):
+                moment = datetime.combine(
+                    day,
+                    time(seconds // 3600, seconds // 60 % 60, seconds % 60),
+                    self.tz,
+                )
+                if now < moment <= horizon:
+                    found.append((moment, status))
+        return sorted(found)
+
+    def state(self, now: datetime | None = None) -> ScheduleState:
+        """
+        Return whether the lights are on and when that next changes.
+        :param now: the current time, defaults to now on the Schedule's wall clock
+        :return: a ScheduleState
+        """
+        now = self.now() if now is None else now
+        if self.tz is not None:
+            now = now.astimezone(self.tz)
+        status = self.is_on(seconds_of_day(now.time()))
+        upcoming = self.transitions(now)
+        if not upcoming:
+            return ScheduleState(status, None, None)
+        moment = upcoming[0][0]
+        if self.tz is not None:
+            wait = moment.astimezone(timezone.utc) - now.astimezone(timezone.utc)
+        else:
+            wait = moment - now
+        return ScheduleState(status, moment, max(int(wait.total_seconds()), 0))
+
+    def day_plan(self, now: datetime | None = None) -> dict:
+        """
+        Build a compact plan of the next 24 hours for devices to cache.
+        :param now: the current time, defaults to now on the Schedule's wall clock
+        :return: dict of the window, the current status and the upcoming transitions
+        """
+        now = self.now() if now is None else now
+        if self.tz is not None:
+            now = now.astimezone(self.tz)
+        offset = now.utcoffset()
+        return {
+            "timezone": getattr(self.tz, "key", None),
+            "utc_offset": int(offset.total_seconds()) if offset is not None else None,
+            "start": self.start,
+            "end": self.end,
+            "overnight": self.overnight,
+            "status": self.is_on(seconds_of_day(now.time())),
+            "transitions": [
+                {"at": moment.isoformat(), "status": status}
+                for moment, status in self.transitions(now)
+            ],
+        }
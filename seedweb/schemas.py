@@ -1,26 +1,64 @@
 import datetime
 import json
-from typing import Any, List
-
-from pydantic import BaseModel, field_validator
+from typing import Annotated, Any, List
+
+from pydantic import BaseModel, ConfigDict, Field, computed_field, field_validator
+
+from seedweb.models import SENSOR_METRICS
+from seedweb.schedule import load_timezone
+
+ColorValue = Annotated[int, Field(ge=0, le=255)]
+Color = Annotated[list[ColorValue], Field(min_length=3, max_length=3)]
+
+
+def parse_json_text(value: Any) -> Any:
+    """
+    Decode a payload sent as a JSON encoded string, the way older clients send colors and
+    sensor data. Anything else is returned as it is.
+    :param value: the submitted value
+    :return: the decoded value
+    :raises ValueError: if a string is not valid JSON
+    """
+    if isinstance(value, (str, bytes)):
+        try:
+            return json.loads(value)
+        except ValueError:
+            raise ValueError("Value is not valid JSON")
+    return value
+
+
+def sensor_payload(reading: Any) -> dict:
+    """
+    Rebuild the sensor payload of a reading from its typed metrics and extra fields.
+    :param reading: an object with the SENSOR_METRICS and extra attributes
+    :return: dict of the measured metrics and any other fields
+    """
+    payload = {
+        metric: value
+        for metric in SENSOR_METRICS
+        if (value := getattr(reading, metric)) is not None
+    }
+    if isinstance(reading.extra, dict):
+        payload.update(reading.extra)
+    return payload
 
 
 class ProfileBase(BaseModel):
     """ProfileBase model"""
 
     name: str
-    colors: str | None = None
+    colors: List[Color] | None = None
+
+    @field_validator("colors", mode="before")
+    @classmethod
+    def parse_colors(cls, v: Any) -> Any:
+        return parse_json_text(v)
 
 
 class ProfileCreate(ProfileBase):
     """ProfileCreate passthrough model"""
 
-    @classmethod
-    @field_validator("colors")
-    def validate_json(cls, v: Any):
-        if not json.loads(v):
-            raise ValueError("Colors are not valid JSON")
-        return v
+    pass
 
 
 class Profile(ProfileBase):
@@ -40,11 +78,6 @@ class Profile(ProfileBase):
     def format_updated_date(cls, v):
         return v.strftime("%b %d %Y %H:%M")
 
-    @classmethod
-    @field_validator("colors")
-    def format_colors(cls, v):
-        return json.loads(v)
-
     class ConfigDict:
         """
         Configuration dictionary to determine whether to build models and look up discriminators of tagged
@@ -54,28 +87,46 @@ class Profile(ProfileBase):
         from_attributes = True
 
 
+class SensorData(BaseModel):
+    """
+    A sensor reading. The metrics with a ProjectData column are validated as finite numbers
+    in their sensor's range; any other fields are kept as they were sent.
+    """
+
+    model_config = ConfigDict(extra="allow", allow_inf_nan=False)
+
+    temperature: float | None = None
+    humidity: float | None = Field(None, ge=0, le=100)
+    soil_moisture: float | None = Field(None, ge=0)
+
+
 class ProjectDataBase(BaseModel):
     """ProjectDataBase model"""
 
-    sensor_data: str
+    sensor_data: dict
     project_id: int
 
 
 class ProjectDataCreate(ProjectDataBase):
-    """ProjectDataCreate passthrough model"""
+    """ProjectDataCreate model, sensor_data may also be sent as a JSON encoded string"""
 
+    sensor_data: SensorData
+
+    @field_validator("sensor_data", mode="before")
     @classmethod
-    @field_validator("sensor_data")
-    def validate_json(cls, v: Any):
-        if not json.loads(v):
-            raise ValueError("Sensor Data is not valid JSON")
-        return v
+    def parse_sensor_data(cls, v: Any) -> Any:
+        return parse_json_text(v)
 
 
-class ProjectData(ProjectDataBase):
-    """ProjectData model"""
+class ProjectData(BaseModel):
+    """ProjectData model, sensor_data is rebuilt from the typed metrics and extra"""
 
+    project_id: int
     id: int
+    temperature: float | None = None
+    humidity: float | None = None
+    soil_moisture: float | None = None
+    extra: dict | list | None = None
     created_date: datetime.datetime
     updated_date: datetime.datetime
 
@@ -89,10 +140,10 @@ class ProjectData(ProjectDataBase):
     def format_updated_date(cls, v):
         return v.strftime("%b %d %Y %H:%M")
 
-    @classmethod
-    @field_validator("sensor_data")
-    def format_sensor_data(cls, v):
-        return json.loads(v)
+    @computed_field
+    @property
+    def sensor_data(self) -> dict:
+        return sensor_payload(self)
 
     class ConfigDict:
         """
@@ -103,6 +154,31 @@ class ProjectData(ProjectDataBase):
         from_attributes = True
 
 
+class ProjectDataBulkError(BaseModel):
+    """Describes why a reading in a bulk request was rejected"""
+
+    index: int
+    detail: str
+
+
+class ProjectDataBulkResult(BaseModel):
+    """Result of a bulk ProjectData request"""
+
+    created: List[int] = []
+    errors: List[ProjectDataBulkError] = []
+
+
+class ProjectDataRollup(BaseModel):
+    """Aggregates of one sensor metric over one time bucket"""
+
+    bucket_start: datetime.datetime
+    metric: str
+    count: int
+    min: float
+    max: float
+    mean: float
+
+
 class ProjectNotesBase(BaseModel):
     """ProjectNotesBase model"""
 
@@ -151,6 +227,15 @@ class ProjectBase(BaseModel):
     profile_id: int
     start: datetime.time
     end: datetime.time
+    timezone: str | None = None
+    retention_days: int | None = Field(None, gt=0)
+
+    @field_validator("timezone")
+    @classmethod
+    def validate_timezone(cls, v: str | None) -> str | None:
+        if v is not None:
+            load_timezone(v)
+        return v
 
 
 class ProjectList(ProjectBase):
@@ -171,11 +256,23 @@ class ProjectUpdate(ProjectBase):
     pass
 
 
+class ProjectLinks(BaseModel):
+    """
+    Links to the full listings of a Project's data and notes, set when the Project view
+    embeds only the latest records. The listings start at the oldest record, so they reach
+    the records the view left out.
+    """
+
+    data: str | None = None
+    notes: str | None = None
+
+
 class Project(ProjectBase):
     """Project model"""
 
     data: List[ProjectData] = []
     notes: List[ProjectNotes] = []
+    links: ProjectLinks = ProjectLinks()
     id: int
     created_date: datetime.datetime
     updated_date: datetime.datetime
@@ -0,0 +1,380 @@
+"""
+The statements behind seedweb.crud. They are built here once and executed by crud on a
+Session and by async_crud on an AsyncSession, so the sync and async paths differ only in
+how they run them. Statements that write return what the caller needs with RETURNING.
+"""
+
+from sqlalchemy import (
+    Delete,
+    Insert,
+    Select,
+    Update,
+    delete,
+    func,
+    insert,
+    select,
+    update,
+)
+
+from seedweb import schemas
+from seedweb.models import Profile, Project, ProjectData, ProjectNotes
+from seedweb.pagination import keyset_page, latest_page
+
+# Projects waiting to be purged are treated as already deleted
+LIVE_PROJECT = Project.purge_requested_at.is_(None)
+
+
+def profile_by_id(profile_id: int) -> Select:
+    """
+    Select a Profile.
+    :param profile_id: the Profile ID
+    :return: the SELECT
+    """
+    return select(Profile).where(Profile.id == profile_id)
+
+
+def profiles_page(skip: int, limit: int) -> Select:
+    """
+    Select a page of Profiles.
+    :param skip: the number of Profiles to skip
+    :param limit: the max number of Profiles to return
+    :return: the SELECT
+    """
+    return select(Profile).offset(skip).limit(limit)
+
+
+def insert_profile(profile: schemas.ProfileCreate) -> Insert:
+    """
+    Insert a Profile, returning it.
+    :param profile: a ProfileCreate object
+    :return: the INSERT
+    """
+    return (
+        insert(Profile)
+        .values(name=profile.name, colors=profile.colors)
+        .returning(Profile)
+    )
+
+
+def update_profile(profile_id: int, profile: schemas.ProfileCreate) -> Update:
+    """
+    Update a Profile, returning it.
+    :param profile_id: the Profile ID
+    :param profile: a ProfileCreate object
+    :return: the UPDATE
+    """
+    return (
+        update(Profile)
+        .where(Profile.id == profile_id)
+        .values(name=profile.name, colors=profile.colors)
+        .returning(Profile)
+    )
+
+
+def delete_profile(profile_id: int) -> Delete:
+    """
+    Delete a Profile, returning its name.
+    :param profile_id: the Profile ID
+    :return: the DELETE
+    """
+    return delete(Profile).where(Profile.id == profile_id).returning(Profile.name)
+
+
+def project_by_id(project_id: int) -> Select:
+    """
+    Select a Project, without its data, notes or Profile.
+    :param project_id: the Project ID
+    :return: the SELECT
+    """
+    return select(Project).where(Project.id == project_id, LIVE_PROJECT)
+
+
+def project_name(project_id: int) -> Select:
+    """
+    Select the name of a Project.
+    :param project_id: the Project ID
+    :return: the SELECT
+    """
+    return select(Project.name).where(Project.id == project_id, LIVE_PROJECT)
+
+
+def projects_page(skip: int, limit: int) -> Select:
+    """
+    Select a page of Projects.
+    :param skip: the number of Projects to skip
+    :param limit: the max number of Projects to return
+    :return: the SELECT
+    """
+    return select(Project).where(LIVE_PROJECT).offset(skip).limit(limit)
+
+
+def latest_data(project_id: int, limit: int) -> Select:
+    """
+    Select the latest ProjectData of a Project, newest first, with one record more than
+    limit.
+    :param project_id: the Project ID
+    :param limit: the max number of records the caller keeps
+    :return: the SELECT
+    """
+    return latest_page(
+        select(ProjectData).where(ProjectData.project_id == project_id),
+        ProjectData,
+        limit,
+    )
+
+
+def latest_notes(project_id: int, limit: int) -> Select:
+    """
+    Select the latest ProjectNotes of a Project, newest first, with one record more than
+    limit.
+    :param project_id: the Project ID
+    :param limit: the max number of records the caller keeps
+    :return: the SELECT
+    """
+    return latest_page(
+        select(ProjectNotes).where(ProjectNotes.project_id == project_id),
+        ProjectNotes,
+        limit,
+    )
+
+
+def insert_project(project: schemas.ProjectCreate) -> Insert:
+    """
+    Insert a Project, returning it.
+    :param project: a ProjectCreate object
+    :return: the INSERT
+    """
+    return insert(Project).values(**project.model_dump()).returning(Project)
+
+
+def update_project(project_id: int, project: schemas.ProjectCreate) -> Update:
+    """
+    Update a Project, returning it.
+    :param project_id: the Project ID
+    :param project: a ProjectCreate object
+    :return: the UPDATE
+    """
+    return (
+        update(Project)
+        .where(Project.id == project_id, LIVE_PROJECT)
+        .values(**project.model_dump())
+        .returning(Project)
+    )
+
+
+def delete_project(project_id: int) -> Delete:
+    """
+    Delete a Project, returning its name.
+    :param project_id: the Project ID
+    :return: the DELETE
+    """
+    return (
+        delete(Project)
+        .where(Project.id == project_id, LIVE_PROJECT)
+        .returning(Project.name)
+    )
+
+
+def request_purge(project_id: int) -> Update:
+    """
+    Mark a Project as waiting to be purged, returning its name. From then on it is treated
+    as deleted.
+    :param project_id: the Project ID
+    :return: the UPDATE
+    """
+    return (
+        update(Project)
+        .where(Project.id == project_id, LIVE_PROJECT)
+        .values(purge_requested_at=func.now())
+        .returning(Project.name)
+    )
+
+
+def purge_requests() -> Select:
+    """
+    Select the IDs of the Projects waiting to be purged, oldest request first.
+    :return: the SELECT
+    """
+    return (
+        select(Project.id)
+        .where(Project.purge_requested_at.is_not(None))
+        .order_by(Project.purge_requested_at, Project.id)
+    )
+
+
+def status_rows(project_ids: list[int] | None = None) -> Select:
+    """
+    Select the schedule and Profile colors of every Project, or of the given Projects.
+    :param project_ids: the Project IDs to include, or None for all Projects
+    :return: the SELECT
+    """
+    query = (
+        select(
+            Project.id,
+            Project.profile_id,
+            Project.start,
+            Project.end,
+            Project.timezone,
+            Profile.colors,
+        )
+        .outerjoin(Profile, Project.profile_id == Profile.id)
+        .where(LIVE_PROJECT)
+        .order_by(Project.id)
+    )
+    if project_ids is not None:
+        query = query.where(Project.id.in_(project_ids))
+    return query
+
+
+def project_data_by_id(project_data_id: int) -> Select:
+    """
+    Select a ProjectData record.
+    :param project_data_id: the ProjectData ID
+    :return: the SELECT
+    """
+    return select(ProjectData).where(ProjectData.id == project_data_id)
+
+
+def project_data_page(project_id: int, cursor: str | None, limit: int) -> Select:
+    """
+    Select a page of a Project's ProjectData, oldest first, after the cursor if given.
+    :param project_id: the Project ID
+    :param cursor: a cursor from pagination.next_cursor
+    :param limit: the max number of records to return
+    :return: the SELECT
+    :raises ValueError: if the cursor is malformed
+    """
+    return keyset_page(
+        select(ProjectData).where(ProjectData.project_id == project_id),
+        ProjectData,
+        cursor,
+        limit,
+    )
+
+
+def project_data_owner(project_data_id: int) -> Select:
+    """
+    Select the Project ID of a ProjectData record.
+    :param project_data_id: the ProjectData ID
+    :return: the SELECT
+    """
+    return select(ProjectData.project_id).where(ProjectData.id == project_data_id)
+
+
+def insert_project_data(row: dict) -> Insert:
+    """
+    Insert a ProjectData record, returning it.
+    :param row: dict of ProjectData column values
+    :return: the INSERT
+    """
+    return insert(ProjectData).values(**row).returning(ProjectData)
+
+
+def insert_project_data_rows() -> Insert:
+    """
+    Insert ProjectData rows passed as executemany parameters, returning the ID and created
+    date of each in the order given.
+    :return: the INSERT
+    """
+    return insert(ProjectData).returning(
+        ProjectData.id, ProjectData.created_date, sort_by_parameter_order=True
+    )
+
+
+def update_project_data(project_data_id: int, row: dict, project_id: int) -> Update:
+    """
+    Update a ProjectData record that belongs to a Project, returning it. Matching on the
+    Project lets the caller update a reading that stays in its Project without reading its
+    old Project first.
+    :param project_data_id: the ProjectData ID
+    :param row: dict of ProjectData column values
+    :param project_id: the Project ID the record belongs to before the update
+    :return: the UPDATE
+    """
+    return (
+        update(ProjectData)
+        .where(ProjectData.id == project_data_id, ProjectData.project_id == project_id)
+        .values(**row)
+        .returning(ProjectData)
+        .execution_options(populate_existing=True)
+    )
+
+
+def delete_project_data(project_data_id: int) -> Delete:
+    """
+    Delete a ProjectData record, returning its Project ID and created date.
+    :param project_data_id: the ProjectData ID
+    :return: the DELETE
+    """
+    return (
+        delete(ProjectData)
+        .where(ProjectData.id == project_data_id)
+        .returning(ProjectData.project_id, ProjectData.created_date)
+    )
+
+
+def project_note_by_id(project_note_id: int) -> Select:
+    """
+    Select a ProjectNotes record.
+    :param project_note_id: the ProjectNotes ID
+    :return: the SELECT
+    """
+    return select(ProjectNotes).where(ProjectNotes.id == project_note_id)
+
+
+def project_notes_page(project_id: int, cursor: str | None, limit: int) -> Select:
+    """
+    Select a page of a Project's ProjectNotes, oldest first, after the cursor if given.
+    :param project_id: the Project ID
+    :param cursor: a cursor from pagination.next_cursor
+    :param limit: the max number of records to return
+    :return: the SELECT
+    :raises ValueError: if the cursor is malformed
+    """
+    return keyset_page(
+        select(ProjectNotes).where(ProjectNotes.project_id == project_id),
+        ProjectNotes,
+        cursor,
+        limit,
+    )
+
+
+def insert_project_note(project_note: schemas.ProjectNotesCreate) -> Insert:
+    """
+    Insert a ProjectNotes record, returning it.
+    :param project_note: a ProjectNotesCreate object
+    :return: the INSERT
+    """
+    return (
+        insert(ProjectNotes).values(**project_note.model_dump()).returning(ProjectNotes)
+    )
+
+
+def update_project_note(
+    project_note_id: int, project_note: schemas.ProjectNotesCreate
+) -> Update:
+    """
+    Update the text of a ProjectNotes record, returning it.
+    :param project_note_id: the ProjectNotes ID
+    :param project_note: a ProjectNotesCreate object
+    :return: the UPDATE
+    """
+    return (
+        update(ProjectNotes)
+        .where(ProjectNotes.id == project_note_id)
+        .values(note=project_note.note)
+        .returning(ProjectNotes)
+    )
+
+
+def delete_project_note(project_note_id: int) -> Delete:
+    """
+    Delete a ProjectNotes record, returning its ID.
+    :param project_note_id: the ProjectNotes ID
+    :return: the DELETE
+    """
+    return (
+        delete(ProjectNotes)
+        .where(ProjectNotes.id == project_note_id)
+        .returning(ProjectNotes.id)
+    )
@@ -0,0 +1,80 @@
+"""
+Server-Sent Events for Project status. Each subscriber is a coroutine parked on an
+asyncio.Event, so idle connections cost one small object each and no threads or polling.
+Subscribers wake when a write publishes a change, just after the next schedule transition,
+or to send a keep-alive comment.
+"""
+
+import asyncio
+import json
+from typing import AsyncIterator
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from seedweb import crud
+from seedweb.broker import status_broker
+from seedweb.cache import StatusEntry, status_cache
+
+
+def format_event(event: str, data: dict) -> str:
+    """
+    Encode a Server-Sent Event.
+    :param event: the event name
+    :param data: the event payload
+    :return: the encoded event
+    """
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def read_status_entry(db: Session, project_id: int) -> StatusEntry | None:
+    """
+    Read a Project's status entry and close the session, so a long-lived stream does not
+    keep a pooled connection or an open transaction between lookups.
+    :param db: SQLAlchemy sessionmaker
+    :param project_id: the Project ID
+    :return: the status entry or None if the Project does not exist
+    """
+    try:
+        return crud.get_status_entry(db, project_id)
+    finally:
+        db.close()
+
+
+async def status_events(
+    project_id: int, db: Session, heartbeat: float = 15.0
+) -> AsyncIterator[str]:
+    """
+    Yield a status event whenever a Project's computed status or Profile colors change,
+    a deleted event if the Project is removed, and keep-alive comments in between.
+    :param project_id: the Project ID
+    :param db: SQLAlchemy sessionmaker, closed after each lookup
+    :param heartbeat: the max number of seconds between writes to the client
+    :return: an async iterator of encoded events
+    """
+    subscription = status_broker.subscribe(project_id)
+    last_content = None
+    try:
+        while True:
+            entry = status_cache.get(project_id)
+            if entry is None:
+                entry = await run_in_threadpool(read_status_entry, db, project_id)
+            if entry is None:
+                yield format_event("deleted", {"project": project_id})
+                return
+            subscription.profile_id = entry.profile_id
+            content = crud.status_content(entry)
+            countdown = content.pop("seconds_until_next_transition", None)
+            if content != last_content:
+                last_content = dict(content)
+                if "status" in content:
+                    content["seconds_until_next_transition"] = countdown
+                yield format_event("status", content)
+            timeout = heartbeat if countdown is None else min(heartbeat, countdown + 1)
+            try:
+                await asyncio.wait_for(subscription.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+            subscription.event.clear()
+    finally:
+        status_broker.unsubscribe(subscription)
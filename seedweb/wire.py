@@ -0,0 +1,132 @@
+"""
+Compact binary format for sensor readings posted by devices. A reading is a fixed 14 byte
+little endian struct, optionally followed by a UTF-8 JSON object of extra fields:
+
+    version        uint8    READING_VERSION
+    present        uint8    bit n set when SENSOR_METRICS[n] was measured
+    temperature    float32
+    humidity       float32
+    soil_moisture  float32
+    extra          bytes    optional JSON object of any other fields
+
+Post it to /projects/{project_id}/data/ with the READING_MEDIA_TYPE content type. The typed
+metrics are decoded straight into their ProjectData columns, so only the extra fields, if
+any, are parsed as JSON.
+"""
+
+import json
+import math
+import struct
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from seedweb import schemas
+from seedweb.models import SENSOR_METRICS
+
+READING_MEDIA_TYPE = "application/vnd.seedweb.reading"
+READING_VERSION = 1
+READING = struct.Struct("<BB" + "f" * len(SENSOR_METRICS))
+
+_FIELDS = tuple((1 << bit, metric) for bit, metric in enumerate(SENSOR_METRICS))
+
+
+def encode_reading(metrics: dict, extra: dict | None = None) -> bytes:
+    """
+    Encode a reading in the binary format, as a device would.
+    :param metrics: dict of SENSOR_METRICS values, missing or None when not measured
+    :param extra: dict of any other fields
+    :return: the encoded reading
+    """
+    present, values = 0, []
+    for bit, metric in enumerate(SENSOR_METRICS):
+        value = metrics.get(metric)
+        if value is not None:
+            present |= 1 << bit
+        values.append(value or 0.0)
+    body = READING.pack(READING_VERSION, present, *values)
+    if extra:
+        body += json.dumps(extra, separators=(",", ":")).encode()
+    return body
+
+
+def decode_reading(project_id: int, body: bytes) -> dict:
+    """
+    Decode a binary reading into a ProjectData row. Values are rounded to the 7 significant
+    digits a float32 holds, so 21.3 is stored as 21.3 rather than 21.299999237060547.
+    :param project_id: the Project ID the reading was posted for
+    :param body: the encoded reading
+    :return: dict of ProjectData column values
+    :raises ValueError: if the reading is malformed or outside its sensors' ranges
+    """
+    size = READING.size
+    if len(body) < size:
+        raise ValueError("Reading is too short")
+    version, present, *values = READING.unpack_from(body)
+    if version != READING_VERSION:
+        raise ValueError(f"Unsupported reading version: {version}")
+    row: dict = {"project_id": project_id, "extra": None}
+    payload = {}
+    for (bit, metric), value in zip(_FIELDS, values):
+        if not present & bit:
+            row[metric] = None
+            continue
+        if not math.isfinite(value):
+            raise ValueError(f"Invalid {metric} reading")
+        row[metric] = payload[metric] = float("%.7g" % value)
+    if len(body) > size:
+        extra = json.loads(bytes(body[size:]))
+        if not isinstance(extra, dict) or not extra.keys().isdisjoint(SENSOR_METRICS):
+            raise ValueError("Extra fields must be a JSON object of other fields")
+        if extra:
+            row["extra"] = extra
+            payload.update(extra)
+    if not payload:
+        raise ValueError("Reading has no values")
+    schemas.SensorData.model_validate(payload)
+    return row
+
+
+async def reading_body(
+    request: Request, project_id: int
+) -> schemas.ProjectDataCreate | dict:
+    """
+    Read a posted reading in either format. JSON bodies are validated as ProjectDataCreate;
+    binary ones are decoded into a ProjectData row.
+    :param request: the incoming request
+    :param project_id: the Project ID from the path
+    :return: a ProjectDataCreate object or a dict of ProjectData column values
+    :raises RequestValidationError: if the body is invalid
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == READING_MEDIA_TYPE:
+        try:
+            return decode_reading(project_id, body)
+        except ValueError as error:
+            raise RequestValidationError(
+                [{"type": "value_error", "loc": ("body",), "msg": str(error)}]
+            )
+    try:
+        return schemas.ProjectDataCreate.model_validate_json(body)
+    except ValidationError as error:
+        raise RequestValidationError(
+            [
+                {**detail, "loc": ("body", *detail["loc"])}
+                for detail in error.errors(include_url=False)
+            ]
+        )
+
+
+READING_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {
+                "schema": {"$ref": "#/components/schemas/ProjectDataCreate"}
+            },
+            READING_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
@@ -1,13 +1,16 @@
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import event, select
 from sqlalchemy.orm import sessionmaker
 
 from config import TestingConfig
+from seedweb.database import make_engine
 from seedweb.main import app, get_db
-from seedweb.models import Base
+from seedweb.models import Base, Profile
 
-engine = create_engine(TestingConfig.SQLALCHEMY_DATABASE_URI)
+engine = make_engine(TestingConfig)
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -45,15 +48,68 @@ def cleanup_tables():
             connection.execute(table.delete())
 
 
-@pytest.fixture(scope="session")
+@pytest.fixture
 def valid_project() -> dict:
-    """Return a valid Project dict"""
+    """
+    Return a valid Project dict, creating the Profile it uses unless it is still there, so
+    the Profile does not depend on what an earlier test cleaned up
+    """
+    with TestingSessionLocal() as db:
+        profile = db.scalar(select(Profile).where(Profile.name == "Project Profile"))
+        if profile is None:
+            profile = Profile(name="Project Profile", colors=[[0, 255, 0]])
+            db.add(profile)
+            db.commit()
+        profile_id = profile.id
     project = {
         "name": "Test Project One",
         "bed_id": "lettuce",
         "description": "A test of the lettuce bed",
-        "profile_id": 1,
+        "profile_id": profile_id,
         "start": "07:00:00",
         "end": "17:00:00",
     }
     return project
+
+
+@pytest.fixture
+def project(test_app, valid_project) -> dict:
+    """Create a throwaway Project and delete it, with its data and notes, afterwards"""
+    response = test_app.post(
+        "/projects/", json={**valid_project, "name": "Fixture Project"}
+    )
+    project = response.json()
+    yield project
+    test_app.delete(f"/projects/{project['id']}")
+
+
+@pytest.fixture
+def session_factory():
+    """Return the testing sessionmaker for code that opens its own sessions"""
+    return TestingSessionLocal
+
+
+@pytest.fixture
+def db_engine():
+    """Return the testing engine for code that takes an engine"""
+    return engine
+
+
+@pytest.fixture
+def count_statements():
+    """Return a context manager collecting the SQL statements the engine executes inside it"""
+
+    @contextmanager
+    def counting():
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+    return counting
@@ -42,7 +42,7 @@ class TestProfile:
         assert response.status_code == 200
         content = response.json()
         assert content.get("name") == "Test Profile One"
-        assert content.get("colors") == "[[0, 0, 255], [255, 0, 0], [255, 255, 255]]"
+        assert content.get("colors") == [[0, 0, 255], [255, 0, 0], [255, 255, 255]]
 
     @staticmethod
     def test_update_profile(test_app):
@@ -54,15 +54,28 @@ class TestProfile:
             "/profiles/1",
             json={
                 "name": "PATCHED Test Profile One",
-                "colors": "[[255, 0, 255], [255, 0, 0], [255, 255, 255]]",
+                "colors": [[255, 0, 255], [255, 0, 0], [255, 255, 255]],
             },
         )
         assert response.status_code == 200
         assert response.json().get("name") == "PATCHED Test Profile One"
-        assert (
-            response.json().get("colors")
-            == "[[255, 0, 255], [255, 0, 0], [255, 255, 255]]"
-        )
+        assert response.json().get("colors") == [
+            [255, 0, 255],
+            [255, 0, 0],
+            [255, 255, 255],
+        ]
+
+    @staticmethod
+    def test_invalid_colors(test_app):
+        """
+        Testing that colors which are not RGB triplets are rejected
+        :param test_app: fastapi TestClient
+        """
+        for colors in ("[[0, 0", [[0, 0, 256]], [[0, 0]], {"red": 255}):
+            response = test_app.post(
+                "/profiles/", json={"name": "Invalid Profile", "colors": colors}
+            )
+            assert response.status_code == 422
 
     @staticmethod
     def test_delete_profile(test_app):
@@ -78,3 +91,54 @@ class TestProfile:
             response.json().get("profile")
             == "Profile: PATCHED Test Profile One deleted"
         )
+
+    @staticmethod
+    def test_get_profile_etag(test_app):
+        """
+        Test that an unchanged Profile is answered with a 304 and a changed one is not
+        :param test_app: fastapi TestClient
+        """
+        profile = test_app.post(
+            "/profiles/", json={"name": "ETag Profile", "colors": "[[0, 0, 0]]"}
+        ).json()
+        url = f"/profiles/{profile['id']}"
+        etag = test_app.get(url).headers["ETag"]
+
+        cached = test_app.get(url, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        test_app.patch(url, json={"name": "ETag Profile", "colors": "[[1, 1, 1]]"})
+        changed = test_app.get(url, headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+        test_app.delete(url)
+
+    @staticmethod
+    def test_profile_writes_are_single_statements(test_app, count_statements):
+        """
+        Test that each Profile write is one RETURNING statement, with no read before or
+        after it, and that a missing Profile is a 404
+        :param test_app: fastapi TestClient
+        :param count_statements: collects the SQL statements executed
+        """
+        profile = {"name": "Statement Profile", "colors": [[0, 0, 0]]}
+        with count_statements() as statements:
+            profile_id = test_app.post("/profiles/", json=profile).json()["id"]
+        assert len(statements) == 1
+        assert "RETURNING" in statements[0]
+
+        url = f"/profiles/{profile_id}"
+        with count_statements() as statements:
+            response = test_app.patch(url, json={**profile, "colors": None})
+        assert response.json()["colors"] is None
+        assert response.json()["created_date"]
+        assert len(statements) == 1
+
+        with count_statements() as statements:
+            response = test_app.delete(url)
+        assert response.json() == {"profile": "Profile: Statement Profile deleted"}
+        assert len(statements) == 1
+
+        assert test_app.patch(url, json=profile).status_code == 404
+        assert test_app.delete(url).status_code == 404
@@ -1,4 +1,3 @@
-import json
 from datetime import datetime
 
 import pytest
@@ -24,8 +23,7 @@ class TestProfileSchema:
         )
         assert isinstance(profile.id, int)
         assert profile.name == "Test Profile"
-        assert profile.colors == "[[255, 0, 0], [0, 0, 255]]"
-        assert isinstance(json.loads(profile.colors), list)
+        assert profile.colors == [[255, 0, 0], [0, 0, 255]]
         assert isinstance(profile.created_date, datetime)
 
     @staticmethod
@@ -0,0 +1,265 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from seedweb import archive, rollups
+from seedweb.models import ProjectData, ProjectDataRollup
+
+
+@pytest.fixture
+def archive_store(tmp_path, monkeypatch) -> archive.ArchiveStore:
+    """Point the archive at a temporary directory"""
+    store = archive.ArchiveStore(str(tmp_path / "archive"), batch_size=4)
+    monkeypatch.setattr(archive, "archive_store", store)
+    return store
+
+
+class TestProjectDataArchive:
+    """Project Data archive testing class"""
+
+    @staticmethod
+    def test_partition_round_trip(tmp_path):
+        """
+        Test that every column type survives a partition file, nulls included
+        :param tmp_path: pytest temporary directory
+        """
+        created = datetime(2024, 1, 5, 12, 30)
+        rows = [
+            {
+                "id": index,
+                "created_date": created + timedelta(minutes=index),
+                "updated_date": created,
+                "temperature": float(index),
+                "humidity": None,
+                "soil_moisture": 0.0,
+                "extra": {"note": "é"} if index % 2 else None,
+            }
+            for index in range(1, 6)
+        ]
+        path = str(tmp_path / "1" / "2024-01.swa")
+        archive.write_partition(path, 1, rows)
+
+        with archive.Partition(path) as partition:
+            assert partition.rows == 5
+            assert partition.overlaps(None, archive.to_micros(created)) is False
+            assert partition.read() == [{**row, "project_id": 1} for row in rows]
+            after = partition.read(after=(rows[1]["created_date"], 2))
+            assert [row["id"] for row in after] == [3, 4, 5]
+            ranged = partition.read(rows[1]["created_date"], rows[3]["created_date"])
+            assert [row["id"] for row in ranged] == [2, 3]
+
+    @staticmethod
+    def test_archived_readings_are_read_transparently(
+        test_app, valid_project, db_engine, archive_store
+    ):
+        """
+        Test that archived readings move out of the database into monthly partitions and
+        are still listed, paginated and exported
+        :param test_app: fastapi TestClient
+        :param valid_project: dict representing a valid Project
+        :param db_engine: the testing engine
+        :param archive_store: a temporary ArchiveStore
+        """
+        project_id = test_app.post(
+            "/projects/", json={**valid_project, "name": "Archive Project"}
+        ).json()["id"]
+        now = datetime.utcnow().replace(microsecond=0)
+        old = [now - timedelta(days=days) for days in (95, 94, 60, 59, 58)]
+        with db_engine.begin() as connection:
+            connection.execute(
+                insert(ProjectData),
+                [
+                    {
+                        "project_id": project_id,
+                        "created_date": created,
+                        "temperature": float(index),
+                    }
+                    for index, created in enumerate(old)
+                ],
+            )
+        for temperature in (10, 11):
+            test_app.post(
+                f"/projects/{project_id}/data/",
+                json={
+                    "project_id": project_id,
+                    "sensor_data": f'{{"temperature": {temperature}}}',
+                },
+            )
+
+        report = archive_store.archive(db_engine, now - timedelta(days=30))
+
+        assert report["rows_archived"] == 5
+        assert len(archive_store.partitions(project_id)) == len(
+            {(created.year, created.month) for created in old}
+        )
+        with db_engine.connect() as connection:
+            assert (
+                connection.execute(
+                    select(func.count()).select_from(ProjectData)
+                ).scalar()
+                == 2
+            )
+
+        url = f"/projects/{project_id}/data/"
+        listed = test_app.get(url).json()
+        assert [record["temperature"] for record in listed] == [0, 1, 2, 3, 4, 10, 11]
+
+        first = test_app.get(url, params={"limit": 4})
+        second = test_app.get(
+            url, params={"limit": 4, "cursor": first.headers["X-Next-Cursor"]}
+        )
+        assert [record["temperature"] for record in second.json()] == [4, 10, 11]
+
+        exported = test_app.get(
+            f"/projects/{project_id}/data/export",
+            headers={"Accept-Encoding": "identity"},
+        )
+        records = [json.loads(line) for line in exported.text.splitlines()]
+        assert [record["id"] for record in records] == [
+            record["id"] for record in listed
+        ]
+
+        folded = rollups.rebuild(db_engine, project_id)
+        assert folded == 7
+        with db_engine.connect() as connection:
+            assert (
+                connection.execute(
+                    select(func.sum(ProjectDataRollup.count)).where(
+                        ProjectDataRollup.project_id == project_id,
+                        ProjectDataRollup.bucket == "day",
+                        ProjectDataRollup.metric == "temperature",
+                    )
+                ).scalar()
+                == 7
+            )
+
+        test_app.delete(f"/projects/{project_id}")
+        assert not os.path.exists(os.path.join(archive_store.root, str(project_id)))
+
+    @staticmethod
+    def test_interrupted_move_is_read_once(
+        test_app, valid_project, db_engine, archive_store, monkeypatch
+    ):
+        """
+        Test that readings left in the database when a move fails after writing the
+        partition are exported and folded into rollups once, and deleted by the next run
+        :param test_app: fastapi TestClient
+        :param valid_project: dict representing a valid Project
+        :param db_engine: the testing engine
+        :param archive_store: a temporary ArchiveStore
+        :param monkeypatch: pytest monkeypatch
+        """
+        project_id = test_app.post(
+            "/projects/", json={**valid_project, "name": "Interrupted Project"}
+        ).json()["id"]
+        now = datetime.utcnow().replace(microsecond=0)
+        with db_engine.begin() as connection:
+            connection.execute(
+                insert(ProjectData),
+                [
+                    {
+                        "project_id": project_id,
+                        "created_date": now - timedelta(days=days),
+                        "temperature": float(days),
+                    }
+                    for days in (62, 61, 60, 1)
+                ],
+            )
+
+        def fail(*args):
+            raise OSError("disk full")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(archive, "delete", fail)
+            with pytest.raises(OSError):
+                archive_store.archive(db_engine, now - timedelta(days=30))
+        assert archive_store.partitions(project_id)
+        with db_engine.connect() as connection:
+            assert archive_store.duplicate_ids(connection, project_id)
+
+        exported = test_app.get(
+            f"/projects/{project_id}/data/export",
+            headers={"Accept-Encoding": "identity"},
+        )
+        ids = [json.loads(line)["id"] for line in exported.text.splitlines()]
+        assert len(ids) == len(set(ids)) == 4
+        assert rollups.rebuild(db_engine, project_id) == 4
+
+        report = archive_store.archive(db_engine, now - timedelta(days=30))
+        assert report["rows_archived"] == 3
+        with db_engine.connect() as connection:
+            assert archive_store.duplicate_ids(connection, project_id) == set()
+            assert (
+                connection.execute(
+                    select(func.count())
+                    .select_from(ProjectData)
+                    .where(ProjectData.project_id == project_id)
+                ).scalar()
+                == 1
+            )
+        records = archive_store.read(project_id)
+        assert len(records) == len({record.id for record in records}) == 3
+        test_app.delete(f"/projects/{project_id}")
+
+    @staticmethod
+    def test_partition_index_skips_partitions(tmp_path, archive_store, monkeypatch):
+        """
+        Test that the partition index is cached until the directory changes, and that reads
+        skip partitions outside the range and stop at the limit
+        :param tmp_path: pytest temporary directory
+        :param archive_store: a temporary ArchiveStore
+        :param monkeypatch: pytest monkeypatch
+        """
+        months = [datetime(2024, month, 1) for month in (1, 2, 3)]
+        for number, month in enumerate(months):
+            rows = [
+                {
+                    "id": number * 10 + index,
+                    "created_date": month + timedelta(days=index),
+                    "updated_date": None,
+                    "temperature": float(index),
+                    "humidity": None,
+                    "soil_moisture": None,
+                    "extra": None,
+                }
+                for index in range(5)
+            ]
+            archive.write_partition(
+                os.path.join(archive_store.root, "1", month.strftime("%Y-%m.swa")),
+                1,
+                rows,
+            )
+        directory = os.path.join(archive_store.root, "1")
+        os.utime(directory, ns=(0, 0))
+        opened = []
+
+        class Partition(archive.Partition):
+            def __init__(self, path: str):
+                opened.append(path)
+                super().__init__(path)
+
+        monkeypatch.setattr(archive, "Partition", Partition)
+
+        assert len(archive_store.partitions(1)) == 3
+        assert len(opened) == 3
+        assert len(archive_store.partitions(1)) == 3
+        assert len(opened) == 3
+
+        opened.clear()
+        assert archive_store.read(1, (months[2] + timedelta(days=9), 0)) == []
+        assert opened == []
+
+        records = archive_store.read(1, (months[0] + timedelta(days=3), 3), limit=3)
+        assert [record.id for record in records] == [4, 10, 11]
+        assert len(opened) == 2
+
+        opened.clear()
+        rows = list(archive_store.iter_rows(1, months[1], months[2]))
+        assert [row["id"] for part in rows for row in part] == [10, 11, 12, 13, 14]
+        assert len(opened) == 1
+
+        archive_store.remove_project(1)
+        assert archive_store.partitions(1) == []
@@ -0,0 +1,110 @@
+import csv
+import io
+import json
+
+import pytest
+
+from seedweb import export
+
+
+class TestProjectDataExport:
+    """Project Data export testing class"""
+
+    @staticmethod
+    def post_readings(test_app, project_id: int) -> list[int]:
+        """
+        Post a few readings through the bulk endpoint
+        :param test_app: fastapi TestClient
+        :param project_id: the Project ID
+        :return: the created IDs
+        """
+        response = test_app.post(
+            "/projects/data/bulk",
+            json=[
+                {
+                    "project_id": project_id,
+                    "sensor_data": f'{{"temperature": {t}, "ph": 6}}',
+                }
+                for t in range(3)
+            ],
+        )
+        return response.json()["created"]
+
+    def test_export_ndjson(self, test_app, project):
+        """
+        Testing the NDJSON export, plain and gzip encoded
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        created = self.post_readings(test_app, project["id"])
+        url = f"/projects/{project['id']}/data/export"
+
+        response = test_app.get(url, headers={"Accept-Encoding": "identity"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert [record["id"] for record in records] == created
+        assert records[1]["temperature"] == 1.0
+        assert records[1]["extra"] == {"ph": 6}
+
+        compressed = test_app.get(
+            url, headers={"Accept-Encoding": "gzip"}, params={"format": "ndjson"}
+        )
+        assert compressed.headers["content-encoding"] == "gzip"
+        assert compressed.content == response.content
+
+    def test_export_csv(self, test_app, project):
+        """
+        Testing the CSV export and its time range filter
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        self.post_readings(test_app, project["id"])
+        url = f"/projects/{project['id']}/data/export"
+
+        response = test_app.get(
+            url, params={"format": "csv"}, headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [row["temperature"] for row in rows] == ["0.0", "1.0", "2.0"]
+
+        empty = test_app.get(
+            url,
+            params={"format": "csv", "from": "2999-01-01T00:00:00"},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        assert empty.text.splitlines() == [
+            "id,created_date,project_id,temperature,humidity,soil_moisture,extra"
+        ]
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        "header, accepted",
+        [
+            ("gzip", True),
+            ("br;q=1.0, GZIP;q=0.5", True),
+            ("*", True),
+            ("gzip;q=0", False),
+            ("identity, x-gzip-foo", False),
+            ("*;q=0.5, gzip;q=0", False),
+            ("", False),
+        ],
+    )
+    def test_accepts_gzip(header, accepted):
+        """
+        Testing that gzip is negotiated from the Accept-Encoding tokens and q-values
+        :param header: the Accept-Encoding header
+        :param accepted: whether the header accepts gzip
+        """
+        assert export.accepts_gzip(header) is accepted
+
+    @staticmethod
+    def test_export_missing_project(test_app):
+        """
+        Testing that exporting a Project that does not exist is a 404
+        :param test_app: fastapi TestClient
+        """
+        response = test_app.get("/projects/99999/data/export")
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Project not found"}
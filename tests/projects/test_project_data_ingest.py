@@ -0,0 +1,137 @@
+import time
+
+import pytest
+
+from seedweb import crud, ingest
+from seedweb.schemas import ProjectDataCreate
+
+
+class TestProjectDataIngest:
+    """Queued Project Data ingestion testing class"""
+
+    @staticmethod
+    def test_queued_create_project_data(
+        test_app, project, session_factory, monkeypatch
+    ):
+        """
+        Testing that readings are accepted with a 202 and written when the queue drains
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        :param session_factory: the testing sessionmaker
+        :param monkeypatch: pytest monkeypatch fixture
+        """
+        queue = ingest.IngestQueue(session_factory, batch_size=10, flush_interval=0.05)
+        monkeypatch.setattr(ingest, "ingest_queue", queue)
+        queue.start()
+        for temperature in range(5):
+            response = test_app.post(
+                f"/projects/{project['id']}/data/",
+                json={
+                    "project_id": project["id"],
+                    "sensor_data": f'{{"temperature": {temperature}}}',
+                },
+            )
+            assert response.status_code == 202
+        queue.put(ProjectDataCreate(project_id=9999, sensor_data="{}"))
+        queue.stop()
+
+        stats = queue.stats()
+        assert stats["running"] is False
+        assert stats["depth"] == 0
+        assert stats["written"] == 5
+        assert stats["rejected"] == 1
+        assert len(test_app.get(f"/projects/{project['id']}/data/").json()) == 5
+
+    @staticmethod
+    def test_queue_backpressure(session_factory):
+        """
+        Testing that a full queue refuses readings once the enqueue timeout passes
+        :param session_factory: the testing sessionmaker
+        """
+        queue = ingest.IngestQueue(session_factory, max_size=1)
+        reading = ProjectDataCreate(project_id=1, sensor_data="{}")
+        queue.put(reading, timeout=0)
+        with pytest.raises(ingest.IngestQueueFull):
+            queue.put(reading, timeout=0)
+        assert queue.stats()["depth"] == 1
+        assert queue.lag() >= 0
+
+    @staticmethod
+    def test_stopped_queue_falls_back_to_insert(test_app, project, session_factory):
+        """
+        Testing that a stopped queue refuses readings and the route writes them at once
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        :param session_factory: the testing sessionmaker
+        """
+        queue = ingest.IngestQueue(session_factory, flush_interval=0.05)
+        queue.start()
+        queue.stop()
+        with pytest.raises(ingest.IngestQueueStopped):
+            queue.put(ProjectDataCreate(project_id=project["id"], sensor_data="{}"))
+
+        class Stopping(ingest.IngestQueue):
+            """A queue stopped between the route's running check and its put"""
+
+            running = True
+
+        stopping = Stopping(session_factory)
+        stopping._stopping.set()
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            monkeypatch.setattr(ingest, "ingest_queue", stopping)
+            response = test_app.post(
+                f"/projects/{project['id']}/data/",
+                json={"project_id": project["id"], "sensor_data": {"temperature": 20}},
+            )
+        assert response.status_code == 200
+        assert response.json()["project_id"] == project["id"]
+
+    @staticmethod
+    def test_failed_batch_is_retried_row_by_row(project, session_factory, monkeypatch):
+        """
+        Testing that a row failing in the database drops only that row of its batch
+        :param project: dict representing a created Project
+        :param session_factory: the testing sessionmaker
+        :param monkeypatch: pytest monkeypatch fixture
+        """
+        prepare = crud.prepare_project_data
+
+        def deleted_meanwhile(db, readings):
+            rows, errors = prepare(db, readings)
+            return [*rows, {**rows[0], "project_id": 99999}], errors
+
+        monkeypatch.setattr(crud, "prepare_project_data", deleted_meanwhile)
+        queue = ingest.IngestQueue(session_factory, flush_interval=0.05)
+        for temperature in range(2):
+            queue.put(
+                ProjectDataCreate(
+                    project_id=project["id"],
+                    sensor_data={"temperature": temperature},
+                )
+            )
+        queue.start()
+        queue.stop()
+
+        stats = queue.stats()
+        assert stats["written"] == 2
+        assert stats["failed"] == 1
+
+    @staticmethod
+    def test_timed_out_stop_keeps_writer(session_factory, monkeypatch):
+        """
+        Testing that a writer still draining after stop() times out is not started twice
+        :param session_factory: the testing sessionmaker
+        :param monkeypatch: pytest monkeypatch fixture
+        """
+        queue = ingest.IngestQueue(session_factory, flush_interval=0.01)
+        monkeypatch.setattr(queue, "_flush", lambda batch: time.sleep(0.3))
+        queue.put(ProjectDataCreate(project_id=1, sensor_data="{}"))
+        queue.start()
+        writer = queue._thread
+        time.sleep(0.05)
+        queue.stop(timeout=0.01)
+        assert queue._thread is writer and writer.is_alive()
+        queue.start()
+        assert queue._thread is writer
+        queue.stop()
+        assert queue._thread is None
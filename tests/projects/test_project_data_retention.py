@@ -0,0 +1,163 @@
+import threading
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import create_engine, func, insert, select
+
+from seedweb import retention
+from seedweb.database import apply_pragmas
+from seedweb.models import Base, Project, ProjectData
+
+
+def make_retention_db(path, rows: int = 2000):
+    """
+    Create a database with one Project keeping 30 days and one with no policy, each with
+    old and recent readings.
+    :param path: the database file path
+    :param rows: the number of old readings per Project
+    :return: SQLAlchemy engine
+    """
+    engine = create_engine(f"sqlite:///{path}")
+    apply_pragmas(engine, {"auto_vacuum": "INCREMENTAL"})
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        for project_id, days in ((1, 30), (2, None)):
+            connection.execute(
+                insert(Project).values(
+                    id=project_id,
+                    name=f"Retention {project_id}",
+                    bed_id="lettuce",
+                    start=time(7),
+                    end=time(17),
+                    retention_days=days,
+                )
+            )
+            readings = [
+                {
+                    "project_id": project_id,
+                    "created_date": now - timedelta(days=60, minutes=i),
+                    "extra": {"note": "x" * 200},
+                }
+                for i in range(rows)
+            ]
+            readings.append(
+                {"project_id": project_id, "created_date": now, "extra": None}
+            )
+            connection.execute(insert(ProjectData), readings)
+    return engine
+
+
+def count_data(engine, project_id: int) -> int:
+    """
+    Count a Project's readings.
+    :param engine: SQLAlchemy engine
+    :param project_id: the Project ID
+    :return: the number of readings
+    """
+    with engine.connect() as connection:
+        return connection.execute(
+            select(func.count())
+            .select_from(ProjectData)
+            .where(ProjectData.project_id == project_id)
+        ).scalar()
+
+
+class TestProjectDataRetention:
+    """Project Data retention testing class"""
+
+    @staticmethod
+    def test_retention_cutoffs(tmp_path):
+        """
+        Test that Projects use their own retention and fall back to the default
+        :param tmp_path: pytest temporary directory
+        """
+        engine = make_retention_db(tmp_path / "cutoffs.db", rows=0)
+        now = datetime(2024, 3, 31, tzinfo=timezone.utc)
+        assert retention.retention_cutoffs(engine, now=now) == {1: now - timedelta(30)}
+        assert retention.retention_cutoffs(engine, 7, now) == {
+            1: now - timedelta(30),
+            2: now - timedelta(7),
+        }
+
+    @staticmethod
+    def test_prune_in_batches(tmp_path):
+        """
+        Test that expired readings are deleted in bounded batches and recent ones are kept
+        :param tmp_path: pytest temporary directory
+        """
+        engine = make_retention_db(tmp_path / "batches.db", rows=25)
+        cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+        assert retention.prune_batch(engine, 1, cutoff, 10) == 10
+        assert count_data(engine, 1) == 16
+        assert retention.prune_project(engine, 1, cutoff, batch_size=10) == 15
+        assert count_data(engine, 1) == 1
+        assert count_data(engine, 2) == 26
+
+    @staticmethod
+    def test_enforce_retention_reclaims_space(tmp_path):
+        """
+        Test that a retention run reports the rows deleted and the bytes the file shrank by
+        :param tmp_path: pytest temporary directory
+        """
+        path = tmp_path / "reclaim.db"
+        engine = make_retention_db(path)
+        size = path.stat().st_size
+
+        job = retention.RetentionJob(engine, batch_size=500, pause=0)
+        report = job.run_once()
+
+        assert report["rows_deleted"] == 2000
+        assert report["projects"] == {1: 2000}
+        assert report["bytes_freed"] > 0
+        assert path.stat().st_size == size - report["bytes_freed"]
+        assert count_data(engine, 2) == 2001
+        stats = job.stats()
+        assert stats["runs"] == 1
+        assert stats["rows_deleted"] == 2000
+        assert stats["last_report"] == report
+
+    @staticmethod
+    def test_reclaim_space_needs_incremental_vacuum(tmp_path):
+        """
+        Test that databases without incremental auto_vacuum are left alone
+        :param tmp_path: pytest temporary directory
+        """
+        engine = create_engine(f"sqlite:///{tmp_path / 'plain.db'}")
+        Base.metadata.create_all(bind=engine)
+        assert retention.reclaim_space(engine) == 0
+
+    @staticmethod
+    def test_retention_stats(test_app):
+        """
+        Test the retention stats endpoint
+        :param test_app: fastapi TestClient
+        """
+        response = test_app.get("/retention/stats")
+        assert response.status_code == 200
+        assert response.json()["running"] is False
+
+    @staticmethod
+    def test_timed_out_stop_keeps_job_thread(db_engine, monkeypatch):
+        """
+        Test that a job thread still running after stop() times out is not started twice
+        :param db_engine: the testing engine
+        :param monkeypatch: pytest monkeypatch
+        """
+        started, release = threading.Event(), threading.Event()
+
+        def run_once(self):
+            started.set()
+            release.wait()
+
+        monkeypatch.setattr(retention.RetentionJob, "run_once", run_once)
+        job = retention.RetentionJob(db_engine, interval=0)
+        job.start()
+        thread = job._thread
+        assert started.wait(5)
+        job.stop(timeout=0.01)
+        assert job._thread is thread and thread.is_alive()
+        job.start()
+        assert job._thread is thread
+        release.set()
+        job.stop()
+        assert job._thread is None
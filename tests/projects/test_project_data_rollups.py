@@ -0,0 +1,168 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from seedweb import archive, rollups
+from seedweb.models import ProjectData
+
+
+class TestProjectDataRollup:
+    """Project Data rollup testing class"""
+
+    @staticmethod
+    def post_readings(test_app, project_id: int) -> None:
+        """
+        Post a few readings through the single and bulk endpoints
+        :param test_app: fastapi TestClient
+        :param project_id: the Project ID
+        """
+        test_app.post(
+            f"/projects/{project_id}/data/",
+            json={"project_id": project_id, "sensor_data": '{"temperature": 18}'},
+        )
+        test_app.post(
+            "/projects/data/bulk",
+            json=[
+                {
+                    "project_id": project_id,
+                    "sensor_data": f'{{"temperature": {t}, "humidity": 50}}',
+                }
+                for t in (20, 25)
+            ],
+        )
+
+    def test_incremental_rollup(self, test_app, project):
+        """
+        Testing that rollups are maintained as readings arrive
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        self.post_readings(test_app, project["id"])
+        response = test_app.get(
+            f"/projects/{project['id']}/data/rollup",
+            params={"bucket": "day", "metric": "temperature"},
+        )
+        assert response.status_code == 200
+        content = response.json()
+        assert len(content) == 1
+        assert content[0]["count"] == 3
+        assert content[0]["min"] == 18.0
+        assert content[0]["max"] == 25.0
+        assert content[0]["mean"] == 21.0
+
+        empty = test_app.get(
+            f"/projects/{project['id']}/data/rollup",
+            params={"bucket": "day", "from": "2999-01-01T00:00:00"},
+        )
+        assert empty.json() == []
+
+    def test_rebuild_rollup(self, test_app, project, db_engine):
+        """
+        Testing that a rebuild from the raw readings matches the incremental rollups
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        :param db_engine: the testing engine
+        """
+        self.post_readings(test_app, project["id"])
+        url = f"/projects/{project['id']}/data/rollup"
+        incremental = test_app.get(url, params={"bucket": "hour"}).json()
+        assert rollups.rebuild(db_engine, project["id"]) == 3
+        assert test_app.get(url, params={"bucket": "hour"}).json() == incremental
+
+    def test_rollups_follow_updates_and_deletes(
+        self, test_app, project, valid_project, db_engine
+    ):
+        """
+        Testing that updating, moving and deleting readings keeps the rollups right
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        :param valid_project: dict of valid Project values
+        :param db_engine: the testing engine
+        """
+        other = test_app.post(
+            "/projects/", json={**valid_project, "name": "Rollup Other"}
+        ).json()
+        self.post_readings(test_app, project["id"])
+        url = f"/projects/{project['id']}/data/"
+        first, second, third = test_app.get(url).json()
+
+        test_app.patch(
+            f"{url}{first['id']}",
+            json={"project_id": project["id"], "sensor_data": {"temperature": 30}},
+        )
+        test_app.delete(f"{url}{second['id']}")
+        test_app.patch(
+            f"{url}{third['id']}",
+            json={"project_id": other["id"], "sensor_data": {"temperature": 10}},
+        )
+
+        def day_rollups(project_id):
+            return test_app.get(
+                f"/projects/{project_id}/data/rollup", params={"bucket": "day"}
+            ).json()
+
+        remaining = day_rollups(project["id"])
+        assert [(row["metric"], row["count"]) for row in remaining] == [
+            ("temperature", 1)
+        ]
+        assert remaining[0]["max"] == 30.0
+        moved = day_rollups(other["id"])
+        assert [(row["metric"], row["count"], row["min"]) for row in moved] == [
+            ("temperature", 1, 10.0)
+        ]
+
+        refreshed = day_rollups(project["id"]), day_rollups(other["id"])
+        rollups.rebuild(db_engine, project["id"])
+        rollups.rebuild(db_engine, other["id"])
+        assert (day_rollups(project["id"]), day_rollups(other["id"])) == refreshed
+        test_app.delete(f"/projects/{other['id']}")
+
+    def test_rebuild_stops_at_high_water(
+        self, test_app, project, db_engine, monkeypatch
+    ):
+        """
+        Testing that readings written after a rebuild has read its high-water ID are left
+        to the write path, so they are not folded in twice
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        :param db_engine: the testing engine
+        :param monkeypatch: pytest monkeypatch
+        """
+        self.post_readings(test_app, project["id"])
+        with Session(db_engine) as db:
+
+            def iter_rows(project_id, *args, **kwargs):
+                db.execute(
+                    insert(ProjectData).values(
+                        project_id=project_id,
+                        created_date=datetime.now(),
+                        temperature=30.0,
+                    )
+                )
+                return iter(())
+
+            monkeypatch.setattr(archive.archive_store, "iter_rows", iter_rows)
+            assert rollups._rebuild_project(db, project["id"], batch_size=2) == 3
+            db.rollback()
+
+    @staticmethod
+    def test_upsert_needs_supported_dialect():
+        """
+        Testing that rollups refuse a dialect without a merge statement
+        """
+        with pytest.raises(NotImplementedError, match="mysql"):
+            rollups._upsert_statement("mysql")
+
+    @staticmethod
+    def test_invalid_bucket(test_app, project):
+        """
+        Testing that unknown bucket sizes are rejected
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        response = test_app.get(
+            f"/projects/{project['id']}/data/rollup", params={"bucket": "week"}
+        )
+        assert response.status_code == 422
@@ -0,0 +1,232 @@
+from seedweb import wire
+
+
+def data_writes(statements: list[str]) -> list[str]:
+    """
+    Pick the statements that change project_data_table out of the ones executed
+    :param statements: the SQL statements executed
+    :return: the INSERT, UPDATE and DELETE statements on project_data_table
+    """
+    return [
+        statement
+        for statement in statements
+        if statement.startswith(
+            (
+                "INSERT INTO project_data_table",
+                "UPDATE project_data_table",
+                "DELETE FROM project_data_table",
+            )
+        )
+    ]
+
+
+def data_lookups(statements: list[str]) -> list[str]:
+    """
+    Pick the statements that read a single project_data_table record by ID
+    :param statements: the SQL statements executed
+    :return: the SELECT statements filtering project_data_table on its ID
+    """
+    return [
+        statement
+        for statement in statements
+        if statement.startswith("SELECT")
+        and "project_data_table.id = " in statement
+    ]
+
+
+class TestProjectData:
+    """Project Data testing class"""
+
+    @staticmethod
+    def test_create_project_data_bulk(test_app, project):
+        """
+        Testing the bulk Project Data creation endpoint
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        readings = [
+            {"project_id": project["id"], "sensor_data": f'{{"temperature": {t}}}'}
+            for t in (20, 21, 22)
+        ]
+        response = test_app.post("/projects/data/bulk", json=readings)
+        assert response.status_code == 200
+        created = response.json().get("created")
+        assert len(created) == 3
+        assert created == sorted(created)
+
+        listing = test_app.get(f"/projects/{project['id']}/data/").json()
+        assert [item["id"] for item in listing] == created
+
+    @staticmethod
+    def test_create_project_data_bulk_errors(test_app, project):
+        """
+        Testing that a bulk request with invalid readings is rejected as a whole
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        readings = [
+            {"project_id": project["id"], "sensor_data": '{"temperature": 20}'},
+            {"project_id": 9999, "sensor_data": '{"temperature": 20}'},
+            {"project_id": 9998, "sensor_data": {"humidity": 40}},
+        ]
+        response = test_app.post("/projects/data/bulk", json=readings)
+        assert response.status_code == 422
+        content = response.json()
+        assert content.get("created") == []
+        assert [error["index"] for error in content.get("errors")] == [1, 2]
+
+        readings[1:] = [{"project_id": project["id"], "sensor_data": "not json"}]
+        response = test_app.post("/projects/data/bulk", json=readings)
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", 1, "sensor_data"]
+        assert test_app.get(f"/projects/{project['id']}/data/").json() == []
+
+    @staticmethod
+    def test_sensor_data_is_structured(test_app, project):
+        """
+        Testing that sensor data is validated against the sensor schema when written and
+        returned as an object, whether it was sent as an object or a JSON string
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        url = f"/projects/{project['id']}/data/"
+        for sensor_data in ('{"temperature": 21, "lux": 300}', {"temperature": "21"}):
+            response = test_app.post(
+                url, json={"project_id": project["id"], "sensor_data": sensor_data}
+            )
+            assert response.status_code == 200
+        listing = test_app.get(url).json()
+        assert [item["sensor_data"] for item in listing] == [
+            {"temperature": 21.0, "lux": 300},
+            {"temperature": 21.0},
+        ]
+
+        for invalid in ("[1, 2]", {"humidity": 140}, {"temperature": "warm"}):
+            response = test_app.post(
+                url, json={"project_id": project["id"], "sensor_data": invalid}
+            )
+            assert response.status_code == 422
+
+    @staticmethod
+    def test_typed_sensor_columns(test_app, project):
+        """
+        Testing that known metrics are returned as typed fields and the rest as extra
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        response = test_app.post(
+            f"/projects/{project['id']}/data/",
+            json={
+                "project_id": project["id"],
+                "sensor_data": '{"temperature": 21.5, "humidity": 40, "lux": 300}',
+            },
+        )
+        assert response.status_code == 200
+        content = test_app.get(f"/projects/{project['id']}/data/").json()[0]
+        assert content.get("temperature") == 21.5
+        assert content.get("humidity") == 40.0
+        assert content.get("soil_moisture") is None
+        assert content.get("extra") == {"lux": 300}
+
+    @staticmethod
+    def test_create_project_data_binary(test_app, project):
+        """
+        Testing that binary readings are stored like the equivalent JSON readings
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        url = f"/projects/{project['id']}/data/"
+        headers = {"Content-Type": wire.READING_MEDIA_TYPE}
+        body = wire.encode_reading({"temperature": 21.3, "humidity": 40}, {"lux": 300})
+        assert len(body) == 14 + len('{"lux":300}')
+
+        response = test_app.post(url, content=body, headers=headers)
+        assert response.status_code == 200
+        content = response.json()
+        assert content.get("project_id") == project["id"]
+        assert content.get("temperature") == 21.3
+        assert content.get("humidity") == 40.0
+        assert content.get("soil_moisture") is None
+        assert content.get("extra") == {"lux": 300}
+        assert content.get("sensor_data") == {
+            "temperature": 21.3,
+            "humidity": 40.0,
+            "lux": 300,
+        }
+
+        for invalid in (body[:10], b"\x02" + body[1:], body[:14] + b"[1]"):
+            response = test_app.post(url, content=invalid, headers=headers)
+            assert response.status_code == 422
+        response = test_app.post(
+            url, content=b"{", headers={"Content-Type": "application/json"}
+        )
+        assert response.status_code == 422
+        assert len(test_app.get(url).json()) == 1
+
+    @staticmethod
+    def test_cursor_pagination(test_app, project):
+        """
+        Testing that following X-Next-Cursor walks every reading exactly once
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        created = test_app.post(
+            "/projects/data/bulk",
+            json=[
+                {"project_id": project["id"], "sensor_data": f'{{"humidity": {h}}}'}
+                for h in range(5)
+            ],
+        ).json()["created"]
+        url = f"/projects/{project['id']}/data/"
+
+        seen, params = [], {"limit": 2}
+        while True:
+            response = test_app.get(url, params=params)
+            assert response.status_code == 200
+            seen += [item["id"] for item in response.json()]
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            params = {"limit": 2, "cursor": cursor}
+        assert seen == created
+
+        offset = test_app.get(url, params={"skip": 2, "limit": 2}).json()
+        assert [item["id"] for item in offset] == created[2:4]
+        assert test_app.get(url, params={"cursor": "nope"}).status_code == 400
+
+    @staticmethod
+    def test_data_writes_are_single_statements(test_app, project, count_statements):
+        """
+        Test that creating, updating and deleting Project Data are one RETURNING statement
+        each, besides the rollup refresh, and that missing data is a 404
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        :param count_statements: collects the SQL statements executed
+        """
+        url = f"/projects/{project['id']}/data/"
+        reading = {"project_id": project["id"], "sensor_data": {"temperature": 20}}
+        with count_statements() as statements:
+            response = test_app.post(url, json=reading)
+        data_id = response.json()["id"]
+        assert response.json()["temperature"] == 20
+        assert response.json()["created_date"] is not None
+        assert len(data_writes(statements)) == 1
+        assert data_lookups(statements) == []
+
+        with count_statements() as statements:
+            response = test_app.patch(
+                f"{url}{data_id}",
+                json={**reading, "sensor_data": {"temperature": 21, "humidity": 40}},
+            )
+        assert response.json()["temperature"] == 21
+        assert response.json()["humidity"] == 40
+        assert len(data_writes(statements)) == 1
+        assert data_lookups(statements) == []
+
+        with count_statements() as statements:
+            response = test_app.delete(f"{url}{data_id}")
+        assert response.json() == {"data": f"Project Data: {data_id} deleted"}
+        assert len(data_writes(statements)) == 1
+
+        assert test_app.patch(f"{url}{data_id}", json=reading).status_code == 404
+        assert test_app.delete(f"{url}{data_id}").status_code == 404
@@ -0,0 +1,49 @@
+class TestProjectNotes:
+    """Project Notes testing class"""
+
+    @staticmethod
+    def test_notes_cursor_pagination(test_app, project):
+        """
+        Testing cursor pagination of the Project Notes listing
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        url = f"/projects/{project['id']}/notes/"
+        for number in range(3):
+            test_app.post(url, json={"project_id": project["id"], "note": f"{number}"})
+
+        first = test_app.get(url, params={"limit": 2})
+        assert [item["note"] for item in first.json()] == ["0", "1"]
+        second = test_app.get(
+            url, params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]}
+        )
+        assert [item["note"] for item in second.json()] == ["2"]
+        assert "X-Next-Cursor" not in second.headers
+
+    @staticmethod
+    def test_note_writes_are_single_statements(test_app, project, count_statements):
+        """
+        Test that each Project Note write is one RETURNING statement and that a missing
+        note is a 404
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        :param count_statements: collects the SQL statements executed
+        """
+        url = f"/projects/{project['id']}/notes/"
+        note = {"project_id": project["id"], "note": "Sown"}
+        with count_statements() as statements:
+            note_id = test_app.post(url, json=note).json()["id"]
+        assert len(statements) == 1
+
+        with count_statements() as statements:
+            response = test_app.patch(f"{url}{note_id}", json={**note, "note": "Up"})
+        assert response.json()["note"] == "Up"
+        assert len(statements) == 1
+
+        with count_statements() as statements:
+            response = test_app.delete(f"{url}{note_id}")
+        assert response.json() == {"note": f"Project Note: {note_id} deleted"}
+        assert len(statements) == 1
+
+        assert test_app.patch(f"{url}{note_id}", json=note).status_code == 404
+        assert test_app.delete(f"{url}{note_id}").status_code == 404
@@ -0,0 +1,154 @@
+import threading
+from datetime import time
+
+from sqlalchemy import create_engine, event, func, insert, select
+
+from seedweb import purge
+from seedweb.database import apply_pragmas
+from seedweb.models import Base, Project, ProjectData, ProjectNotes
+
+
+class TestProjectPurge:
+    """Chunked Project deletion testing class"""
+
+    @staticmethod
+    def test_purge_project_in_batches(tmp_path):
+        """
+        Test that a Project's records are deleted in bounded batches before the Project
+        :param tmp_path: pytest temporary directory
+        """
+        engine = create_engine(f"sqlite:///{tmp_path / 'purge.db'}")
+        apply_pragmas(engine, {"foreign_keys": "ON"})
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(
+                insert(Project).values(
+                    id=1, name="Purged", bed_id="lettuce", start=time(7), end=time(17)
+                )
+            )
+            connection.execute(
+                insert(ProjectData),
+                [{"project_id": 1, "temperature": float(i)} for i in range(25)],
+            )
+            connection.execute(
+                insert(ProjectNotes), [{"project_id": 1, "note": "Sown"}]
+            )
+
+        deletes = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("DELETE FROM project_data_table"):
+                deletes.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        report = purge.purge_project(engine, 1, batch_size=10)
+        event.remove(engine, "before_cursor_execute", count)
+
+        assert len(deletes) == 3
+        assert report["name"] == "Purged"
+        assert report["rows_deleted"] == {
+            "project_data_rollup_table": 0,
+            "project_data_table": 25,
+            "project_notes_tables": 1,
+        }
+        with engine.connect() as connection:
+            assert connection.scalar(select(func.count()).select_from(Project)) == 0
+        assert purge.purge_project(engine, 1) is None
+
+    @staticmethod
+    def test_chunked_delete_route(test_app, project, db_engine, monkeypatch):
+        """
+        Test that a chunked delete returns a 202 at once, hides the Project from then on,
+        and the purge job deletes the Project and its data afterwards
+        :param test_app: fastapi TestClient
+        :param project: a throwaway Project
+        :param db_engine: the testing engine
+        :param monkeypatch: pytest monkeypatch
+        """
+        job = purge.PurgeJob(db_engine, batch_size=2, pause=0)
+        monkeypatch.setattr(purge, "purge_job", job)
+        url = f"/projects/{project['id']}"
+        for temperature in range(5):
+            test_app.post(
+                f"{url}/data/",
+                json={
+                    "project_id": project["id"],
+                    "sensor_data": {"temperature": temperature},
+                },
+            )
+
+        response = test_app.delete(url, params={"chunked": True})
+        assert response.status_code == 202
+        assert response.json() == {
+            "project": "Project: Fixture Project deletion scheduled"
+        }
+        assert test_app.delete(url, params={"chunked": True}).status_code == 404
+        assert test_app.get("/purge/stats").json()["pending"] == [project["id"]]
+        assert test_app.get(url).status_code == 404
+        assert test_app.get(f"{url}/status").status_code == 404
+        listed = test_app.get("/projects/").json()
+        assert project["id"] not in [item["id"] for item in listed]
+
+        reports = job.run_once()
+        assert len(reports) == 1
+        assert reports[0]["rows_deleted"]["project_data_table"] == 5
+        assert test_app.get(url).status_code == 404
+        assert test_app.get(f"{url}/data/").json() == []
+        assert job.stats()["pending"] == []
+        assert test_app.delete(url, params={"chunked": True}).status_code == 404
+
+    @staticmethod
+    def test_pending_purge_survives_restart(test_app, project, db_engine, monkeypatch):
+        """
+        Test that a purge acknowledged by one job is resumed by a new job, as after a
+        restart, since the request is kept in the database
+        :param test_app: fastapi TestClient
+        :param project: a throwaway Project
+        :param db_engine: the testing engine
+        :param monkeypatch: pytest monkeypatch
+        """
+        monkeypatch.setattr(purge, "purge_job", purge.PurgeJob(db_engine, pause=0))
+        url = f"/projects/{project['id']}"
+        assert test_app.delete(url, params={"chunked": True}).status_code == 202
+
+        restarted = purge.PurgeJob(db_engine, pause=0)
+        assert restarted.resume() == [project["id"]]
+        reports = restarted.run_once()
+        assert [report["project_id"] for report in reports] == [project["id"]]
+        assert restarted.stats()["pending"] == []
+        with db_engine.connect() as connection:
+            assert (
+                connection.scalar(
+                    select(func.count())
+                    .select_from(Project)
+                    .where(Project.id == project["id"])
+                )
+                == 0
+            )
+
+    @staticmethod
+    def test_timed_out_stop_keeps_job_thread(db_engine, monkeypatch):
+        """
+        Test that a job thread still purging after stop() times out is not started twice
+        :param db_engine: the testing engine
+        :param monkeypatch: pytest monkeypatch
+        """
+        started, release = threading.Event(), threading.Event()
+
+        def purge_project(*args):
+            started.set()
+            release.wait()
+
+        monkeypatch.setattr(purge, "purge_project", purge_project)
+        job = purge.PurgeJob(db_engine, pause=0)
+        job.submit(1)
+        job.start()
+        thread = job._thread
+        assert started.wait(5)
+        job.stop(timeout=0.01)
+        assert job._thread is thread and thread.is_alive()
+        job.start()
+        assert job._thread is thread
+        release.set()
+        job.stop()
+        assert job._thread is None
@@ -1,3 +1,6 @@
+from sqlalchemy import event
+
+
 class TestProject:
     """Project testing class"""
 
@@ -44,6 +47,65 @@ class TestProject:
         assert content.get("id") == 1
         assert content.get("name") == "Test Project One"
 
+    @staticmethod
+    def test_get_project_embeds_latest_records(test_app, project, db_engine):
+        """
+        Testing that a Project embeds only its latest data and notes, loaded with separate
+        bounded queries, and links to the full listings, which reach the older records,
+        when older records exist
+        :param test_app: fastapi TestClient
+        :param project: a throwaway Project
+        :param db_engine: the testing engine
+        """
+        project_id = project["id"]
+        for temperature in range(5):
+            test_app.post(
+                f"/projects/{project_id}/data/",
+                json={
+                    "project_id": project_id,
+                    "sensor_data": f'{{"temperature": {temperature}}}',
+                },
+            )
+        for number in range(2):
+            test_app.post(
+                f"/projects/{project_id}/notes/",
+                json={"project_id": project_id, "note": f"{number}"},
+            )
+
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db_engine, "before_cursor_execute", count)
+        try:
+            response = test_app.get(
+                f"/projects/{project_id}", params={"data_limit": 2, "notes_limit": 2}
+            )
+        finally:
+            event.remove(db_engine, "before_cursor_execute", count)
+        assert response.status_code == 200
+        assert len(statements) == 3
+        assert all("JOIN project_data" not in statement for statement in statements)
+        content = response.json()
+        assert [record["temperature"] for record in content["data"]] == [3, 4]
+        assert [note["note"] for note in content["notes"]] == ["0", "1"]
+        assert content["links"] == {
+            "data": f"/projects/{project_id}/data/",
+            "notes": None,
+        }
+        older = test_app.get(content["links"]["data"], params={"limit": 3})
+        assert [record["temperature"] for record in older.json()] == [0, 1, 2]
+
+        response = test_app.get(f"/projects/{project_id}", params={"data_limit": 0})
+        assert response.json()["data"] == []
+        assert (
+            test_app.get(
+                f"/projects/{project_id}", params={"data_limit": 5000}
+            ).status_code
+            == 422
+        )
+
     @staticmethod
     def test_update_project(test_app, valid_project):
         """
@@ -72,3 +134,55 @@ class TestProject:
         )
         assert response.status_code == 200
         assert response.json().get("project") == "Project: PATCHED Project One deleted"
+
+    @staticmethod
+    def test_project_writes_are_single_statements(
+        test_app, valid_project, count_statements
+    ):
+        """
+        Test that creating, updating and deleting a Project are one statement each, the
+        database deleting its data through the cascade, and that a missing Project is a 404
+        :param test_app: fastapi TestClient
+        :param valid_project: dict representing a valid Project
+        :param count_statements: collects the SQL statements executed
+        """
+        project = {**valid_project, "name": "Statement Project"}
+        with count_statements() as statements:
+            response = test_app.post("/projects/", json=project)
+        assert len(statements) == 1
+        content = response.json()
+        assert content["data"] == [] and content["notes"] == []
+
+        url = f"/projects/{content['id']}"
+        test_app.post(
+            f"{url}/data/",
+            json={"project_id": content["id"], "sensor_data": {"temperature": 20}},
+        )
+        with count_statements() as statements:
+            response = test_app.patch(url, json={**project, "description": "Patched"})
+        assert response.json()["id"] == content["id"]
+        assert response.json()["description"] == "Patched"
+        assert len(statements) == 1
+
+        with count_statements() as statements:
+            response = test_app.delete(url)
+        assert response.json() == {"project": "Project: Statement Project deleted"}
+        assert len(statements) == 1
+        assert statements[0].startswith("DELETE FROM project_table")
+        assert test_app.get(f"{url}/data/").json() == []
+
+        assert test_app.patch(url, json=project).status_code == 404
+        assert test_app.delete(url).status_code == 404
+
+    @staticmethod
+    def test_project_integrity_conflicts(test_app, project, valid_project):
+        """
+        Test that a Project referring to a missing Profile, or reusing a name, is a 409
+        :param test_app: fastapi TestClient
+        :param project: a throwaway Project
+        :param valid_project: dict representing a valid Project
+        """
+        missing_profile = {**valid_project, "name": "Orphan", "profile_id": 9999}
+        assert test_app.post("/projects/", json=missing_profile).status_code == 409
+        duplicate = {**valid_project, "name": project["name"]}
+        assert test_app.post("/projects/", json=duplicate).status_code == 409
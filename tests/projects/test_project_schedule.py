@@ -0,0 +1,110 @@
+from datetime import datetime, time
+from zoneinfo import ZoneInfo
+
+from seedweb.schedule import Schedule
+
+
+class TestSchedule:
+    """Schedule engine testing class"""
+
+    @staticmethod
+    def test_daytime_window():
+        """
+        Testing a window within one day, including its edges
+        """
+        schedule = Schedule.compile(time(7), time(17))
+        assert schedule.state(datetime(2024, 3, 1, 6, 59)).status is False
+        assert schedule.state(datetime(2024, 3, 1, 7)).status is True
+        assert schedule.state(datetime(2024, 3, 1, 17)).status is False
+        state = schedule.state(datetime(2024, 3, 1, 12))
+        assert state.next_transition == datetime(2024, 3, 1, 17)
+        assert state.seconds_until_next_transition == 5 * 3600
+
+    @staticmethod
+    def test_overnight_window():
+        """
+        Testing a window that crosses midnight
+        """
+        schedule = Schedule.compile(time(20), time(6))
+        assert schedule.overnight
+        assert schedule.state(datetime(2024, 3, 1, 23)).status is True
+        assert schedule.state(datetime(2024, 3, 1, 3)).status is True
+        assert schedule.state(datetime(2024, 3, 1, 12)).status is False
+        state = schedule.state(datetime(2024, 3, 1, 23))
+        assert state.next_transition == datetime(2024, 3, 2, 6)
+        assert state.seconds_until_next_transition == 7 * 3600
+
+    @staticmethod
+    def test_empty_window():
+        """
+        Testing that a window with equal start and end is always off with no transitions
+        """
+        state = Schedule.compile(time(7), time(7)).state(datetime(2024, 3, 1, 7))
+        assert state == (False, None, None)
+
+    @staticmethod
+    def test_timezone_daylight_saving():
+        """
+        Testing that transitions are read on the Project's wall clock across a DST change
+        """
+        schedule = Schedule.compile(time(20), time(6), "America/New_York")
+        now = datetime(2024, 3, 10, 1, tzinfo=ZoneInfo("America/New_York"))
+        state = schedule.state(now.astimezone(ZoneInfo("UTC")))
+        assert state.status is True
+        assert state.seconds_until_next_transition == 4 * 3600
+
+    @staticmethod
+    def test_day_plan():
+        """
+        Testing the compact day plan
+        """
+        schedule = Schedule.compile(time(7), time(17), "Europe/Berlin")
+        plan = schedule.day_plan(
+            datetime(2024, 7, 1, 8, tzinfo=ZoneInfo("Europe/Berlin"))
+        )
+        assert plan["timezone"] == "Europe/Berlin"
+        assert plan["utc_offset"] == 7200
+        assert plan["start"] == 7 * 3600 and plan["end"] == 17 * 3600
+        assert plan["status"] is True
+        assert [t["status"] for t in plan["transitions"]] == [False, True]
+
+
+class TestScheduleRoutes:
+    """Schedule endpoint testing class"""
+
+    @staticmethod
+    def test_status_transition_hint(test_app, project):
+        """
+        Testing that the status response tells the device when it next changes
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        content = test_app.get(f"/projects/{project['id']}/status").json()
+        assert 0 <= content["seconds_until_next_transition"] <= 24 * 3600
+        assert content["next_transition"] is not None
+
+    @staticmethod
+    def test_project_schedule(test_app, project, valid_project):
+        """
+        Testing the day plan endpoint and the Project timezone
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        :param valid_project: dict representing a valid Project
+        """
+        url = f"/projects/{project['id']}"
+        response = test_app.patch(
+            url,
+            json={**valid_project, "name": project["name"], "timezone": "Asia/Tokyo"},
+        )
+        assert response.status_code == 200
+        plan = test_app.get(f"{url}/schedule").json()
+        assert plan["timezone"] == "Asia/Tokyo"
+        assert plan["utc_offset"] == 9 * 3600
+        assert len(plan["transitions"]) == 2
+
+        response = test_app.patch(
+            url,
+            json={**valid_project, "name": project["name"], "timezone": "Mars/Base"},
+        )
+        assert response.status_code == 422
+        assert test_app.get("/projects/9999/schedule").status_code == 404
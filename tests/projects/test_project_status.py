@@ -0,0 +1,193 @@
+from datetime import time
+
+from sqlalchemy import event
+
+from seedweb.cache import StatusCache, StatusEntry, status_cache
+
+
+class TestProjectStatus:
+    """Project status and status cache testing class"""
+
+    @staticmethod
+    def test_status_is_cached(test_app, valid_project):
+        """
+        Testing that repeated status polls are served from the cache
+        :param test_app: fastapi TestClient
+        :param valid_project: dict representing a valid Project
+        """
+        profile = test_app.post(
+            "/profiles/", json={"name": "Status Profile", "colors": [[1, 2, 3]]}
+        ).json()
+        project = test_app.post(
+            "/projects/",
+            json={
+                **valid_project,
+                "name": "Status Project",
+                "profile_id": profile["id"],
+            },
+        ).json()
+
+        status_cache.clear()
+        first = test_app.get(f"/projects/{project['id']}/status")
+        second = test_app.get(f"/projects/{project['id']}/status")
+        assert first.status_code == 200
+        assert first.json() == second.json()
+        assert first.json().get("profile") == [[1, 2, 3]]
+        assert status_cache.stats()["misses"] == 1
+        assert status_cache.stats()["hits"] == 1
+
+    @staticmethod
+    def test_status_invalidation(test_app, valid_project):
+        """
+        Testing that Profile and Project writes refresh or drop cached entries
+        :param test_app: fastapi TestClient
+        :param valid_project: dict representing a valid Project
+        """
+        profile = test_app.post(
+            "/profiles/", json={"name": "Invalidation Profile", "colors": [[1, 1, 1]]}
+        ).json()
+        project = test_app.post(
+            "/projects/",
+            json={
+                **valid_project,
+                "name": "Invalidation Project",
+                "profile_id": profile["id"],
+            },
+        ).json()
+        url = f"/projects/{project['id']}/status"
+
+        test_app.get(url)
+        test_app.patch(
+            f"/profiles/{profile['id']}",
+            json={"name": "Invalidation Profile", "colors": [[2, 2, 2]]},
+        )
+        assert test_app.get(url).json().get("profile") == [[2, 2, 2]]
+
+        test_app.delete(f"/projects/{project['id']}")
+        assert test_app.get(url).status_code == 404
+
+    @staticmethod
+    def test_missing_project_status(test_app):
+        """
+        Testing the status endpoint for a Project that does not exist
+        :param test_app: fastapi TestClient
+        """
+        response = test_app.get("/projects/9999/status")
+        assert response.status_code == 404
+
+    @staticmethod
+    def test_fleet_status(test_app, valid_project, db_engine):
+        """
+        Testing that the fleet status is read in one query and lists shared Profiles once
+        :param test_app: fastapi TestClient
+        :param valid_project: dict representing a valid Project
+        :param db_engine: the testing engine
+        """
+        profile = test_app.post(
+            "/profiles/", json={"name": "Fleet Profile", "colors": [[4, 4, 4]]}
+        ).json()
+        ids = [
+            test_app.post(
+                "/projects/",
+                json={**valid_project, "name": name, "profile_id": profile["id"]},
+            ).json()["id"]
+            for name in ("Fleet Bed One", "Fleet Bed Two")
+        ]
+
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db_engine, "before_cursor_execute", count)
+        try:
+            response = test_app.get("/projects/status", params={"id": ids})
+        finally:
+            event.remove(db_engine, "before_cursor_execute", count)
+        assert response.status_code == 200
+        assert len(statements) == 1
+        data = response.json()
+        assert [project["id"] for project in data["projects"]] == ids
+        assert {p["profile_id"] for p in data["projects"]} == {profile["id"]}
+        assert data["profiles"] == {str(profile["id"]): [[4, 4, 4]]}
+        assert status_cache.get(ids[0]).colors == [[4, 4, 4]]
+
+        for project_id in ids:
+            test_app.delete(f"/projects/{project_id}")
+        test_app.delete(f"/profiles/{profile['id']}")
+
+
+class TestStatusCache:
+    """StatusCache testing class"""
+
+    @staticmethod
+    def test_lru_eviction():
+        """
+        Testing that the least recently used entry is evicted once the cache is full
+        """
+        cache = StatusCache(max_size=2)
+        entry = StatusEntry.build(1, time(7), time(17), None)
+        cache.set(1, entry)
+        cache.set(2, entry)
+        assert cache.get(1) == entry
+        cache.set(3, entry)
+        assert cache.get(2) is None
+        assert cache.get(1) == entry
+        assert len(cache) == 2
+        assert cache.stats() == {"size": 2, "max_size": 2, "hits": 2, "misses": 1}
+
+    @staticmethod
+    def test_profile_invalidation():
+        """
+        Testing that Profile updates and deletes reach every entry using the Profile
+        """
+        cache = StatusCache()
+        cache.set(1, StatusEntry.build(1, time(7), time(17), "a"))
+        cache.set(2, StatusEntry.build(2, time(7), time(17), "b"))
+        cache.update_profile(1, "c")
+        assert cache.get(1).colors == "c"
+        assert cache.get(2).colors == "b"
+        cache.invalidate_profile(2)
+        assert cache.get(2) is None
+
+
+class TestProjectETag:
+    """Conditional GET testing class"""
+
+    @staticmethod
+    def test_status_not_modified(test_app, project):
+        """
+        Testing that a matching If-None-Match is answered from the cache with a 304
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        url = f"/projects/{project['id']}/status"
+        etag = test_app.get(url).headers["ETag"]
+        hits = status_cache.stats()["hits"]
+
+        response = test_app.get(url, headers={"If-None-Match": f'W/{etag}, "other"'})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert status_cache.stats()["hits"] == hits + 1
+
+        changed = {**project, "start": "00:00:00", "end": "00:00:01"}
+        test_app.patch(f"/projects/{project['id']}", json=changed)
+        assert test_app.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+    @staticmethod
+    def test_project_not_modified(test_app, project):
+        """
+        Testing conditional GET of the Project detail
+        :param test_app: fastapi TestClient
+        :param project: dict representing a created Project
+        """
+        url = f"/projects/{project['id']}"
+        response = test_app.get(url)
+        assert response.json().get("name") == "Fixture Project"
+        etag = response.headers["ETag"]
+        assert test_app.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        test_app.post(
+            f"{url}/notes/", json={"project_id": project["id"], "note": "watered"}
+        )
+        assert test_app.get(url, headers={"If-None-Match": etag}).status_code == 200
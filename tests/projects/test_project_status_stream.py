@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+from fastapi.concurrency import run_in_threadpool
+
+from seedweb import crud, schemas, stream
+from seedweb.broker import status_broker
+from seedweb.cache import status_cache
+
+
+async def next_event(events) -> tuple[str, dict]:
+    """
+    Return the next named event from a status stream, skipping keep-alive comments
+    :param events: the status_events async iterator
+    :return: a tuple of the event name and payload
+    """
+    while True:
+        message = await asyncio.wait_for(anext(events), 2)
+        if message.startswith("event:"):
+            name, data = message.strip().split("\n")
+            return name.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+class TestProjectStatusStream:
+    """Project status stream testing class"""
+
+    @staticmethod
+    def test_stream_pushes_changes(test_app, valid_project, session_factory):
+        """
+        Testing that the stream emits the current status, then a Profile change, then a
+        deletion, and unsubscribes once closed
+        :param test_app: fastapi TestClient
+        :param valid_project: dict representing a valid Project
+        :param session_factory: the testing sessionmaker
+        """
+        profile = test_app.post(
+            "/profiles/", json={"name": "Stream Profile", "colors": [[5, 5, 5]]}
+        ).json()
+        project = test_app.post(
+            "/projects/",
+            json={
+                **valid_project,
+                "name": "Stream Project",
+                "profile_id": profile["id"],
+            },
+        ).json()
+
+        async def scenario():
+            writer = session_factory()
+            events = stream.status_events(project["id"], session_factory(), 0.05)
+            name, data = await next_event(events)
+            assert name == "status"
+            assert data["profile"] == [[5, 5, 5]]
+            assert len(status_broker) == 1
+
+            await run_in_threadpool(
+                crud.update_profile,
+                writer,
+                profile["id"],
+                schemas.ProfileCreate(name="Stream Profile", colors="[[6, 6, 6]]"),
+            )
+            name, data = await next_event(events)
+            assert name == "status"
+            assert data["profile"] == [[6, 6, 6]]
+
+            await run_in_threadpool(crud.delete_project, writer, project["id"])
+            name, data = await next_event(events)
+            assert name == "deleted"
+            await events.aclose()
+            writer.close()
+            assert len(status_broker) == 0
+
+        asyncio.run(scenario())
+        test_app.delete(f"/profiles/{profile['id']}")
+
+    @staticmethod
+    def test_stream_missing_project(test_app):
+        """
+        Testing the stream endpoint for a Project that does not exist
+        :param test_app: fastapi TestClient
+        """
+        assert test_app.get("/projects/9999/status/stream").status_code == 404
+
+    @staticmethod
+    def test_stream_releases_session(project, session_factory):
+        """
+        Testing that the stream does not keep a transaction or connection open between
+        status lookups
+        :param project: a throwaway Project
+        :param session_factory: the testing sessionmaker
+        """
+
+        async def scenario():
+            db = session_factory()
+            status_cache.invalidate(project["id"])
+            events = stream.status_events(project["id"], db, 0.05)
+            name, _ = await next_event(events)
+            assert name == "status"
+            assert not db.in_transaction()
+            await events.aclose()
+
+        asyncio.run(scenario())
@@ -0,0 +1,144 @@
+import asyncio
+import inspect
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from config import TestingConfig
+from seedweb import wire
+from seedweb.database import make_async_engine
+from seedweb.models import Base
+
+pytest.importorskip("aiosqlite")
+
+from seedweb.async_routes import get_async_db, router, use_async_routes  # noqa: E402
+
+
+@pytest.fixture
+def async_app(tmp_path):
+    """Create a TestClient for an app serving the async routes from a fresh database"""
+    config = type(
+        "Config",
+        (TestingConfig,),
+        {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'async.db'}"},
+    )
+    engine = make_async_engine(config)
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    session_factory = async_sessionmaker(
+        engine, autoflush=False, expire_on_commit=False
+    )
+
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    with TestClient(app) as client:
+        yield client
+    asyncio.run(engine.dispose())
+
+
+def test_async_crud_routes(async_app, valid_project):
+    """
+    Test the Profile, Project, data and notes routes against AsyncSession
+    :param async_app: TestClient for the async routes
+    :param valid_project: dict representing a valid Project
+    """
+    profile = async_app.post(
+        "/profiles/", json={"name": "Async Profile", "colors": [[1, 2, 3]]}
+    ).json()
+    project = async_app.post(
+        "/projects/", json={**valid_project, "profile_id": profile["id"]}
+    ).json()
+    assert project["data"] == [] and project["notes"] == []
+    url = f"/projects/{project['id']}"
+
+    assert async_app.get(f"{url}/status").json()["profile"] == [[1, 2, 3]]
+    reading = async_app.post(
+        f"{url}/data/",
+        json={"project_id": project["id"], "sensor_data": '{"temperature": 21}'},
+    ).json()
+    assert reading["temperature"] == 21.0
+    binary = async_app.post(
+        f"{url}/data/",
+        content=wire.encode_reading({"soil_moisture": 512}),
+        headers={"Content-Type": wire.READING_MEDIA_TYPE},
+    ).json()
+    assert binary["soil_moisture"] == 512.0
+    bulk = async_app.post(
+        "/projects/data/bulk",
+        json=[{"project_id": project["id"], "sensor_data": '{"humidity": 40}'}],
+    )
+    assert len(bulk.json()["created"]) == 1
+    assert len(async_app.get(f"{url}/data/").json()) == 3
+    patched_reading = async_app.patch(
+        f"{url}/data/{reading['id']}",
+        json={"project_id": project["id"], "sensor_data": {"temperature": 25}},
+    )
+    assert patched_reading.json()["temperature"] == 25.0
+    assert async_app.delete(f"{url}/data/{binary['id']}").status_code == 200
+    assert async_app.delete(f"{url}/data/{binary['id']}").status_code == 404
+    async_app.post(
+        f"{url}/data/",
+        json={"project_id": project["id"], "sensor_data": {"temperature": 19}},
+    )
+    assert len(async_app.get(f"{url}/data/").json()) == 3
+    note = async_app.post(
+        f"{url}/notes/", json={"project_id": project["id"], "note": "Sprouted"}
+    ).json()
+    updated = async_app.patch(
+        f"{url}/notes/{note['id']}", json={"project_id": project["id"], "note": "Tall"}
+    )
+    assert updated.json()["note"] == "Tall"
+    assert [n["note"] for n in async_app.get(f"{url}/notes/").json()] == ["Tall"]
+    assert async_app.get(f"{url}/notes/{note['id']}").json()["note"] == "Tall"
+    assert async_app.get(f"{url}/data/{reading['id']}").json()["temperature"] == 25.0
+    assert async_app.get(f"/profiles/{profile['id']}").json()["name"] == "Async Profile"
+    assert [p["id"] for p in async_app.get("/profiles/").json()] == [profile["id"]]
+    assert [p["id"] for p in async_app.get("/projects/").json()] == [project["id"]]
+
+    fetched = async_app.get(url).json()
+    assert len(fetched["data"]) == 3 and len(fetched["notes"]) == 1
+    assert async_app.delete(f"{url}/notes/{note['id']}").status_code == 200
+    assert async_app.get(f"{url}/notes/{note['id']}").status_code == 404
+    patched = async_app.patch(url, json={**valid_project, "profile_id": profile["id"]})
+    assert patched.json()["id"] == project["id"]
+    assert async_app.delete(url).status_code == 200
+    assert async_app.get(url).status_code == 404
+    assert async_app.patch(url, json=valid_project).status_code == 404
+    assert async_app.delete(url).status_code == 404
+    assert async_app.delete(f"/profiles/{profile['id']}").status_code == 200
+    assert async_app.delete(f"/profiles/{profile['id']}").status_code == 404
+
+
+def test_use_async_routes():
+    """
+    Test that the async routes replace sync routes for the same path and method only
+    """
+    app = FastAPI()
+
+    @app.get("/profiles/")
+    def get_profiles():
+        return []
+
+    @app.get("/projects/status")
+    def get_projects_status():
+        return {}
+
+    use_async_routes(app)
+    endpoints = {
+        (route.path, method): route.endpoint
+        for route in app.routes
+        for method in getattr(route, "methods", ())
+    }
+    assert inspect.iscoroutinefunction(endpoints[("/profiles/", "GET")])
+    assert endpoints[("/projects/status", "GET")] is get_projects_status
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import text
+
+from config import ProductionConfig, TestingConfig, get_config
+from seedweb.database import engine_options, make_engine
+
+
+def config_for(uri: str) -> type:
+    """
+    Return a copy of the production config pointing at another database
+    :param uri: the database URI
+    :return: a configuration class
+    """
+    return type("Config", (ProductionConfig,), {"SQLALCHEMY_DATABASE_URI": uri})
+
+
+def test_make_engine_applies_pragmas(tmp_path):
+    """
+    Test that every connection of a SQLite engine gets the config's pragmas
+    :param tmp_path: pytest temporary directory
+    """
+    engine = make_engine(config_for(f"sqlite:///{tmp_path / 'pragmas.db'}"))
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert connection.execute(text("PRAGMA temp_store")).scalar() == 2
+    assert engine.pool.size() == ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS["pool_size"]
+    engine.dispose()
+
+
+def test_engine_options_server_database():
+    """
+    Test that a server database gets the pool settings without SQLite connect args
+    """
+    options = engine_options(config_for("postgresql://seedweb@localhost/seedweb"))
+    assert "connect_args" not in options
+    assert options["pool_size"] == 20
+    assert options["pool_pre_ping"] is True
+
+
+def test_engine_options_memory_database():
+    """
+    Test that in-memory SQLite keeps its connect args but not the pool sizing
+    """
+    options = engine_options(config_for("sqlite://"))
+    assert options["connect_args"] == {"check_same_thread": False}
+    assert "pool_size" not in options
+
+
+def test_unknown_environment_lists_valid_names():
+    """
+    Test that an unknown SEEDWEB_ENV raises an error naming the valid environments
+    """
+    with pytest.raises(ValueError, match="development, production, testing"):
+        get_config("prodution")
+    assert get_config("testing") is TestingConfig
@@ -0,0 +1,67 @@
+from seedweb import metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    """
+    Test that histogram buckets count every observation up to their bound
+    """
+    histogram = metrics.Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    assert list(histogram.cumulative()) == [("1", 2), ("10", 3), ("+Inf", 4)]
+    assert histogram.total == 56.5 and histogram.count == 4
+
+
+def test_metrics_endpoint(test_app, project):
+    """
+    Test that requests are recorded under their route template and served in the Prometheus
+    text format
+    :param test_app: fastapi TestClient
+    :param project: a throwaway Project
+    """
+    metrics.registry.reset()
+    test_app.get(f"/projects/{project['id']}/status")
+    test_app.get("/projects/99999/status")
+    test_app.post(
+        f"/projects/{project['id']}/notes/",
+        json={"project_id": project["id"], "note": "Sown"},
+    )
+    test_app.get("/not-a-route")
+
+    response = test_app.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    status = 'method="GET",route="/projects/{project_id}/status"'
+    assert f'seedweb_http_requests_total{{{status},status="200"}} 1' in lines
+    assert f'seedweb_http_requests_total{{{status},status="404"}} 1' in lines
+    assert (
+        'seedweb_http_requests_total{method="GET",route="unmatched",status="404"} 1'
+        in lines
+    )
+    assert f"seedweb_http_request_duration_seconds_count{{{status}}} 2" in lines
+    assert (
+        f'seedweb_http_request_duration_seconds_bucket{{{status},le="+Inf"}} 2' in lines
+    )
+    assert "# TYPE seedweb_http_request_duration_seconds histogram" in lines
+    assert 'seedweb_http_requests_in_progress{method="POST"} 0' in lines
+
+    notes = 'method="POST",route="/projects/{project_id}/notes/"'
+    request_size = next(
+        line
+        for line in lines
+        if line.startswith(f"seedweb_http_request_size_bytes_sum{{{notes}")
+    )
+    assert float(request_size.split()[-1]) > 0
+
+
+def test_metrics_can_be_disabled(test_app, monkeypatch):
+    """
+    Test that nothing is recorded while the registry is disabled
+    :param test_app: fastapi TestClient
+    :param monkeypatch: pytest monkeypatch
+    """
+    metrics.registry.reset()
+    monkeypatch.setattr(metrics.registry, "enabled", False)
+    test_app.get("/healthcheck")
+    assert not metrics.registry.requests
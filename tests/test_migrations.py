@@ -0,0 +1,140 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, inspect, text
+
+from seedweb import archive
+from seedweb.database import apply_pragmas
+from seedweb.migrations import migrate
+
+
+def test_migrate_legacy_project_data(tmp_path, monkeypatch):
+    """
+    Test that a database created before the typed sensor columns is migrated, its sensor_data
+    payloads moved into the typed columns and the column dropped, archive partitions included
+    :param tmp_path: pytest temporary directory
+    :param monkeypatch: pytest monkeypatch
+    """
+    store = archive.ArchiveStore(str(tmp_path / "archive"))
+    monkeypatch.setattr(archive, "archive_store", store)
+    path = store.partition_path(1, datetime(2024, 1, 1))
+    with monkeypatch.context() as legacy:
+        legacy.setitem(archive.ARCHIVE_COLUMNS, "sensor_data", "text")
+        archive.write_partition(
+            path,
+            1,
+            [
+                {
+                    "id": 1,
+                    "created_date": datetime(2024, 1, 2),
+                    "updated_date": None,
+                    "sensor_data": '{"humidity": 40, "lux": 300}',
+                    "temperature": None,
+                    "humidity": None,
+                    "soil_moisture": None,
+                    "extra": None,
+                }
+            ],
+        )
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE project_data_table (id INTEGER PRIMARY KEY, "
+                "created_date DATETIME, updated_date DATETIME, sensor_data VARCHAR, "
+                "project_id INTEGER)"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO project_data_table (sensor_data, project_id) VALUES "
+                """('{"temperature": 19, "soil_moisture": 512, "ph": 6.5}', 1), """
+                "('not json', 1)"
+            )
+        )
+        connection.execute(
+            text(
+                "CREATE TABLE profile_table (id INTEGER PRIMARY KEY, "
+                "created_date DATETIME, updated_date DATETIME, name VARCHAR, colors JSON)"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO profile_table (name, colors) VALUES "
+                """('Legacy', '"[[1, 2, 3]]"'), ('Broken', '"[[1, 2"')"""
+            )
+        )
+
+    migrate(engine)
+
+    columns = {c["name"] for c in inspect(engine).get_columns("project_data_table")}
+    assert {"temperature", "humidity", "soil_moisture", "extra"} <= columns
+    assert "sensor_data" not in columns
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text(
+                "SELECT temperature, humidity, soil_moisture, extra "
+                "FROM project_data_table ORDER BY id"
+            )
+        ).all()
+        colors = connection.execute(
+            text("SELECT colors FROM profile_table ORDER BY id")
+        ).scalars()
+        assert list(colors) == ["[[1, 2, 3]]", None]
+    assert rows[0] == (19.0, None, 512.0, '{"ph": 6.5}')
+    assert rows[1] == (None, None, None, '{"raw": "not json"}')
+    with archive.Partition(path) as partition:
+        assert "sensor_data" not in {c["name"] for c in partition.header["columns"]}
+        [row] = partition.read()
+        assert (row["humidity"], row["extra"]) == (40.0, {"lux": 300})
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+
+
+def test_migrate_cascades_foreign_keys(tmp_path):
+    """
+    Test that tables created before the ON DELETE CASCADE foreign keys are rebuilt with them,
+    keeping their rows and indexes, so deleting a Project deletes its records
+    :param tmp_path: pytest temporary directory
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'cascade.db'}")
+    apply_pragmas(engine, {"foreign_keys": "ON"})
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE project_table (id INTEGER PRIMARY KEY, "
+                "created_date DATETIME, updated_date DATETIME, name VARCHAR, "
+                'bed_id VARCHAR, description VARCHAR, profile_id INTEGER, start TIME, "end" TIME)'
+            )
+        )
+        connection.execute(
+            text(
+                "CREATE TABLE project_notes_tables (id INTEGER PRIMARY KEY, "
+                "created_date DATETIME, updated_date DATETIME, note VARCHAR, "
+                "project_id INTEGER REFERENCES project_table (id))"
+            )
+        )
+        connection.execute(text("INSERT INTO project_table (name) VALUES ('Legacy')"))
+        connection.execute(
+            text(
+                "INSERT INTO project_notes_tables (note, project_id) VALUES ('Sown', 1)"
+            )
+        )
+
+    migrate(engine)
+
+    inspector = inspect(engine)
+    keys = inspector.get_foreign_keys("project_notes_tables")
+    assert keys[0]["options"] == {"ondelete": "CASCADE"}
+    assert "ix_project_notes_project_created" in {
+        index["name"] for index in inspector.get_indexes("project_notes_tables")
+    }
+    assert not inspector.has_table("project_notes_tables_legacy")
+    with engine.begin() as connection:
+        note = connection.execute(
+            text("SELECT note, created_date FROM project_notes_tables")
+        ).one()
+        assert note.note == "Sown" and note.created_date is not None
+        connection.execute(text("DELETE FROM project_table"))
+        count = connection.execute(text("SELECT count(*) FROM project_notes_tables"))
+        assert count.scalar() == 0
+    migrate(engine)
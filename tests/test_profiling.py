@@ -0,0 +1,95 @@
+import logging
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+from starlette.responses import PlainTextResponse
+
+from seedweb.database import QueryProfile, query_profile, statement_shape
+from seedweb.models import Project
+from seedweb.profiling import QueryProfileMiddleware
+from tests.conftest import TestingSessionLocal, engine
+
+
+def test_statement_shape_collapses_placeholder_lists():
+    """
+    Test that statements differing only in the length of an IN list share a shape
+    """
+    assert statement_shape("SELECT a FROM t\nWHERE id IN (?, ?, ?) AND b = ?") == (
+        "SELECT a FROM t WHERE id IN (?) AND b = ?"
+    )
+    assert statement_shape("SELECT a FROM t WHERE id IN (%(id_1_1)s, %(id_1_2)s)") == (
+        statement_shape("SELECT a FROM t WHERE id IN ($1, $2, $3)")
+    )
+
+
+def test_profile_counts_lazy_loads(test_app, valid_project):
+    """
+    Test that a lazy load in a loop is recorded as one statement shape repeated per row
+    :param test_app: fastapi TestClient
+    :param valid_project: dict of valid Project values
+    """
+    ids = []
+    for number in range(3):
+        response = test_app.post(
+            "/projects/", json={**valid_project, "name": f"Lazy {number}"}
+        )
+        ids.append(response.json()["id"])
+    profile = QueryProfile()
+    token = query_profile.set(profile)
+    try:
+        with TestingSessionLocal() as db:
+            for db_project in db.scalars(select(Project).where(Project.id.in_(ids))):
+                assert db_project.notes == []
+    finally:
+        query_profile.reset(token)
+        for project_id in ids:
+            test_app.delete(f"/projects/{project_id}")
+    assert profile.count == 4
+    assert profile.seconds > 0
+    [(shape, count)] = profile.repeated(threshold=2)
+    assert count == 3 and "FROM project_notes_tables" in shape
+
+
+def test_profile_headers(test_app, project, count_statements):
+    """
+    Test that responses carry the number of statements the request executed and their time
+    :param test_app: fastapi TestClient
+    :param project: a throwaway Project
+    :param count_statements: context manager collecting executed statements
+    """
+    with count_statements() as statements:
+        response = test_app.get(f"/projects/{project['id']}")
+    assert response.status_code == 200
+    assert int(response.headers["X-DB-Queries"]) == len(statements)
+    assert float(response.headers["X-DB-Time"]) > 0
+
+    response = test_app.get("/healthcheck")
+    assert response.headers["X-DB-Queries"] == "0"
+
+
+def test_repeated_statements_are_logged(caplog):
+    """
+    Test that a statement shape executed more often than the threshold is logged
+    :param caplog: pytest log capture
+    """
+
+    async def repeating(scope, receive, send):
+        with engine.connect() as connection:
+            for number in range(3):
+                connection.execute(text("SELECT :number"), {"number": number})
+            connection.execute(text("SELECT 1, 2"))
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    client = TestClient(QueryProfileMiddleware(repeating, repeat_threshold=2))
+    with caplog.at_level(logging.WARNING, logger="seedweb.profiling"):
+        response = client.get("/repeat")
+    assert response.status_code == 200
+    assert "X-DB-Queries" not in response.headers
+    warnings = [record.getMessage() for record in caplog.records]
+    assert warnings == ["GET /repeat executed the same statement 3 times: SELECT ?"]
+
+    caplog.clear()
+    client = TestClient(QueryProfileMiddleware(repeating, repeat_threshold=3))
+    with caplog.at_level(logging.WARNING, logger="seedweb.profiling"):
+        client.get("/repeat")
+    assert not caplog.records
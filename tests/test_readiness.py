@@ -0,0 +1,114 @@
+import os
+import subprocess
+import sys
+import threading
+
+from sqlalchemy import create_engine, event, inspect
+
+from seedweb import readiness
+from seedweb.cache import status_cache
+
+
+def test_import_does_not_touch_database(tmp_path):
+    """
+    Test that importing the application neither creates nor opens the database
+    :param tmp_path: pytest temporary directory
+    """
+    database = tmp_path / "import.db"
+    subprocess.run(
+        [sys.executable, "-c", "import seedweb.main"],
+        env={
+            **os.environ,
+            "SEEDWEB_ENV": "development",
+            "DATABASE_URI": f"sqlite:///{database}",
+        },
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        check=True,
+    )
+    assert not database.exists()
+
+
+def test_warmup_fills_status_cache(project, session_factory):
+    """
+    Test that a warm-up loads every Project into the status cache and marks the app ready
+    :param project: a throwaway Project
+    :param session_factory: the testing sessionmaker
+    """
+    warmup = readiness.Warmup(session_factory)
+    status_cache.invalidate(project["id"])
+    assert warmup.stats()["ready"] is False
+
+    warmup.run_once()
+
+    stats = warmup.stats()
+    assert stats["ready"] is True
+    assert stats["projects_cached"] >= 1
+    assert status_cache.get(project["id"]) is not None
+
+
+def test_timed_out_stop_keeps_warmup_thread(session_factory, monkeypatch):
+    """
+    Test that a warm-up thread still running after stop() times out is not started twice
+    :param session_factory: the testing sessionmaker
+    :param monkeypatch: pytest monkeypatch
+    """
+    started, release = threading.Event(), threading.Event()
+
+    def run_once(self):
+        started.set()
+        release.wait()
+
+    monkeypatch.setattr(readiness.Warmup, "run_once", run_once)
+    warmup = readiness.Warmup(session_factory)
+    warmup.start()
+    thread = warmup._thread
+    assert started.wait(5)
+    warmup.stop(timeout=0.01)
+    assert warmup._thread is thread and thread.is_alive()
+    warmup.start()
+    assert warmup._thread is thread
+    release.set()
+    warmup.stop()
+    assert warmup._thread is None
+
+
+def test_readiness_endpoint(test_app, session_factory, monkeypatch):
+    """
+    Test that /readiness answers 503 until the warm-up has finished
+    :param test_app: fastapi TestClient
+    :param session_factory: the testing sessionmaker
+    :param monkeypatch: pytest monkeypatch
+    """
+    warmup = readiness.Warmup(session_factory, retry_interval=0.01)
+    monkeypatch.setattr(readiness, "warmup", warmup)
+
+    response = test_app.get("/readiness")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+    warmup.start()
+    warmup._thread.join(5)
+    response = test_app.get("/readiness")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+    warmup.stop()
+
+
+def test_create_schema_tolerates_concurrent_workers(tmp_path):
+    """
+    Test that a table created by another worker between the check and the CREATE does not
+    fail the startup
+    :param tmp_path: pytest temporary directory
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'workers.db'}")
+    racing = [True]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def other_worker(conn, cursor, statement, parameters, context, executemany):
+        if racing and statement.lstrip().startswith("CREATE TABLE profile_table"):
+            racing.clear()
+            cursor.execute(statement)
+
+    readiness.create_schema(engine)
+    assert "project_table" in inspect(engine).get_table_names()
+    engine.dispose()
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from config import active_config
+from seedweb import schemas
+from seedweb.models import Profile, ProjectData, ProjectNotes
+from seedweb.serialization import list_response, row_encoder
+
+CREATED = datetime(2024, 5, 1, 12, 0, 5)
+
+RECORDS = {
+    schemas.Profile: [
+        Profile(
+            id=1,
+            name="Sunrisé",
+            colors=[[255, 120, 0]],
+            created_date=CREATED,
+            updated_date=CREATED.replace(microsecond=1500),
+        ),
+        Profile(
+            id=2,
+            name="Dark",
+            colors=None,
+            created_date=CREATED.replace(tzinfo=timezone.utc),
+            updated_date=CREATED.replace(tzinfo=timezone(timedelta(hours=-5))),
+        ),
+    ],
+    schemas.ProjectData: [
+        ProjectData(
+            id=1,
+            project_id=3,
+            temperature=21.5,
+            humidity=None,
+            soil_moisture=1e-05,
+            extra={"note": "é\n", "nested": [1, 2.5, None, True]},
+            created_date=CREATED,
+            updated_date=CREATED,
+        ),
+        ProjectData(
+            id=2,
+            project_id=3,
+            temperature=None,
+            humidity=40.0,
+            soil_moisture=None,
+            extra={"values": [1e16]},
+            created_date=CREATED,
+            updated_date=CREATED,
+        ),
+    ],
+    schemas.ProjectNotes: [
+        ProjectNotes(
+            id=1,
+            project_id=3,
+            note='Sprouted "early" 🌱',
+            created_date=CREATED,
+            updated_date=CREATED,
+        )
+    ],
+}
+
+
+def response_model_body(schema, records) -> bytes:
+    """
+    Encode records the way FastAPI does for a list response_model.
+    :param schema: the pydantic model of the list items
+    :param records: ORM objects
+    :return: the response body
+    """
+    adapter = TypeAdapter(list[schema])
+    validated = adapter.validate_python(records, from_attributes=True)
+    content = jsonable_encoder(adapter.dump_python(validated, mode="json"))
+    return JSONResponse(content).body
+
+
+@pytest.mark.parametrize("schema", list(RECORDS), ids=lambda schema: schema.__name__)
+def test_list_response_matches_response_model(schema):
+    """
+    Test that the fast path encodes records to the same bytes as response_model validation
+    :param schema: the pydantic model of the list items
+    """
+    records = RECORDS[schema]
+    response = list_response(records, schema)
+    assert response.media_type == "application/json"
+    assert response.body == response_model_body(schema, records)
+    assert list_response([], schema).body == b"[]"
+    assert row_encoder(schema) is row_encoder(schema)
+
+
+def test_list_routes_use_fast_path(test_app, project, monkeypatch):
+    """
+    Test that the list routes answer with the same body and headers whether the fast path
+    is enabled or the response_model serializes the records
+    :param test_app: fastapi TestClient
+    :param project: dict representing a created Project
+    :param monkeypatch: pytest monkeypatch
+    """
+    url = f"/projects/{project['id']}/data/"
+    for temperature in (20, 21):
+        test_app.post(
+            url,
+            json={
+                "project_id": project["id"],
+                "sensor_data": f'{{"temperature": {temperature}, "lux": 300}}',
+            },
+        )
+    responses = {}
+    for enabled in (False, True):
+        monkeypatch.setattr(active_config, "FAST_LIST_RESPONSES", enabled)
+        responses[enabled] = test_app.get(url, params={"limit": 1})
+    for response in responses.values():
+        assert response.headers["content-type"] == "application/json"
+        assert "X-Next-Cursor" in response.headers
+        assert [record["temperature"] for record in response.json()] == [20.0]
+    assert responses[True].content == responses[False].content
+    assert (
+        responses[True].headers["X-Next-Cursor"]
+        == responses[False].headers["X-Next-Cursor"]
+    )